@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cached loader and runner for the odoo-shell scripts under SIT-Internal-Projects/
+Scripts are discovered once, compiled once per file modification time and executed once into
+their own namespace; entry points are then called with `env` passed explicitly. Calling a suite
+again from the same process costs no file read, compile or module-level execution.
+
+Inside a warm Odoo shell (./odoo-bin shell -d <database>, started from the repository root):
+    exec(open('SIT-Internal-Projects/odoo_shell_runner.py').read())
+    runner = ScriptRunner()
+    runner.run('run_all_tests', env)
+    runner.run('run_mel_counter_tests', env, chunk_size=500)
+Non-interactively:
+    python3 SIT-Internal-Projects/odoo_shell_runner.py -c odoo.conf -d <database> run_all_tests --repeat 3
+    python3 SIT-Internal-Projects/odoo_shell_runner.py --local run_mel_counter_tests
+    python3 SIT-Internal-Projects/odoo_shell_runner.py list
+Tenant sweep, one worker process (own registry and cursor) per database, at most --jobs at a time:
+    python3 SIT-Internal-Projects/odoo_shell_runner.py -c odoo.conf sweep tenant_a tenant_b tenant_c --jobs 4
+"""
+
+import contextlib
+import io
+import os
+import re
+import time
+
+# Entry points exposed as subcommands
+ENTRY_POINTS = ('run_all_tests', 'run_mel_counter_tests', 'run_quick_test', 'print_cron_job_info',
+                'check_mel_contract')
+
+_SKIPPED_DIRS = {'__pycache__', '.git', '.venv', 'venv'}
+
+
+def _default_root():
+    script_file = globals().get('__file__')
+    if script_file and os.path.basename(script_file) == 'odoo_shell_runner.py':
+        return os.path.dirname(os.path.abspath(script_file))
+    if os.path.isdir('SIT-Internal-Projects'):
+        return os.path.abspath('SIT-Internal-Projects')
+    return os.getcwd()
+
+
+class CachedScript:
+    """
+    One shell script compiled for a given mtime, with the namespace it was executed into
+    """
+
+    def __init__(self, path, mtime_ns, code):
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.code = code
+        self.namespace = None
+        self.entry_points = set()
+
+
+class ScriptRunner:
+    """
+    Discover the shell scripts under root and run their entry points from cached namespaces.
+    A script is recompiled and re-executed only when its mtime changes.
+    """
+
+    def __init__(self, root=None, observers=None):
+        self.root = root or _default_root()
+        self.observers = observers if observers is not None else []
+        self.compiles = 0
+        self.cache_hits = 0
+        # Reference data shared by every script namespace (see mel_reference_data in the MEL scripts)
+        self.reference_cache = {}
+        self._scripts = {}
+
+    # -- discovery and cache ------------------------------------------------
+
+    def discover(self):
+        """
+        Return the paths of every shell script under root, sorted
+        """
+        paths = []
+        for directory, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = sorted(name for name in dirnames if name not in _SKIPPED_DIRS)
+            for filename in sorted(filenames):
+                if filename.endswith('.py') and filename != 'odoo_shell_runner.py':
+                    paths.append(os.path.join(directory, filename))
+        return paths
+
+    def load(self, path):
+        """
+        Return the CachedScript of path, compiling and executing it only if it changed
+        """
+        mtime_ns = os.stat(path).st_mtime_ns
+        cached = self._scripts.get(path)
+        if cached is not None and cached.mtime_ns == mtime_ns:
+            self.cache_hits += 1
+            return cached
+        with open(path, encoding='utf-8') as handle:
+            source = handle.read()
+        cached = CachedScript(path, mtime_ns, compile(source, path, 'exec'))
+        cached.entry_points = {
+            name for name in re.findall(r'^def (\w+)\(', source, re.MULTILINE) if name in ENTRY_POINTS
+        }
+        self.compiles += 1
+        self._scripts[path] = cached
+        return cached
+
+    def entry_point_index(self):
+        """
+        Return {entry point: script path}. An entry point defined by several scripts is an error.
+        """
+        index = {}
+        for path in self.discover():
+            for name in self.load(path).entry_points:
+                if name in index:
+                    raise ValueError(f"{name} is defined in both {index[name]} and {path}")
+                index[name] = path
+        return index
+
+    def namespace(self, path):
+        """
+        Return the namespace the script was executed into, executing it on first use
+        """
+        cached = self.load(path)
+        if cached.namespace is None:
+            namespace = {
+                '__name__': 'odoo_shell_script',
+                '__file__': path,
+                'MEL_STEP_OBSERVERS': self.observers,
+                'MEL_REFERENCE_CACHE': self.reference_cache,
+            }
+            exec(cached.code, namespace)
+            cached.namespace = namespace
+        return cached.namespace
+
+    # -- running ------------------------------------------------------------
+
+    def run(self, entry_point, env, *args, **kwargs):
+        """
+        Call entry_point with env passed explicitly and return its result
+        """
+        index = self.entry_point_index()
+        if entry_point not in index:
+            raise KeyError(f"Unknown entry point {entry_point!r}, expected one of {', '.join(sorted(index))}")
+        function = self.namespace(index[entry_point])[entry_point]
+        return function(*args, env=env, **kwargs)
+
+    def print_catalogue(self):
+        index = self.entry_point_index()
+        print(f"Scripts under {self.root}:")
+        for path in self.discover():
+            names = sorted(name for name, script in index.items() if script == path)
+            suffix = f"  [{', '.join(names)}]" if names else ''
+            print(f"  - {os.path.relpath(path, self.root)}{suffix}")
+
+
+def _odoo_env_factory(config_file, database):
+    """
+    Return a context manager factory opening an Odoo environment on database.
+    The cursor is rolled back on exit: the suites never commit.
+    """
+    from contextlib import contextmanager
+
+    import odoo
+    from odoo.tools import config
+
+    arguments = ['-d', database] + (['-c', config_file] if config_file else [])
+    config.parse_config(arguments)
+    registry = odoo.registry(database)
+
+    @contextmanager
+    def open_env():
+        with registry.cursor() as cr:
+            try:
+                yield odoo.api.Environment(cr, odoo.SUPERUSER_ID, {})
+            finally:
+                cr.rollback()
+
+    return open_env
+
+
+def _local_env_factory(partners_per_company):
+    """
+    Same as _odoo_env_factory on the SQLite stand-in env of the MEL scripts.
+    The sample database is built by the first open_env() and reused by the next ones, as -d
+    reuses one database across --repeat runs (so the reference data cache, keyed on the
+    database name, is warm from the second run). open_env.close() deletes it.
+    """
+    import sys
+    from contextlib import contextmanager
+
+    sys.path.insert(0, os.path.join(_default_root(), 'sit-upgrades', 'SMACR102662'))
+    from odoo_shell_mel_local_env import LocalEnvironment, make_local_env
+
+    registries = []
+
+    @contextmanager
+    def open_env():
+        if not registries:
+            sample_env = make_local_env(partners_per_company=partners_per_company)
+            sample_env.cr.close()
+            registries.append(sample_env.registry)
+        env = LocalEnvironment(registries[0].cursor())
+        try:
+            yield env
+        finally:
+            env.cr.close()
+
+    def close():
+        while registries:
+            registries.pop().close()
+
+    open_env.close = close
+    return open_env
+
+
+# Output lines that mark a failed check in the suites
+_FAILURE_LINE = re.compile(r'^\s*(ERROR\b|✗)')
+
+_WORKER_RUNNER = None
+
+
+def _sweep_worker(task):
+    """
+    Run one entry point against one database inside a pool worker. The worker opens its own
+    registry and cursor and captures the suite output, which is written to log_dir if given.
+    The database fails when the entry point returns False; ERROR/✗ lines are listed either way.
+    Returns a result row for the sweep table.
+    """
+    global _WORKER_RUNNER
+    root, entry_point, database, config_file, local, partners_per_company, log_dir = task
+    if _WORKER_RUNNER is None:
+        _WORKER_RUNNER = ScriptRunner(root)
+    output = io.StringIO()
+    started = time.perf_counter()
+    status = 'pass'
+    error = ''
+    try:
+        with contextlib.redirect_stdout(output):
+            if local:
+                open_env = _local_env_factory(partners_per_company)
+            else:
+                open_env = _odoo_env_factory(config_file, database)
+            try:
+                with open_env() as worker_env:
+                    result = _WORKER_RUNNER.run(entry_point, worker_env)
+            finally:
+                if local:
+                    open_env.close()
+        if result is False:
+            status = 'fail'
+    except Exception as exc:
+        status = 'error'
+        error = f"{type(exc).__name__}: {exc}"
+    seconds = time.perf_counter() - started
+    failures = [line.strip() for line in output.getvalue().splitlines() if _FAILURE_LINE.match(line)]
+    log_path = None
+    if log_dir:
+        log_path = os.path.join(log_dir, f"{database}.{entry_point}.log")
+        with open(log_path, 'w', encoding='utf-8') as handle:
+            handle.write(output.getvalue())
+            if error:
+                handle.write(f"\n{error}\n")
+    return {'database': database, 'status': status, 'seconds': seconds, 'failures': failures,
+            'error': error, 'log': log_path, 'pid': os.getpid()}
+
+
+def sweep_databases(databases, entry_point='run_all_tests', jobs=4, config_file=None, local=False,
+                    partners_per_company=25, log_dir=None, root=None):
+    """
+    Run entry_point against every database with a pool of at most `jobs` worker processes,
+    each holding its own registry and cursor, and return the result rows in database order.
+    Every worker keeps about two PostgreSQL connections open (registry signalling and the
+    test cursor), so jobs caps the load put on the server.
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    root = root or _default_root()
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+    tasks = [(root, entry_point, database, config_file, local, partners_per_company, log_dir)
+             for database in databases]
+    results = {}
+    with ProcessPoolExecutor(max_workers=max(1, min(jobs, len(tasks)))) as pool:
+        futures = {pool.submit(_sweep_worker, task): task[2] for task in tasks}
+        for future in as_completed(futures):
+            row = future.result()
+            results[row['database']] = row
+            print(f"  {'✓' if row['status'] == 'pass' else '✗'} {row['database']}: {row['status']} "
+                  f"in {row['seconds']:.2f}s")
+    return [results[database] for database in databases]
+
+
+def print_sweep_table(rows, entry_point, wall_seconds):
+    print("\n" + "="*90)
+    print(f"TENANT SWEEP - {entry_point}")
+    print("="*90)
+    print(f"{'database':<30} {'status':<7} {'seconds':>8} {'failed checks':>14}  first failure")
+    print("-"*90)
+    for row in rows:
+        first = row['error'] or (row['failures'][0] if row['failures'] else '')
+        print(f"{row['database'][:30]:<30} {row['status']:<7} {row['seconds']:>8.2f} "
+              f"{len(row['failures']):>14}  {first[:40]}")
+    print("-"*90)
+    passed = sum(1 for row in rows if row['status'] == 'pass')
+    serial = sum(row['seconds'] for row in rows)
+    print(f"{passed}/{len(rows)} databases passed in {wall_seconds:.2f}s wall "
+          f"({serial:.2f}s of suite time, {serial / wall_seconds if wall_seconds else 0:.1f}x parallelism)")
+    print("="*90)
+
+
+if __name__ == "__main__" and "env" not in globals():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run odoo-shell script entry points from a cached loader")
+    parser.add_argument('-c', '--config', help="Odoo configuration file")
+    parser.add_argument('-d', '--database', help="Odoo database to run against")
+    parser.add_argument('--local', action='store_true', help="use the SQLite stand-in env instead of Odoo")
+    parser.add_argument('--partners-per-company', type=int, default=25, help="stand-in env data size")
+    parser.add_argument('--root', help="directory to discover scripts in (default: SIT-Internal-Projects)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('list', help="list the discovered scripts and their entry points")
+    for name in ENTRY_POINTS:
+        subparser = subparsers.add_parser(name, help=f"call {name}(env=env)")
+        subparser.add_argument('--repeat', type=int, default=1, help="number of runs in this process")
+    sweep_parser = subparsers.add_parser('sweep', help="run an entry point against several databases concurrently")
+    sweep_parser.add_argument('databases', nargs='*', help="databases to run against")
+    sweep_parser.add_argument('--databases-file', help="file with one database name per line")
+    sweep_parser.add_argument('--entry', default='run_all_tests', choices=ENTRY_POINTS)
+    sweep_parser.add_argument('--jobs', type=int, default=4, help="maximum concurrent databases (default 4)")
+    sweep_parser.add_argument('--log-dir', help="write each database's suite output to this directory")
+    args = parser.parse_args()
+
+    runner = ScriptRunner(args.root)
+    if args.command == 'list':
+        runner.print_catalogue()
+    elif args.command == 'sweep':
+        databases = list(args.databases)
+        if args.databases_file:
+            with open(args.databases_file, encoding='utf-8') as handle:
+                databases += [line.strip() for line in handle if line.strip() and not line.startswith('#')]
+        if not databases:
+            parser.error("sweep needs at least one database")
+        sweep_started = time.perf_counter()
+        sweep_rows = sweep_databases(databases, args.entry, args.jobs, args.config, args.local,
+                                     args.partners_per_company, args.log_dir, runner.root)
+        print_sweep_table(sweep_rows, args.entry, time.perf_counter() - sweep_started)
+        raise SystemExit(0 if all(row['status'] == 'pass' for row in sweep_rows) else 1)
+    else:
+        if args.local:
+            open_env = _local_env_factory(args.partners_per_company)
+        elif args.database:
+            open_env = _odoo_env_factory(args.config, args.database)
+        else:
+            parser.error("pass -d <database> or --local")
+        try:
+            for run in range(1, args.repeat + 1):
+                with open_env() as shell_env:
+                    started = time.perf_counter()
+                    runner.run(args.command, shell_env)
+                    reference_stats = runner.reference_cache.get('stats', {})
+                    print(f"\n[{args.command} run {run}/{args.repeat}] {time.perf_counter() - started:.3f}s "
+                          f"({runner.compiles} compiles, {runner.cache_hits} cache hits, reference data "
+                          f"{reference_stats.get('hits', 0)} hits / {reference_stats.get('misses', 0)} misses)")
+        finally:
+            if args.local:
+                open_env.close()
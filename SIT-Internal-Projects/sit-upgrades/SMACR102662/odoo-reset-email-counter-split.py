@@ -4,9 +4,575 @@ Test script for the new split email counter reset functionality
 This script tests that the UK and Canadian reset methods work correctly based on company country.
 """
 
-def test_reset_functionality():
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from statistics import NormalDist
+
+# Helpers shared by the MEL scripts live in odoo_shell_mel_common.py next to this file. It is
+# executed into this namespace, like this script is executed into the shell, so its helpers see
+# the shell globals. exec(open(...).read()) gives no __file__: it is then looked up from the
+# repository root.
+_MEL_COMMON_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(globals().get('__file__') or sys._getframe().f_code.co_filename)),
+    'odoo_shell_mel_common.py')
+if not os.path.exists(_MEL_COMMON_PATH):
+    _MEL_COMMON_PATH = os.path.join('SIT-Internal-Projects', 'sit-upgrades', 'SMACR102662',
+                                    'odoo_shell_mel_common.py')
+with open(_MEL_COMMON_PATH, encoding='utf-8') as _mel_common_file:
+    exec(compile(_mel_common_file.read(), _MEL_COMMON_PATH, 'exec'), globals())
+
+# MEL cron jobs are told apart by the reset method their code calls
+MEL_CRON_ROLES = [
+    ('mel_reset_daily_counters_batch', 'batch'),
+    ('mel_reset_counters_uk', 'uk'),
+    ('mel_reset_counters_canada', 'canada'),
+]
+MEL_CRON_ROLE_LABELS = {'batch': 'Batch', 'uk': 'UK', 'canada': 'Canada', 'other': 'Other MEL'}
+
+# Minutes around local midnight within which mel_reset_daily_counters_batch still resets a timezone
+BATCH_TRIGGER_WINDOW_MINUTES = 5
+
+# Partners whose counter needs a reset, used by the dirty-set reset and by the verification.
+# '>' rather than '!=': Odoo turns ('f', '!=', 0) into "f != 0 OR f IS NULL", so an unset
+# counter would count as dirty and the predicate could not use an index on "f > 0".
+DIRTY_COUNTER_DOMAIN = [('marketing_emails_sent_today', '>', 0)]
+
+# Company country codes and module test method of each region, used by the parallel reset harness
+REGIONS = {
+    'uk': (('GB', 'UK'), 'mel_reset_counters_uk_for_testing'),
+    'canada': (('CA',), 'mel_reset_counters_canada_for_testing'),
+}
+
+# Methods and cron jobs the regional resets need, checked by step 6 of test_reset_functionality
+REGIONAL_RESET_CONTRACT = {
+    'models': {
+        'res.partner': {
+            'methods': [
+                'mel_reset_counters_uk_dst_aware',
+                'mel_reset_counters_canada_dst_aware',
+                'mel_reset_counters_uk_for_testing',
+                'mel_reset_counters_canada_for_testing',
+            ],
+            'fields': {'marketing_emails_sent_today': 'integer', 'company_id': 'many2one'},
+        },
+        'res.company': {
+            'fields': {'country_id': 'many2one'},
+        },
+    },
+    # The regional crons are recognised by the reset method their code calls, not by their name
+    'cron_calls': ['mel_reset_counters_uk', 'mel_reset_counters_canada'],
+}
+
+
+class CompanyCountryIndex:
+    """
+    Country to company index built from the company groups of mel_reference_data().
+    Answers "company ids for countries X" and "company ids not in countries X"
+    without loading company records into the cache.
+    """
+
+    def __init__(self, env):
+        self._company_ids_by_country = {}
+        self._country_names = {}
+        self._country_by_company = {}
+        for group in mel_reference_data(env)['company_groups']:
+            country_id, country_name = group['country_id']
+            company_ids = sorted(group['company_ids'])
+            self._company_ids_by_country[country_id] = company_ids
+            self._country_names[country_id] = country_name
+            for company_id in company_ids:
+                self._country_by_company[company_id] = country_id
+
+    def company_ids_for_countries(self, country_ids):
+        """
+        Return the ids of companies located in any of the given countries
+        """
+        company_ids = []
+        for country_id in set(country_ids):
+            company_ids.extend(self._company_ids_by_country.get(country_id, []))
+        return sorted(company_ids)
+
+    def company_ids_not_in_countries(self, country_ids):
+        """
+        Return the ids of companies with a country that is not one of the given countries
+        """
+        excluded = set(country_ids)
+        company_ids = []
+        for country_id, ids in self._company_ids_by_country.items():
+            if country_id not in excluded:
+                company_ids.extend(ids)
+        return sorted(company_ids)
+
+    def country_name_for_company(self, company_id, default='Unknown'):
+        """
+        Return the country name of a company without reading the company record
+        """
+        country_id = self._country_by_company.get(company_id)
+        return self._country_names.get(country_id, default)
+
+
+class CounterSeeder:
+    """
+    Batched seeding and restore of marketing_emails_sent_today for the reset tests.
+    Partners are grouped by target value and each group is written in chunks,
+    so setting up N partners costs one UPDATE per chunk instead of one per partner.
+    """
+
+    FIELD = 'marketing_emails_sent_today'
+
+    def __init__(self, env, chunk_size=1000):
+        self.env = env
+        self.chunk_size = chunk_size
+        self.originals = {}
+        self.rows_written = 0
+        self.seconds = 0.0
+
+    def read_values(self, partner_ids):
+        """
+        Return {partner_id: counter} for the given partners in a single read
+        """
+        if not partner_ids:
+            return {}
+        rows = self.env['res.partner'].with_context(active_test=False).search_read(
+            [('id', 'in', list(partner_ids))], [self.FIELD])
+        return {row['id']: row[self.FIELD] for row in rows}
+
+    def capture(self, partner_ids):
+        """
+        Remember the current counters of the given partners so they can be restored later
+        """
+        values = self.read_values(partner_ids)
+        for partner_id, value in values.items():
+            self.originals.setdefault(partner_id, value)
+        return values
+
+    def seed(self, targets):
+        """
+        Apply {partner_id: value}, skipping partners already known to hold that value.
+        Returns the number of partners written.
+        """
+        groups = {}
+        for partner_id, value in targets.items():
+            if partner_id in self.originals and self.originals[partner_id] == value:
+                continue
+            groups.setdefault(value, []).append(partner_id)
+        return self._write_groups(groups)
+
+    def seed_all(self, partner_ids, value):
+        """
+        Set every given partner to the same counter value
+        """
+        return self.seed(dict.fromkeys(partner_ids, value))
+
+    def restore(self):
+        """
+        Write the captured original values back, one bulk write per distinct value
+        """
+        groups = {}
+        for partner_id, value in self.originals.items():
+            groups.setdefault(value, []).append(partner_id)
+        written = self._write_groups(groups)
+        self.originals = {}
+        return written
+
+    def rows_per_second(self):
+        return self.rows_written / self.seconds if self.seconds else 0.0
+
+    def report(self, label):
+        print(f"  [{label}] {self.rows_written} rows written in {self.seconds:.3f}s "
+              f"({self.rows_per_second():.0f} rows/s)")
+
+    def _write_groups(self, groups):
+        partners = self.env['res.partner'].with_context(active_test=False)
+        written = 0
+        start = time.perf_counter()
+        for value, ids in groups.items():
+            ids.sort()
+            for index in range(0, len(ids), self.chunk_size):
+                chunk = ids[index:index + self.chunk_size]
+                partners.browse(chunk).write({self.FIELD: value})
+                written += len(chunk)
+        self.seconds += time.perf_counter() - start
+        self.rows_written += written
+        return written
+
+
+def verify_region_reset(env, label, company_ids, sample_limit=5, suite='test_reset_functionality'):
+    """
+    Verify a regional reset with database aggregates instead of reading every contact.
+    Only the number of offending contacts and a capped display sample are fetched,
+    so time and memory stay flat whatever the size of the region.
+    Returns the number of contacts that still have a non-zero counter.
+    """
+    domain = [('company_id', 'in', company_ids)] + DIRTY_COUNTER_DOMAIN
+    partners = env['res.partner'].with_context(active_test=False)
+    nonzero_count = partners.search_count(domain)
+    
+    if nonzero_count:
+        _mel_failed(suite, f"ERROR: {nonzero_count} {label} contacts still have non-zero email counts after reset!")
+        sample = partners.search_read(domain, ['name', 'marketing_emails_sent_today'],
+                                      limit=sample_limit, order='id')
+        for row in sample:  # Show a capped sample only
+            print(f"  - {row['name']}: {row['marketing_emails_sent_today']} emails")
+    else:
+        print(f"SUCCESS: All {label} contacts reset to 0 emails sent today")
+    return nonzero_count
+
+
+def reset_dirty_counters(env, domain, chunk_size=None):
+    """
+    Dirty-set reset: zero the counter of the partners of domain whose counter is non-zero,
+    leaving the rows already at 0 untouched. Returns the number of partners written.
+    """
+    partners = env['res.partner'].with_context(active_test=False)
+    written = 0
+    for chunk in iter_partner_chunks(env, list(domain) + DIRTY_COUNTER_DOMAIN, chunk_size):
+        partners.browse(chunk.ids).write({'marketing_emails_sent_today': 0})
+        written += len(chunk)
+    return written
+
+
+def partner_rows_updated(env):
+    """
+    Rows of res_partner updated so far by the current transaction (pg_stat_xact_user_tables).
+    Only differences between two calls are meaningful.
+    """
+    _flush_env(env)
+    env.cr.execute("SELECT n_tup_upd FROM pg_stat_xact_user_tables WHERE relname = 'res_partner'")
+    row = env.cr.fetchone()
+    return row[0] if row else 0
+
+
+def run_region_reset(env, label, method_name, domain, reset_mode='method', chunk_size=None,
+                     suite='test_reset_functionality'):
+    """
+    Reset one region either with the module method (reset_mode='method') or with the
+    dirty-set reset of this script (reset_mode='dirty'). The dirty-set reset must write exactly
+    the dirty partners; the module method may rewrite the whole region, so its write
+    amplification is only reported.
+    Returns (dirty partners, rows written).
+    """
+    partners = env['res.partner'].with_context(active_test=False)
+    dirty_count = partners.search_count(list(domain) + DIRTY_COUNTER_DOMAIN)
+    region_count = partners.search_count(domain)
+    rows_before = partner_rows_updated(env)
+    if reset_mode == 'dirty':
+        print(f"Calling the {label} dirty-set reset...")
+        reset_dirty_counters(env, domain, chunk_size)
+    else:
+        print(f"Calling {label} reset method (test version)...")
+        getattr(env['res.partner'], method_name)()
+    rows_written = partner_rows_updated(env) - rows_before
+    
+    print(f"{label} reset wrote {rows_written} row(s) for {dirty_count} dirty partner(s) "
+          f"out of {region_count} in the region")
+    ratio = rows_written / dirty_count if dirty_count else float(rows_written)
+    if rows_written == dirty_count:
+        print(f"SUCCESS: {label} reset only wrote the dirty partners")
+    elif rows_written > dirty_count and reset_mode != 'dirty':
+        print(f"INFO: {label} reset wrote {rows_written - dirty_count} clean partner(s) "
+              f"({ratio:.1f}x write amplification)")
+    elif rows_written > dirty_count:
+        _mel_failed(suite, f"ERROR: {label} reset wrote {rows_written - dirty_count} clean partner(s) "
+                           f"({ratio:.1f}x write amplification)")
+    else:
+        _mel_failed(suite, f"ERROR: {label} reset wrote fewer rows than there are dirty partners")
+    return dirty_count, rows_written
+
+
+def partition_region(env, domain, partitions, partition_by='company'):
+    """
+    Split domain into at most `partitions` disjoint domains of similar size.
+    partition_by='company' packs whole companies (largest first, into the smallest partition),
+    partition_by='id' cuts the id-ordered partners into contiguous id ranges.
+    """
+    partners = env['res.partner'].with_context(active_test=False)
+    if partition_by == 'company':
+        groups = partners.read_group(domain, ['company_id'], ['company_id'], lazy=False)
+        bins = [[0, []] for _index in range(partitions)]
+        for group in sorted(groups, key=lambda group: -group['__count']):
+            target = min(bins, key=lambda item: item[0])
+            target[0] += group['__count']
+            target[1].append(group['company_id'][0] if group['company_id'] else False)
+        return [list(domain) + [('company_id', 'in', company_ids)] for _count, company_ids in bins if company_ids]
+    if partition_by != 'id':
+        raise ValueError(f"partition_by must be 'company' or 'id', not {partition_by!r}")
+    total = partners.search_count(domain)
+    size = max(1, math.ceil(total / partitions))
+    bounds = [0]
+    for offset in range(size, total, size):
+        bounds.append(partners.search(domain, order='id', offset=offset, limit=1).id - 1)
+    bounds.append(None)
+    return [list(domain) + [('id', '>', low)] + ([('id', '<=', high)] if high is not None else [])
+            for low, high in zip(bounds, bounds[1:])]
+
+
+def _reset_partition(env, domain, chunk_size=None, max_attempts=10):
+    """
+    Dirty-set reset of one partition on a cursor of its own, committed.
+    Retries the partition on serialization failures. Returns (rows written, attempts).
+    """
+    for attempt in range(1, max_attempts + 1):
+        cr = env.registry.cursor()
+        try:
+            worker_env = env(cr=cr)
+            rows_before = partner_rows_updated(worker_env)
+            reset_dirty_counters(worker_env, domain, chunk_size)
+            rows_written = partner_rows_updated(worker_env) - rows_before
+            cr.commit()
+            return rows_written, attempt
+        except Exception as exc:
+            cr.rollback()
+            if not _is_serialization_failure(exc) or attempt == max_attempts:
+                raise
+            time.sleep(0.01 * attempt)
+        finally:
+            cr.close()
+
+
+def parallel_region_reset(env, domain, workers=4, partition_by='company', chunk_size=None):
+    """
+    Reset a region with the dirty-set reset split into `workers` partitions, each run and
+    committed on its own cursor by a thread pool. The module reset methods take no domain,
+    so they cannot be partitioned; this is the parallel counterpart of reset_mode='dirty'.
+    The caller should have committed its own writes: the workers cannot see them, and the
+    caller only sees the workers' commits once its transaction has ended.
+    Returns {'rows', 'partitions', 'attempts', 'seconds'}.
+    """
+    partitions = partition_region(env, domain, workers, partition_by)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda partition: _reset_partition(env, partition, chunk_size), partitions))
+    seconds = time.perf_counter() - start
+    _invalidate_env_cache(env, flush=False)
+    return {
+        'rows': sum(rows for rows, _attempts in results),
+        'partitions': len(partitions),
+        'attempts': sum(attempts for _rows, attempts in results),
+        'seconds': seconds,
+    }
+
+
+def _counter_fingerprint(env, domain):
+    """
+    Sorted (id, counter) pairs of the partners matching domain with a non-zero counter
+    """
+    _invalidate_env_cache(env)
+    rows = env['res.partner'].with_context(active_test=False).search_read(
+        list(domain) + DIRTY_COUNTER_DOMAIN, ['marketing_emails_sent_today'], order='id')
+    return [(row['id'], row['marketing_emails_sent_today']) for row in rows]
+
+
+def compare_parallel_region_reset(env=None, region='uk', worker_counts=(1, 2, 4, 8), partition_by='company',
+                                  dirty_ratio=0.1, chunk_size=None, allow_commit=False):
+    """
+    Prove the partitioned parallel reset leaves the database exactly as a serial run of the
+    module test method does, and report the speed-up per worker count against one worker.
+    Every run starts from the same committed dirty pattern, which always holds an archived
+    contact (one is archived for the run when the region has none); the original counters and
+    active flags of the region are committed back at the end.
+    
+    WARNING: this COMMITS, several times, on env.cr: any uncommitted work of the shell is
+    committed with the first seed, and the region's counters are overwritten in between (the
+    workers use their own cursors and only see committed data). Run it on a staging copy only;
+    it refuses to run unless allow_commit=True.
+    Returns True when every worker count matched the serial run.
+    """
+    env = env or globals().get('env')
+    if not allow_commit:
+        print("ERROR: compare_parallel_region_reset commits to the database (staging copies only); "
+              "call it with allow_commit=True to run it")
+        return False
+    country_codes, method_name = REGIONS[region]
+    country_index = mel_reference_data(env)['country_ids']
+    country_ids = [country_index[code] for code in country_codes if code in country_index]
+    company_ids = CompanyCountryIndex(env).company_ids_for_countries(country_ids)
+    domain = [('company_id', 'in', company_ids)]
+    partners = env['res.partner'].with_context(active_test=False)
+    region_ids = partners.search(domain, order='id').ids
+    if not region_ids:
+        print(f"No {region} contacts found to test with")
+        return False
+    seeder = CounterSeeder(env, chunk_size or PARTNER_CHUNK_SIZE)
+    seeder.capture(region_ids)
+    archived_domain = list(domain) + [('active', '=', False)]
+    archived_ids = partners.search(archived_domain, order='id', limit=1).ids
+    archived_for_test = [] if archived_ids else region_ids[-1:]
+    dirty_ids = sorted(set(region_ids[::max(1, round(1 / dirty_ratio))]) | set(archived_ids or archived_for_test))
+    
+    def seed():
+        reset_dirty_counters(env, domain, chunk_size)
+        CounterSeeder(env, seeder.chunk_size).seed_all(dirty_ids, 10)
+        env.cr.commit()
+    
+    rows = []
+    try:
+        if archived_for_test:
+            partners.browse(archived_for_test).write({'active': False})
+        seed()
+        with rollback_savepoint(env, 'mel_serial_reset'):
+            rows_before = partner_rows_updated(env)
+            start = time.perf_counter()
+            getattr(env['res.partner'], method_name)()
+            serial_seconds = time.perf_counter() - start
+            serial_rows = partner_rows_updated(env) - rows_before
+            reference = _counter_fingerprint(env, domain)
+        for workers in worker_counts:
+            seed()
+            result = parallel_region_reset(env, domain, workers, partition_by, chunk_size)
+            env.cr.rollback()  # new snapshot, with the workers' commits
+            result['workers'] = workers
+            result['matches'] = _counter_fingerprint(env, domain) == reference
+            result['archived_left'] = partners.search_count(archived_domain + DIRTY_COUNTER_DOMAIN)
+            rows.append(result)
+    finally:
+        env.cr.rollback()
+        seeder.restore()
+        if archived_for_test:
+            partners.browse(archived_for_test).write({'active': True})
+        env.cr.commit()
+    
+    print("\n" + "="*70)
+    print(f"PARALLEL {region.upper()} RESET ({len(region_ids)} contacts, {len(dirty_ids)} dirty, by {partition_by})")
+    if archived_for_test:
+        print(f"Contact {archived_for_test[0]} archived for the runs, the region has no archived contact")
+    print("="*70)
+    print(f"Serial {method_name}: {serial_seconds * 1000:.1f} ms, {serial_rows} row(s) written")
+    baseline = rows[0]['seconds'] if rows else 0.0
+    print(f"{'workers':>7} {'parts':>5} {'retries':>7} {'rows':>7} {'archived':>8} {'ms':>9} {'speed-up':>8}  result")
+    for row in rows:
+        speed_up = baseline / row['seconds'] if row['seconds'] else 0.0
+        print(f"{row['workers']:>7} {row['partitions']:>5} {row['attempts'] - row['partitions']:>7} "
+              f"{row['rows']:>7} {row['archived_left']:>8} {row['seconds'] * 1000:>9.1f} {speed_up:>7.2f}x  "
+              f"{'✓ matches serial' if row['matches'] and not row['archived_left'] else '✗ differs from serial'}")
+    print("="*70)
+    return all(row['matches'] and not row['archived_left'] for row in rows)
+
+
+def _z_for_confidence(confidence):
+    return NormalDist().inv_cdf((1 + confidence) / 2)
+
+
+def sample_size_for(confidence, error_bound, population):
+    """
+    Sample size estimating a proportion within error_bound at the given confidence level,
+    for the worst case p = 0.5, with the finite population correction
+    """
+    if population <= 0:
+        return 0
+    z = _z_for_confidence(confidence)
+    n0 = z * z * 0.25 / (error_bound * error_bound)
+    return min(population, math.ceil(n0 / (1 + (n0 - 1) / population)))
+
+
+def wilson_interval(rate, sample_size, confidence):
+    """
+    Wilson score interval of a proportion; unlike the normal approximation it stays
+    meaningful when no leak at all was observed
+    """
+    if sample_size <= 0:
+        return 0.0, 1.0
+    z = _z_for_confidence(confidence)
+    denominator = 1 + z * z / sample_size
+    centre = (rate + z * z / (2 * sample_size)) / denominator
+    margin = z * math.sqrt(rate * (1 - rate) / sample_size + z * z / (4 * sample_size * sample_size)) / denominator
+    return max(0.0, centre - margin), min(1.0, centre + margin)
+
+
+class StratifiedLeakSampler:
+    """
+    Stratified random sample of the partners of a set of companies, one stratum per
+    (company country, tz). The total sample size follows from the confidence level and error
+    bound and is allocated to the strata in proportion to their size (at least
+    min_per_stratum each), so the cost stays bounded however large res.partner grows.
+    Each stratum is sampled in SQL (ORDER BY random() LIMIT n): only the sampled ids are
+    fetched. A seed makes the draw repeatable through setseed().
+    """
+
+    def __init__(self, env, company_ids, company_index, confidence=0.95, error_bound=0.01,
+                 min_per_stratum=5, seed=None):
+        self.env = env
+        self.confidence = confidence
+        self.error_bound = error_bound
+        self.populations = {}
+        self.samples = {}
+        self._company_ids = {}
+        groups = env['res.partner'].with_context(active_test=False).read_group(
+            [('company_id', 'in', list(company_ids))], ['company_id', 'tz'], ['company_id', 'tz'], lazy=False,
+        )
+        for group in groups:
+            company_id = group['company_id'][0]
+            key = (company_index.country_name_for_company(company_id), group['tz'] or False)
+            self.populations[key] = self.populations.get(key, 0) + group['__count']
+            self._company_ids.setdefault(key, []).append(company_id)
+        self.population = sum(self.populations.values())
+        self.sample_size = sample_size_for(confidence, error_bound, self.population)
+        self._draw(min_per_stratum, seed)
+
+    def _draw(self, min_per_stratum, seed=None):
+        _flush_env(self.env)
+        if seed is not None:
+            # setseed() takes a value in [-1, 1]
+            self.env.cr.execute("SELECT setseed(%s)", [random.Random(seed).uniform(-1, 1)])
+        for key, population in sorted(self.populations.items(), key=lambda item: str(item[0])):
+            size = max(min_per_stratum, math.ceil(self.sample_size * population / self.population))
+            size = min(size, population)
+            tz_clause = '"tz" = %s' if key[1] else '"tz" IS NULL'
+            self.env.cr.execute(
+                f'SELECT id FROM "res_partner" WHERE "company_id" IN %s AND {tz_clause} ORDER BY random() LIMIT %s',
+                [tuple(self._company_ids[key])] + ([key[1]] if key[1] else []) + [size],
+            )
+            self.samples[key] = sorted(row[0] for row in self.env.cr.fetchall())
+
+    def sample_ids(self):
+        return [partner_id for ids in self.samples.values() for partner_id in ids]
+
+    def estimate(self, leaked_ids):
+        """
+        Return the stratified leak rate estimate with its confidence interval:
+        {'rate', 'low', 'high', 'sampled', 'leaked', 'strata': {key: (population, sampled, leaked)}}
+        """
+        leaked_ids = set(leaked_ids)
+        rate = 0.0
+        variance = 0.0
+        strata = {}
+        for key, ids in self.samples.items():
+            population = self.populations[key]
+            sampled = len(ids)
+            leaked = sum(1 for partner_id in ids if partner_id in leaked_ids)
+            strata[key] = (population, sampled, leaked)
+            if not sampled:
+                continue
+            weight = population / self.population
+            stratum_rate = leaked / sampled
+            rate += weight * stratum_rate
+            if sampled > 1:
+                variance += (weight ** 2 * (1 - sampled / population)
+                             * stratum_rate * (1 - stratum_rate) / (sampled - 1))
+        sampled_total = sum(len(ids) for ids in self.samples.values())
+        # Effective sample size of the stratified design, fed to the Wilson interval
+        effective = rate * (1 - rate) / variance if variance else sampled_total
+        low, high = wilson_interval(rate, effective, self.confidence)
+        return {'rate': rate, 'low': low, 'high': high, 'sampled': sampled_total,
+                'leaked': len(leaked_ids & set(self.sample_ids())), 'strata': strata}
+
+
+def test_reset_functionality(chunk_size=None, env=None, dirty_ratio=0.1, reset_mode='method',
+                             confidence=0.95, error_bound=0.01, sample_seed=None):
     """
     Test the new email counter reset functionality for UK and Canadian companies
+    Contacts are streamed in chunks of chunk_size (default PARTNER_CHUNK_SIZE)
+    env defaults to the `env` of the Odoo shell the script was loaded into
+    Only dirty_ratio of each region is seeded with a non-zero counter, like production where
+    most counters are already 0; reset_mode 'dirty' uses reset_dirty_counters() instead of
+    the module methods.
+    Step 5 samples the other countries so that their leak rate is known within error_bound
+    at the given confidence level.
     """
     print("Testing the new split email counter reset functionality...")
     
@@ -16,249 +582,352 @@ def test_reset_functionality():
     except ImportError:
         pass  # We're in Odoo shell, so the environment should be available
     
-    # Get the Odoo environment (assumes we're inside an Odoo shell)
-    env = globals().get('env')
+    # Get the Odoo environment (passed in, or the one of the Odoo shell)
+    env = env or globals().get('env')
     if not env:
         print("ERROR: Not running inside an Odoo shell. Please run this script within Odoo shell.")
-        return
-    
-    print("\n1. Checking for existing UK and Canadian companies...")
-    
-    # Get UK and Canadian country records
-    uk_country = env['res.country'].search([('code', '=', 'GB')], limit=1)
-    canada_country = env['res.country'].search([('code', '=', 'CA')], limit=1)
-    
-    if not uk_country:
-        print("WARNING: UK country (GB) not found in the system")
-        uk_country = env['res.country'].search([('code', '=', 'UK')], limit=1)
-        if uk_country:
-            print("INFO: Found UK country with code 'UK' instead of 'GB'")
-    
-    if not canada_country:
-        print("ERROR: Canadian country (CA) not found in the system")
-        return
-    
-    print(f"UK country: {uk_country.name if uk_country else 'Not found'}")
-    print(f"Canada country: {canada_country.name if canada_country else 'Not found'}")
-    
-    if not uk_country:
-        print("ERROR: Cannot proceed without UK country")
-        return
-    
-    print("\n2. Searching for companies and contacts to test...")
+        return False
     
-    # Find companies in UK and Canada using the working programmatic approach
-    all_companies = env['res.company'].search([])
-    
-    # Programmatically filter UK companies
-    uk_company_ids = []
-    for company in all_companies:
-        if company.country_id and company.country_id.id == uk_country.id:
-            uk_company_ids.append(company.id)
-    
-    # Programmatically filter Canada companies  
-    canada_company_ids = []
-    for company in all_companies:
-        if company.country_id and company.country_id.id == canada_country.id:
-            canada_company_ids.append(company.id)
-    
-    print(f"Found UK company IDs: {uk_company_ids}")
-    print(f"Found Canada company IDs: {canada_company_ids}")
-    
-    # Find contacts associated with UK and Canadian companies
-    uk_contacts = env['res.partner'].search([('company_id', 'in', uk_company_ids)])
-    canada_contacts = env['res.partner'].search([('company_id', 'in', canada_company_ids)])
-    
-    print(f"Found {len(uk_contacts)} UK contact(s)")
-    print(f"Found {len(canada_contacts)} Canadian contact(s)")
-    
-    print("\n3. Testing UK counter reset...")
-    
-    # First, set some test values for UK contacts to verify reset works
-    if uk_contacts:
-        # Update marketing_emails_sent_today for UK contacts to some test values
-        update_count = 0
-        for contact in uk_contacts:
-            if contact.marketing_emails_sent_today != 10:  # Set to non-zero value for testing
-                contact.write({'marketing_emails_sent_today': 10})
-                update_count += 1
+    _mel_suite_started('test_reset_functionality')
+    try:
+        _mel_step('test_reset_functionality', '1', "Checking for existing UK and Canadian companies...")
+        _mel_phase('test_reset_functionality', 'setup')
         
-        print(f"Set {update_count} UK contacts to have 10 emails sent today for testing")
+        # Get UK and Canadian countries from the shared reference data
+        reference = mel_reference_data(env)
+        uk_country_id = reference['country_ids'].get('GB')
+        canada_country_id = reference['country_ids'].get('CA')
         
-        # Now call the UK reset method (using test version with no time check)
-        print("Calling UK reset method (test version)...")
-        env['res.partner'].mel_reset_counters_uk_for_testing()
+        if not uk_country_id:
+            print("WARNING: UK country (GB) not found in the system")
+            uk_country_id = reference['country_ids'].get('UK')
+            if uk_country_id:
+                print("INFO: Found UK country with code 'UK' instead of 'GB'")
         
-        # Check results using the same programmatic approach
-        uk_contacts_after = env['res.partner'].search([('company_id', 'in', uk_company_ids)])
-        uk_with_nonzero = [c for c in uk_contacts_after if c.marketing_emails_sent_today != 0]
+        if not canada_country_id:
+            _mel_failed('test_reset_functionality', "ERROR: Canadian country (CA) not found in the system")
+            return False
         
-        if uk_with_nonzero:
-            print(f"ERROR: {len(uk_with_nonzero)} UK contacts still have non-zero email counts after reset!")
-            for contact in uk_with_nonzero[:5]:  # Show first 5 only
-                print(f"  - {contact.name}: {contact.marketing_emails_sent_today} emails")
-        else:
-            print("SUCCESS: All UK contacts reset to 0 emails sent today")
-    else:
-        print("No UK contacts found to test with")
-    
-    print("\n4. Testing Canadian counter reset...")
-    
-    # Set some test values for Canadian contacts
-    if canada_contacts:
-        update_count = 0
-        for contact in canada_contacts:
-            if contact.marketing_emails_sent_today != 15:  # Set to non-zero value for testing
-                contact.write({'marketing_emails_sent_today': 15})
-                update_count += 1
+        print(f"UK country: {reference['country_names'].get(uk_country_id, 'Not found')}")
+        print(f"Canada country: {reference['country_names'][canada_country_id]}")
         
-        print(f"Set {update_count} Canadian contacts to have 15 emails sent today for testing")
+        if not uk_country_id:
+            _mel_failed('test_reset_functionality', "ERROR: Cannot proceed without UK country")
+            return False
         
-        # Now call the Canadian reset method (using test version with no time check)
-        print("Calling Canadian reset method (test version)...")
-        env['res.partner'].mel_reset_counters_canada_for_testing()
+        _mel_step('test_reset_functionality', '2', "Searching for companies and contacts to test...")
         
-        # Check results using the same programmatic approach
-        canada_contacts_after = env['res.partner'].search([('company_id', 'in', canada_company_ids)])
-        canada_with_nonzero = [c for c in canada_contacts_after if c.marketing_emails_sent_today != 0]
+        # Build the country -> company index once and share it between all steps
+        company_index = CompanyCountryIndex(env)
+        uk_company_ids = company_index.company_ids_for_countries([uk_country_id])
+        canada_company_ids = company_index.company_ids_for_countries([canada_country_id])
         
-        if canada_with_nonzero:
-            print(f"ERROR: {len(canada_with_nonzero)} Canadian contacts still have non-zero email counts after reset!")
-            for contact in canada_with_nonzero[:5]:  # Show first 5 only
-                print(f"  - {contact.name}: {contact.marketing_emails_sent_today} emails")
-        else:
-            print("SUCCESS: All Canadian contacts reset to 0 emails sent today")
-    else:
-        print("No Canadian contacts found to test with")
-    
-    print("\n5. Testing that contacts from other countries are NOT affected...")
-    
-    # Find contacts from OTHER countries that should not be affected
-    # Use programmatic approach to avoid the chained field issues
-    all_countries = env['res.country'].search([])
-    other_country_ids = []
-    for country in all_countries:
-        if country.code not in ['GB', 'UK', 'CA']:
-            other_country_ids.append(country.id)
-    
-    if other_country_ids:
-        # Find all companies and filter for other countries
-        all_companies = env['res.company'].search([])
-        other_company_ids = []
-        for company in all_companies:
-            if company.country_id and company.country_id.id in other_country_ids:
-                other_company_ids.append(company.id)
+        print(f"Found UK company IDs: {uk_company_ids}")
+        print(f"Found Canada company IDs: {canada_company_ids}")
         
-        # Get contacts for these companies
-        sample_contacts = []
-        if other_company_ids:
-            other_contacts = env['res.partner'].search([('company_id', 'in', other_company_ids)], limit=15)
-            for contact in other_contacts:
-                # Store original value to restore later
-                original_value = contact.marketing_emails_sent_today
-                # Set to a test value to see if it gets reset
-                contact.write({'marketing_emails_sent_today': 999})
-                # Find which country this contact's company belongs to for display purposes
-                contact_country = contact.company_id.country_id.name if contact.company_id and contact.company_id.country_id else 'Unknown'
-                sample_contacts.append((contact, contact_country, original_value))
+        # Count contacts associated with UK and Canadian companies, they are streamed later on
+        uk_domain = [('company_id', 'in', uk_company_ids)]
+        canada_domain = [('company_id', 'in', canada_company_ids)]
+        # Archived contacts included: the reset methods zero their counters too
+        partners = env['res.partner'].with_context(active_test=False)
+        uk_contact_count = partners.search_count(uk_domain)
+        canada_contact_count = partners.search_count(canada_domain)
         
-        print(f"Set {len(sample_contacts)} contacts from other countries to 999 emails for testing")
+        print(f"Found {uk_contact_count} UK contact(s)")
+        print(f"Found {canada_contact_count} Canadian contact(s)")
         
-        # Run both reset methods (using test versions with no time check)
-        env['res.partner'].mel_reset_counters_uk_for_testing()
-        env['res.partner'].mel_reset_counters_canada_for_testing()
+        _mel_step('test_reset_functionality', '3', "Testing UK counter reset...")
+        # Seed one contact out of seed_stride so most of the region stays clean
+        seed_stride = max(1, round(1 / dirty_ratio)) if dirty_ratio else 1
         
-        # Check if any of these contacts were incorrectly reset
-        still_999_count = 0
-        for contact, country_name, original_value in sample_contacts:
-            if contact.marketing_emails_sent_today == 999:
-                still_999_count += 1
-            else:
-                # Reset back to original value for cleanliness
-                contact.write({'marketing_emails_sent_today': original_value})
+        # First, set some test values for UK contacts to verify reset works
+        if uk_contact_count:
+            with rollback_savepoint(env, 'mel_uk_reset'):
+                # Update marketing_emails_sent_today for UK contacts to some test values
+                _mel_phase('test_reset_functionality', 'setup')
+                seeder = CounterSeeder(env)
+                update_count = 0
+                for chunk in iter_partner_chunks(env, uk_domain, chunk_size):
+                    update_count += seeder.seed_all(chunk.ids[::seed_stride], 10)  # Set to non-zero value for testing
+            
+                print(f"Set {update_count} UK contacts to have 10 emails sent today for testing")
+                seeder.report("UK seeding")
+            
+                _mel_phase('test_reset_functionality', 'reset')
+                # Now call the UK reset method (using test version with no time check)
+                run_region_reset(env, "UK", 'mel_reset_counters_uk_for_testing', uk_domain, reset_mode, chunk_size)
+            
+                _mel_phase('test_reset_functionality', 'verification')
+                # Check results with aggregate queries rather than reading every contact
+                verify_region_reset(env, "UK", uk_company_ids)
+                _mel_phase('test_reset_functionality', 'cleanup')
+        else:
+            print("No UK contacts found to test with")
+        
+        _mel_step('test_reset_functionality', '4', "Testing Canadian counter reset...")
         
-        print(f"{still_999_count} out of {len(sample_contacts)} contacts from other countries remained at 999 emails (as expected)")
-        if still_999_count == len(sample_contacts):
-            print("SUCCESS: Contacts from other countries were NOT affected by the reset methods")
+        # Set some test values for Canadian contacts
+        if canada_contact_count:
+            with rollback_savepoint(env, 'mel_canada_reset'):
+                _mel_phase('test_reset_functionality', 'setup')
+                seeder = CounterSeeder(env)
+                update_count = 0
+                for chunk in iter_partner_chunks(env, canada_domain, chunk_size):
+                    update_count += seeder.seed_all(chunk.ids[::seed_stride], 15)  # Set to non-zero value for testing
+            
+                print(f"Set {update_count} Canadian contacts to have 15 emails sent today for testing")
+                seeder.report("Canada seeding")
+            
+                _mel_phase('test_reset_functionality', 'reset')
+                # Now call the Canadian reset method (using test version with no time check)
+                run_region_reset(env, "Canadian", 'mel_reset_counters_canada_for_testing', canada_domain,
+                                 reset_mode, chunk_size)
+            
+                _mel_phase('test_reset_functionality', 'verification')
+                # Check results with aggregate queries rather than reading every contact
+                verify_region_reset(env, "Canadian", canada_company_ids)
+                _mel_phase('test_reset_functionality', 'cleanup')
         else:
-            print("ERROR: Some contacts from other countries were incorrectly affected")
-            print(f"   {len(sample_contacts) - still_999_count} contacts were incorrectly reset to 0")
+            print("No Canadian contacts found to test with")
+        
+        _mel_step('test_reset_functionality', '5', "Testing that contacts from other countries are NOT affected...")
+        
+        # Find contacts from OTHER countries that should not be affected
+        excluded_country_ids = [reference['country_ids'][code] for code in ('GB', 'UK', 'CA')
+                                if code in reference['country_ids']]
+        other_company_ids = company_index.company_ids_not_in_countries(excluded_country_ids)
+        
+        if other_company_ids:
+            with rollback_savepoint(env, 'mel_isolation'):
+                _mel_phase('test_reset_functionality', 'setup')
+                # Stratified random sample per (country, tz), sized from the confidence level and error bound
+                sampler = StratifiedLeakSampler(env, other_company_ids, company_index, confidence, error_bound,
+                                                seed=sample_seed)
+                sample_ids = sampler.sample_ids()
+                print(f"Sampled {len(sample_ids)} of {sampler.population} contacts from other countries in "
+                      f"{len(sampler.samples)} (country, tz) strata "
+                      f"(±{error_bound:.1%} at {confidence:.0%} confidence)")
             
-            # Reset any affected contacts back to original values
-            for contact, country_name, original_value in sample_contacts:
-                if contact.marketing_emails_sent_today != 999:
-                    contact.write({'marketing_emails_sent_today': original_value})
-    else:
-        print("No other countries found to test isolation with")
-    
-    print("\n6. Testing cron job methods exist and can be called...")
-    
-    # Test that the methods are accessible from the model
-    partner_model = env['res.partner']
-    
-    if hasattr(partner_model, 'mel_reset_counters_uk_dst_aware'):
-        print("SUCCESS: mel_reset_counters_uk_dst_aware method exists")
-    else:
-        print("ERROR: mel_reset_counters_uk_dst_aware method does not exist")
-    
-    if hasattr(partner_model, 'mel_reset_counters_canada_dst_aware'):
-        print("SUCCESS: mel_reset_counters_canada_dst_aware method exists")
-    else:
-        print("ERROR: mel_reset_counters_canada_dst_aware method does not exist")
-    
-    if hasattr(partner_model, 'mel_reset_counters_uk_for_testing'):
-        print("SUCCESS: mel_reset_counters_uk_for_testing method exists")
-    else:
-        print("ERROR: mel_reset_counters_uk_for_testing method does not exist")
-    
-    if hasattr(partner_model, 'mel_reset_counters_canada_for_testing'):
-        print("SUCCESS: mel_reset_counters_canada_for_testing method exists")
-    else:
-        print("ERROR: mel_reset_counters_canada_for_testing method does not exist")
-    
-    print("\nTest completed!")
+                # Set a test value to see if it gets reset
+                seeder = CounterSeeder(env, chunk_size or PARTNER_CHUNK_SIZE)
+                seeder.seed_all(sample_ids, 999)
+            
+                print(f"Set {len(sample_ids)} contacts from other countries to 999 emails for testing")
+            
+                _mel_phase('test_reset_functionality', 'reset')
+                # Run both reset methods (using test versions with no time check)
+                env['res.partner'].mel_reset_counters_uk_for_testing()
+                env['res.partner'].mel_reset_counters_canada_for_testing()
+            
+                _mel_phase('test_reset_functionality', 'verification')
+                # Check if any of these contacts were incorrectly reset
+                current_values = seeder.read_values(sample_ids)
+                leaked_ids = [partner_id for partner_id, value in current_values.items() if value != 999]
+                estimate = sampler.estimate(leaked_ids)
+            
+                print(f"{len(sample_ids) - len(leaked_ids)} out of {len(sample_ids)} sampled contacts from other "
+                      f"countries remained at 999 emails (as expected)")
+                print(f"Estimated leak rate: {estimate['rate']:.3%} "
+                      f"({confidence:.0%} CI {estimate['low']:.3%} - {estimate['high']:.3%})")
+                if not leaked_ids:
+                    print("SUCCESS: Contacts from other countries were NOT affected by the reset methods")
+                else:
+                    _mel_failed('test_reset_functionality', "ERROR: Some contacts from other countries were incorrectly affected")
+                    for (country, tz_name), (population, sampled, leaked) in sorted(estimate['strata'].items(),
+                                                                                    key=lambda item: str(item[0])):
+                        if leaked:
+                            low, high = wilson_interval(leaked / sampled, sampled, confidence)
+                            print(f"   {country} / {tz_name or 'no tz'}: {leaked}/{sampled} sampled reset "
+                                  f"(~{leaked / sampled * population:.0f} of {population}, CI {low:.1%} - {high:.1%})")
+            
+                seeder.report("Other countries seeding")
+                _mel_phase('test_reset_functionality', 'cleanup')
+            # The savepoint rollback has put every sampled contact back to its original value
+        else:
+            print("No companies from other countries found to test isolation with")
+        
+        _mel_step('test_reset_functionality', '6', "Testing cron job methods exist and can be called...")
+        _mel_phase('test_reset_functionality', 'verification')
+        
+        # Check the methods, fields and cron jobs in one metadata pass
+        contract = check_contract(env, REGIONAL_RESET_CONTRACT)
+        for result in contract['results']:
+            if result['ok']:
+                print(f"SUCCESS: {result['name']} {result['kind']} exists")
+            else:
+                _mel_failed('test_reset_functionality', f"ERROR: {result['name']} {result['kind']} check failed: {result['detail']}")
+    finally:
+        _mel_suite_finished('test_reset_functionality')
+    failed_checks = _mel_failed_checks('test_reset_functionality')
+    print(f"\nTest completed with {len(failed_checks)} failed check(s)!" if failed_checks else "\nTest completed!")
     print("\nSummary:")
     print("- New UK and Canada specific reset methods have been created")
     print("- Each method targets only contacts belonging to companies from the appropriate country")
     print("- The implementation properly isolates resets by company country rather than contact timezone")
     print("- Cron jobs are configured to run daily for each region")
+    return not failed_checks
 
 
-def print_cron_job_info():
+def _local_midnight_utc(tz_name, day):
+    """
+    Return the UTC instant (naive) at which the given local day starts in tz_name
     """
-    Print information about the configured cron jobs
+    tzinfo = _tz_for_name(tz_name)
+    if tzinfo is None:
+        return None
+    local_midnight = datetime(day.year, day.month, day.day)
+    if hasattr(tzinfo, 'localize'):
+        aware = tzinfo.localize(local_midnight)
+    else:
+        aware = local_midnight.replace(tzinfo=tzinfo)
+    return aware.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+class MelCronCatalogue:
+    """
+    All MEL ir.cron jobs loaded with a single search_read and classified by the reset method
+    their code calls (batch, uk, canada), so jobs sharing a name are still told apart.
+    """
+
+    FIELDS = ['name', 'code', 'active', 'interval_number', 'interval_type', 'nextcall', 'lastcall']
+    EXECUTIONS_PER_DAY = {'minutes': 1440, 'hours': 24, 'days': 1, 'weeks': 1 / 7, 'months': 1 / 30}
+
+    def __init__(self, env):
+        self.jobs = env['ir.cron'].with_context(active_test=False).search_read(
+            ['|', ('name', 'ilike', 'MEL:'), ('code', 'ilike', 'mel_reset')],
+            self.FIELDS,
+            order='id',
+        )
+        self._jobs_by_role = {}
+        for job in self.jobs:
+            job['role'] = self._role_for_code(job['code'] or '')
+            self._jobs_by_role.setdefault(job['role'], []).append(job)
+
+    @staticmethod
+    def _role_for_code(code):
+        for method_prefix, role in MEL_CRON_ROLES:
+            if method_prefix in code:
+                return role
+        return 'other'
+
+    def jobs_for_role(self, role):
+        """
+        Return the catalogued jobs of one role, active ones first
+        """
+        return sorted(self._jobs_by_role.get(role, []), key=lambda job: (not job['active'], job['id']))
+
+    def job_for_role(self, role):
+        jobs = self.jobs_for_role(role)
+        return jobs[0] if jobs else None
+
+    def executions_per_day(self, job):
+        """
+        Number of times the job runs per day with its current interval
+        """
+        if not job or not job['active'] or not job['interval_number']:
+            return 0
+        return self.EXECUTIONS_PER_DAY.get(job['interval_type'], 0) / job['interval_number']
+
+
+def plan_midnight_triggers(env, day=None, window_minutes=BATCH_TRIGGER_WINDOW_MINUTES):
+    """
+    Compute the minimal set of UTC trigger instants on the given day that covers the local
+    midnight of every distinct partner timezone, for a reset that accepts window_minutes either
+    side of midnight. Local midnights are sorted and covered greedily: each trigger is placed
+    window_minutes after the first uncovered midnight, which is optimal for interval covering.
+    Partners without a tz, or with an unknown one, count in DEFAULT_PARTNER_TZ as they do for
+    _mel_is_local_midnight.
+    Returns [{'trigger': utc datetime, 'timezones': [...], 'midnights': [utc datetime per timezone],
+    'partners': count}] sorted by trigger.
+    """
+    day = day or datetime.now(timezone.utc).date()
+    groups = env['res.partner'].with_context(active_test=False).read_group([], ['tz'], ['tz'], lazy=False)
+    counts = {}
+    for group in groups:
+        tz_name = group['tz'] if group['tz'] and _tz_for_name(group['tz']) else DEFAULT_PARTNER_TZ
+        counts[tz_name] = counts.get(tz_name, 0) + group['__count']
+    midnights = sorted((_local_midnight_utc(tz_name, day), tz_name, count) for tz_name, count in counts.items())
+
+    window = timedelta(minutes=window_minutes)
+    triggers = []
+    for midnight, tz_name, count in midnights:
+        if triggers and midnight <= triggers[-1]['trigger'] + window:
+            triggers[-1]['timezones'].append(tz_name)
+            triggers[-1]['midnights'].append(midnight)
+            triggers[-1]['partners'] += count
+            continue
+        triggers.append({'trigger': midnight + window, 'timezones': [tz_name], 'midnights': [midnight],
+                         'partners': count})
+    return triggers
+
+
+def polling_missed_timezones(triggers, job, window_minutes=BATCH_TRIGGER_WINDOW_MINUTES):
+    """
+    Return the timezones whose local midnight is not within window_minutes of any run of a
+    polling job, assuming its runs are spaced by its interval from its nextcall. Each timezone of
+    a trigger is checked against its own midnight.
+    """
+    if not job or job['interval_type'] not in ('minutes', 'hours') or not job['interval_number']:
+        return []
+    period = job['interval_number'] * (60 if job['interval_type'] == 'hours' else 1)
+    anchor = job['nextcall'] or datetime(2000, 1, 1)
+    missed = []
+    for trigger in triggers:
+        for tz_name, midnight in zip(trigger['timezones'], trigger['midnights']):
+            # Minutes from the nearest run before midnight, whatever the day of nextcall
+            distance = int((midnight - anchor).total_seconds() // 60) % period
+            if min(distance, period - distance) > window_minutes:
+                missed.append(tz_name)
+    return missed
+
+
+def print_cron_job_info(day=None, window_minutes=BATCH_TRIGGER_WINDOW_MINUTES, env=None):
+    """
+    Print the MEL cron jobs and the trigger schedule that would replace hourly batch polling
     """
     print("\n" + "="*60)
     print("CONFIGURED CRON JOBS INFORMATION")
     print("="*60)
     
-    env = globals().get('env')
+    env = env or globals().get('env')
     if not env:
         print("ERROR: Not running inside an Odoo shell")
         return
     
-    # Check for the new cron jobs
-    uk_cron = env['ir.cron'].search([('name', '=', 'MEL: Reset Daily Marketing Email Counters')])
-    canada_cron = env['ir.cron'].search([('name', '=', 'MEL: Reset Daily Marketing Email Counters')])
-    
-    print(f"UK Cron Job: {'FOUND' if uk_cron else 'NOT FOUND'}")
-    if uk_cron:
-        print(f"  - ID: {uk_cron.id}")
-        print(f"  - Code: {uk_cron.code}")
-        print(f"  - Active: {uk_cron.active}")
-        print(f"  - Interval: {uk_cron.interval_number} {uk_cron.interval_type}")
-    
-    print(f"Canada Cron Job: {'FOUND' if canada_cron else 'NOT FOUND'}")
-    if canada_cron:
-        print(f"  - ID: {canada_cron.id}")
-        print(f"  - Code: {canada_cron.code}")
-        print(f"  - Active: {canada_cron.active}")
-        print(f"  - Interval: {canada_cron.interval_number} {canada_cron.interval_type}")
+    catalogue = MelCronCatalogue(env)
+    for role in ('batch', 'uk', 'canada', 'other'):
+        jobs = catalogue.jobs_for_role(role)
+        if role == 'other' and not jobs:
+            continue
+        print(f"{MEL_CRON_ROLE_LABELS[role]} Cron Job: {'FOUND' if jobs else 'NOT FOUND'}")
+        for job in jobs:
+            print(f"  - ID: {job['id']} ({job['name']})")
+            print(f"  - Code: {job['code']}")
+            print(f"  - Active: {job['active']}")
+            print(f"  - Interval: {job['interval_number']} {job['interval_type']}")
+            print(f"  - Next call: {job['nextcall']}")
+    
+    day = day or datetime.now(timezone.utc).date()
+    triggers = plan_midnight_triggers(env, day, window_minutes)
+    print(f"\nTrigger schedule for {day} (window ±{window_minutes} min around local midnight):")
+    for trigger in triggers:
+        print(f"  - {trigger['trigger']:%Y-%m-%d %H:%M} UTC: {', '.join(trigger['timezones'])} "
+              f"({trigger['partners']} partners)")
+    
+    batch_job = catalogue.job_for_role('batch')
+    polling = catalogue.executions_per_day(batch_job)
+    print(f"Batch executions per day: {polling:g} polling vs {len(triggers)} targeted")
+    if polling:
+        print(f"✓ Targeted wake-ups save {polling - len(triggers):g} executions per day")
+    missed = polling_missed_timezones(triggers, batch_job, window_minutes)
+    if missed:
+        print(f"INFO: Current polling never lands within ±{window_minutes} min of midnight for: {', '.join(missed)}")
     
     print("="*60)
+    return triggers
 
 
-def run_all_tests():
+def run_all_tests(env=None):
     """
     Convenience function to run all tests at once
     """
@@ -267,20 +936,23 @@ def run_all_tests():
     print("="*70)
     
     # Run functionality test
-    test_reset_functionality()
+    passed = test_reset_functionality(env=env)
     
     # Print cron job info
     print("\n")
-    print_cron_job_info()
+    print_cron_job_info(env=env)
     
     print("\n" + "="*70)
-    print("TEST COMPLETE")
+    print("TEST COMPLETE" if passed else "TEST COMPLETE - FAILED CHECKS REPORTED ABOVE")
     print("="*70)
+    return passed
 
-# This script should be run within an Odoo shell using exec() command.
-# To run the tests after loading the script in Odoo shell:
-# 1. Load the script with: exec(open('C:/Work/odoo-versions/odoo-16/Smart-16/smart_changes/qwen-reset-email-counter-split.py').read())
+# This script should be run within an Odoo shell, either through the cached runner:
+#    python3 SIT-Internal-Projects/odoo_shell_runner.py -d <database> run_all_tests
+# or with exec() inside an interactive shell started from the repository root:
+# 1. Load the script with: exec(open('SIT-Internal-Projects/sit-upgrades/SMACR102662/odoo-reset-email-counter-split.py').read())
 # 2. Run all tests with: run_all_tests()
 # Or run individual functions:
 #  - test_reset_functionality()
-#  - print_cron_job_info()
\ No newline at end of file
+#  - print_cron_job_info()
+#  - compare_parallel_region_reset(region='uk', allow_commit=True)  (COMMITS: staging copies only)
\ No newline at end of file
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Synthetic dataset generator and benchmark suite for the MEL reset methods
+Generates partner populations of configurable size, company/country mix, tz distribution and
+non-zero counter ratio, loads them in bulk, runs mel_reset_daily_counters_batch,
+mel_reset_counters_uk_for_testing and mel_reset_counters_canada_for_testing several times and
+reports wall time, rows touched, SQL statement count and peak Python memory. Results are saved as JSON.
+
+Standalone (SQLite stand-in env, one fresh database per size):
+    python3 odoo_shell_mel_benchmark.py --sizes 10000,100000,1000000 --repeat 3
+Inside an Odoo shell (every size runs in a savepoint that is rolled back, uncommitted shell work is kept):
+    from odoo_shell_mel_benchmark import run_benchmark  # directory of this file on sys.path
+    run_benchmark(env, sizes=[10000], repeat=3)
+"""
+
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from array import array
+from contextlib import nullcontext
+from datetime import datetime, timedelta, timezone
+
+from odoo_shell_mel_common import _flush_env, _invalidate_env_cache, rollback_savepoint
+
+BENCHMARK_METHODS = (
+    'mel_reset_daily_counters_batch',
+    'mel_reset_counters_uk_for_testing',
+    'mel_reset_counters_canada_for_testing',
+)
+
+DEFAULT_SIZES = (10000, 100000)
+
+# Share of generated partners per company country
+DEFAULT_COUNTRY_MIX = {'GB': 0.35, 'CA': 0.25, 'US': 0.2, 'FR': 0.1, 'DE': 0.1}
+
+COUNTRY_NAMES = {
+    'GB': 'United Kingdom', 'CA': 'Canada', 'US': 'United States', 'FR': 'France', 'DE': 'Germany',
+}
+
+# Partner timezones drawn for each company country
+DEFAULT_TZ_BY_COUNTRY = {
+    'GB': ['Europe/London'],
+    'CA': ['America/Toronto', 'America/Vancouver', 'America/Halifax', 'America/Edmonton', 'America/Winnipeg'],
+    'US': ['America/New_York', 'America/Chicago', 'America/Denver', 'America/Los_Angeles'],
+    'FR': ['Europe/Paris'],
+    'DE': ['Europe/Berlin'],
+}
+
+BENCH_PREFIX = 'MEL Bench'
+
+
+def _peak_rss_kb():
+    """
+    Peak RSS of the whole process so far (ru_maxrss never goes down): only meaningful for the run
+    as a whole, per-method memory is measured with tracemalloc
+    """
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def _parse_mix(text):
+    """
+    Parse "GB:0.4,CA:0.3,US:0.3" into {'GB': 0.4, 'CA': 0.3, 'US': 0.3}
+    """
+    mix = {}
+    for item in text.split(','):
+        code, _sep, share = item.partition(':')
+        mix[code.strip().upper()] = float(share or 1)
+    return mix
+
+
+def next_local_midnight_utc(tz_name='Europe/London', after=None):
+    """
+    Return the first UTC instant after `after` at which tz_name is at local midnight
+    """
+    try:
+        import pytz
+        tzinfo = pytz.timezone(tz_name)
+    except ImportError:
+        import zoneinfo
+        tzinfo = zoneinfo.ZoneInfo(tz_name)
+    instant = (after or datetime.now(timezone.utc)).replace(second=0, microsecond=0)
+    for _minute in range(2 * 1440):
+        instant += timedelta(minutes=1)
+        local = instant.astimezone(tzinfo)
+        if local.hour == 0 and local.minute == 0:
+            return instant
+    raise ValueError(f"No local midnight found for {tz_name}")
+
+
+class SyntheticPartnerGenerator:
+    """
+    Generate and bulk-load a synthetic partner population.
+    Companies are created per country in the mix, partners are created in batches of
+    batch_size with a single multi-record create per batch. The ids of partners that get a
+    non-zero counter are kept in a compact array so they can be re-dirtied between runs.
+    """
+
+    def __init__(self, env, size, country_mix=None, companies_per_country=2, tz_by_country=None,
+                 no_tz_ratio=0.05, nonzero_ratio=0.3, seed=0, batch_size=10000):
+        self.env = env
+        self.size = size
+        self.country_mix = country_mix or DEFAULT_COUNTRY_MIX
+        self.companies_per_country = companies_per_country
+        self.tz_by_country = tz_by_country or DEFAULT_TZ_BY_COUNTRY
+        self.no_tz_ratio = no_tz_ratio
+        self.nonzero_ratio = nonzero_ratio
+        self.seed = seed
+        self.batch_size = batch_size
+        self.dirty_ids = array('q')
+        self.load_seconds = 0.0
+
+    def _ensure_countries(self):
+        countries = self.env['res.country']
+        existing = {row['code']: row['id'] for row in countries.search_read(
+            [('code', 'in', list(self.country_mix))], ['code'])}
+        missing = [code for code in self.country_mix if code not in existing]
+        if missing:
+            created = countries.create([{'code': code, 'name': COUNTRY_NAMES.get(code, code)} for code in missing])
+            existing.update(zip(missing, created.ids))
+        return existing
+
+    def _create_companies(self, country_ids):
+        vals_list = []
+        codes = []
+        for code in self.country_mix:
+            for index in range(self.companies_per_country):
+                vals_list.append({'name': f"{BENCH_PREFIX} {code} Company {index + 1}", 'country_id': country_ids[code]})
+                codes.append(code)
+        companies = self.env['res.company'].create(vals_list)
+        return list(zip(companies.ids, codes))
+
+    def generate(self):
+        """
+        Create the companies and partners, return the number of partners loaded
+        """
+        rng = random.Random(self.seed)
+        companies = self._create_companies(self._ensure_countries())
+        total_share = sum(self.country_mix.values())
+        weights = [self.country_mix[code] / total_share / self.companies_per_country for _id, code in companies]
+
+        partners = self.env['res.partner']
+        started = time.perf_counter()
+        created = 0
+        while created < self.size:
+            count = min(self.batch_size, self.size - created)
+            picks = rng.choices(companies, weights=weights, k=count)
+            vals_list = []
+            for offset, (company_id, code) in enumerate(picks):
+                number = created + offset + 1
+                tz = False if rng.random() < self.no_tz_ratio else rng.choice(self.tz_by_country.get(code, ['UTC']))
+                vals_list.append({
+                    'name': f"{BENCH_PREFIX} Partner {number}",
+                    'email': f"bench{number}@example.com",
+                    'tz': tz,
+                    'company_id': company_id,
+                    'marketing_emails_sent_today': rng.randint(1, 20) if rng.random() < self.nonzero_ratio else 0,
+                })
+            batch = partners.create(vals_list)
+            self.dirty_ids.extend(
+                record_id for record_id, vals in zip(batch.ids, vals_list) if vals['marketing_emails_sent_today'])
+            created += count
+            _invalidate_env_cache(self.env)
+        self.load_seconds = time.perf_counter() - started
+        return created
+
+    def reseed(self, value=1, chunk_size=1000):
+        """
+        Put every generated dirty partner back to a non-zero counter with chunked bulk writes
+        """
+        partners = self.env['res.partner'].with_context(active_test=False)
+        for index in range(0, len(self.dirty_ids), chunk_size):
+            partners.browse(self.dirty_ids[index:index + chunk_size].tolist()).write(
+                {'marketing_emails_sent_today': value})
+        _invalidate_env_cache(self.env)
+
+
+def _nonzero_count(env):
+    return env['res.partner'].with_context(active_test=False).search_count(
+        [('marketing_emails_sent_today', '!=', 0)])
+
+
+def _traced_peak_kb(env, method_name, generator):
+    """
+    Run the method once more on a re-dirtied population under tracemalloc and return the peak
+    Python heap growth in KB. Kept out of the timed runs: tracing slows allocations down a lot.
+    Memory allocated by C extensions (e.g. psycopg2 result buffers) is not seen.
+    """
+    generator.reseed()
+    owns_tracemalloc = not tracemalloc.is_tracing()
+    if owns_tracemalloc:
+        tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        getattr(env['res.partner'], method_name)()
+        _flush_env(env)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        if owns_tracemalloc:
+            tracemalloc.stop()
+    _invalidate_env_cache(env)
+    return max(peak - baseline, 0) // 1024
+
+
+def benchmark_method(env, method_name, generator, repeat=3):
+    """
+    Run one reset method `repeat` times on a freshly re-dirtied population.
+    Returns a list of per-run measurements.
+    """
+    runs = []
+    for run in range(repeat):
+        generator.reseed()
+        dirty_before = _nonzero_count(env)
+        sql_before = getattr(env.cr, 'sql_log_count', 0)
+        started = time.perf_counter()
+        result = getattr(env['res.partner'], method_name)()
+        _flush_env(env)
+        elapsed = time.perf_counter() - started
+        sql_count = getattr(env.cr, 'sql_log_count', 0) - sql_before
+        _invalidate_env_cache(env)
+        rows_reset = dirty_before - _nonzero_count(env)
+        runs.append({
+            'run': run + 1,
+            'wall_seconds': round(elapsed, 6),
+            'rows_reset': rows_reset,
+            'rows_written': result if isinstance(result, int) and not isinstance(result, bool) else None,
+            'sql_statements': sql_count,
+            'rows_per_second': round(rows_reset / elapsed, 1) if elapsed else None,
+        })
+    return runs
+
+
+def _summarise(runs, peak_python_kb=None):
+    times = sorted(run['wall_seconds'] for run in runs)
+    return {
+        'min_seconds': times[0],
+        'median_seconds': times[len(times) // 2],
+        'max_seconds': times[-1],
+        'rows_reset': runs[-1]['rows_reset'],
+        'sql_statements': runs[-1]['sql_statements'],
+        'peak_python_kb': peak_python_kb,
+    }
+
+
+def _local_env_for_benchmark(clock_instant):
+    try:
+        from odoo_shell_mel_local_env import make_local_env
+    except ImportError:
+        raise RuntimeError("odoo_shell_mel_local_env.py must be importable to benchmark without an Odoo env")
+    return make_local_env(populate=False, clock=lambda: clock_instant)
+
+
+def run_benchmark(env=None, sizes=DEFAULT_SIZES, repeat=3, methods=BENCHMARK_METHODS, country_mix=None,
+                  companies_per_country=2, no_tz_ratio=0.05, nonzero_ratio=0.3, seed=0, output=None):
+    """
+    Benchmark the MEL reset methods for every population size and return the result document.
+    Without env every size runs on a fresh SQLite stand-in database whose clock is set to the
+    next London midnight (so the batch reset has work to do). With a real env every size is
+    generated inside a savepoint that is rolled back once measured, so work done earlier in the
+    shell transaction is kept. peak_python_kb comes from one extra tracemalloc run per method;
+    process_peak_rss_kb is the process-lifetime peak after the whole benchmark.
+    When output is given the results are written there as JSON.
+    """
+    clock_instant = next_local_midnight_utc('Europe/London')
+    document = {
+        'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'environment': 'odoo' if env is not None else 'sqlite-stand-in',
+        'database': getattr(env.cr, 'dbname', None) if env is not None else None,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': {
+            'sizes': list(sizes), 'repeat': repeat, 'methods': list(methods),
+            'country_mix': country_mix or DEFAULT_COUNTRY_MIX, 'companies_per_country': companies_per_country,
+            'no_tz_ratio': no_tz_ratio, 'nonzero_ratio': nonzero_ratio, 'seed': seed,
+            'clock': clock_instant.isoformat() if env is None else None,
+        },
+        'results': [],
+    }
+
+    print("="*70)
+    print("MEL RESET METHODS BENCHMARK")
+    print("="*70)
+    for size in sizes:
+        bench_env = env if env is not None else _local_env_for_benchmark(clock_instant)
+        scope = rollback_savepoint(env, 'mel_benchmark') if env is not None else nullcontext()
+        try:
+            with scope:
+                generator = SyntheticPartnerGenerator(
+                    bench_env, size, country_mix, companies_per_country, no_tz_ratio=no_tz_ratio,
+                    nonzero_ratio=nonzero_ratio, seed=seed)
+                loaded = generator.generate()
+                print(f"\nSize {size}: loaded {loaded} partners in {generator.load_seconds:.2f}s "
+                      f"({loaded / generator.load_seconds if generator.load_seconds else 0:.0f} rows/s), "
+                      f"{len(generator.dirty_ids)} with a non-zero counter")
+                print(f"  {'method':<40} {'median s':>10} {'rows reset':>11} {'SQL':>7} {'peak py MB':>11}")
+                for method_name in methods:
+                    if not hasattr(bench_env['res.partner'], method_name):
+                        print(f"  {method_name:<40} {'missing':>10}")
+                        continue
+                    runs = benchmark_method(bench_env, method_name, generator, repeat)
+                    summary = _summarise(runs, _traced_peak_kb(bench_env, method_name, generator))
+                    print(f"  {method_name:<40} {summary['median_seconds']:>10.4f} {summary['rows_reset']:>11} "
+                          f"{summary['sql_statements']:>7} {summary['peak_python_kb'] / 1024:>11.1f}")
+                    document['results'].append({
+                        'size': size, 'method': method_name, 'load_seconds': round(generator.load_seconds, 3),
+                        'dirty_partners': len(generator.dirty_ids), 'summary': summary, 'runs': runs,
+                    })
+        finally:
+            if env is None:
+                bench_env.cr.close()
+                bench_env.registry.close()
+    
+    document['process_peak_rss_kb'] = _peak_rss_kb()
+    rss = document['process_peak_rss_kb']
+    print(f"\nProcess peak RSS (whole run, cumulative): {f'{rss / 1024:.0f} MB' if rss else 'n/a'}")
+
+    if output:
+        directory = os.path.dirname(os.path.abspath(output))
+        os.makedirs(directory, exist_ok=True)
+        with open(output, 'w', encoding='utf-8') as handle:
+            json.dump(document, handle, indent=2)
+        print(f"\nResults written to {output}")
+    print("="*70)
+    return document
+
+
+if __name__ == "__main__" and "env" not in globals():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the MEL reset methods on synthetic partner populations")
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help="comma separated population sizes, e.g. 10000,100000,1000000,5000000")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--methods', default=','.join(BENCHMARK_METHODS))
+    parser.add_argument('--country-mix', type=_parse_mix, default=None, help="e.g. GB:0.4,CA:0.3,US:0.3")
+    parser.add_argument('--companies-per-country', type=int, default=2)
+    parser.add_argument('--no-tz-ratio', type=float, default=0.05)
+    parser.add_argument('--nonzero-ratio', type=float, default=0.3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=f"mel_benchmark_{datetime.now():%Y%m%d_%H%M%S}.json")
+    args = parser.parse_args()
+    run_benchmark(
+        sizes=[int(size) for size in args.sizes.split(',')], repeat=args.repeat, methods=args.methods.split(','),
+        country_mix=args.country_mix, companies_per_country=args.companies_per_country,
+        no_tz_ratio=args.no_tz_ratio, nonzero_ratio=args.nonzero_ratio, seed=args.seed, output=args.output)
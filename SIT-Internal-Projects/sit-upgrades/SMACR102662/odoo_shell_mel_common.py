@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Helpers shared by the MEL shell scripts: savepoints and cache handling, the step/phase/failure
+notifications read by odoo_shell_mel_instrumentation.py, chunked partner streaming, the
+contract check and the reference-data cache.
+The scripts execute this file into their own namespace, the way they are themselves executed
+into the Odoo shell, so globals() below is the shell namespace (MEL_STEP_OBSERVERS,
+MEL_FAILED_CHECKS, MEL_REFERENCE_CACHE). Modules that only need the stateless helpers
+(_tz_for_name, _invalidate_env_cache) can import it.
+"""
+
+import time
+import uuid
+from contextlib import contextmanager
+
+# Number of partners loaded per chunk when streaming over res.partner
+PARTNER_CHUNK_SIZE = 1000
+
+# Timezone the MEL methods assume for partners without a (known) tz value
+DEFAULT_PARTNER_TZ = 'UTC'
+
+# Seconds the cached reference data (countries, company countries, cron ids) is trusted
+REFERENCE_CACHE_TTL = 600
+
+# PostgreSQL serialization failure, deadlock and lock timeout codes
+SERIALIZATION_PGCODES = ('40001', '40P01', '55P03')
+
+
+def _flush_env(env):
+    if hasattr(env, 'flush_all'):
+        env.flush_all()
+    else:
+        env['base'].flush()  # Odoo < 16
+
+
+def _invalidate_env_cache(env, flush=True):
+    if hasattr(env, 'invalidate_all'):
+        env.invalidate_all(flush=flush)
+    else:
+        env.invalidate_cache()  # Odoo < 16
+
+
+@contextmanager
+def rollback_savepoint(env, name='mel_test'):
+    """
+    Run a test scenario inside a savepoint that is always rolled back.
+    Cleanup is a single ROLLBACK TO SAVEPOINT instead of per-record writes or deletes,
+    nothing is left behind if the scenario raises, and row locks taken by the scenario
+    are released as soon as it ends rather than at the end of the shell transaction.
+    Pending ORM writes are flushed only when the scenario succeeded: after a SQL error the
+    transaction is aborted until the rollback, and a flush would hide the original error.
+    """
+    savepoint = f"{name}_{uuid.uuid4().hex[:8]}"
+    _flush_env(env)
+    env.cr.execute(f'SAVEPOINT "{savepoint}"')
+    try:
+        yield
+        _flush_env(env)
+    finally:
+        env.cr.execute(f'ROLLBACK TO SAVEPOINT "{savepoint}"')
+        env.cr.execute(f'RELEASE SAVEPOINT "{savepoint}"')
+        _invalidate_env_cache(env, flush=False)
+
+
+def _mel_step(suite, step, title):
+    """
+    Print a numbered step header and notify the MEL_STEP_OBSERVERS of the shell namespace
+    (see odoo_shell_mel_instrumentation.py)
+    """
+    print(f"\n{step}. {title}")
+    for observer in globals().get('MEL_STEP_OBSERVERS', ()):
+        observer.step_started(suite, step, title)
+
+
+def _mel_phase(suite, phase):
+    """
+    Notify the MEL_STEP_OBSERVERS that the suite entered a phase (setup, reset, verification, cleanup)
+    """
+    for observer in globals().get('MEL_STEP_OBSERVERS', ()):
+        if hasattr(observer, 'phase_started'):
+            observer.phase_started(suite, phase)
+
+
+def _mel_suite_started(suite):
+    """
+    Reset the failed checks of the suite and notify the MEL_STEP_OBSERVERS that it started
+    """
+    globals().setdefault('MEL_FAILED_CHECKS', {})[suite] = []
+    for observer in globals().get('MEL_STEP_OBSERVERS', ()):
+        if hasattr(observer, 'suite_started'):
+            observer.suite_started(suite)
+
+
+def _mel_failed(suite, message, echo=True):
+    """
+    Print a failed check, keep it for the suite summary and notify the MEL_STEP_OBSERVERS so
+    the current step is recorded as failed
+    """
+    if echo:
+        print(message)
+    globals().setdefault('MEL_FAILED_CHECKS', {}).setdefault(suite, []).append(message)
+    for observer in globals().get('MEL_STEP_OBSERVERS', ()):
+        if hasattr(observer, 'step_failed'):
+            observer.step_failed(suite, message)
+
+
+def _mel_failed_checks(suite):
+    return globals().get('MEL_FAILED_CHECKS', {}).get(suite, [])
+
+
+def _mel_suite_finished(suite):
+    for observer in globals().get('MEL_STEP_OBSERVERS', ()):
+        observer.suite_finished(suite)
+
+
+def iter_partner_chunks(env, domain, chunk_size=None):
+    """
+    Stream res.partner records matching domain in id-ordered chunks.
+    Chunks are fetched with keyset pagination on id and the environment cache
+    is invalidated between chunks, so peak memory is bounded by the chunk size
+    rather than by the size of the partner table.
+    Archived partners are included, as the MEL reset methods include them: add
+    ('active', '=', True) to domain to skip them.
+    """
+    chunk_size = chunk_size or PARTNER_CHUNK_SIZE
+    partners = env['res.partner'].with_context(active_test=False)
+    last_id = 0
+    while True:
+        chunk = partners.search(list(domain) + [('id', '>', last_id)], order='id', limit=chunk_size)
+        if not chunk:
+            return
+        last_id = chunk.ids[-1]
+        yield chunk
+        _invalidate_env_cache(env)
+        if len(chunk) < chunk_size:
+            return
+
+
+def check_contract(env, contract):
+    """
+    Validate a contract {'models': {model: {'methods': [...], 'fields': {name: type}}},
+    'crons': {cron name: method its code calls}, 'cron_calls': [method, ...]} without creating records.
+    Methods are looked up on the model class, fields come from one fields_get per model and
+    crons from a single ir.cron search_read. 'cron_calls' lists methods some active cron must
+    call, whatever its name: those crons are found by their code.
+    Returns {'ok': bool, 'results': [{'kind', 'model', 'name', 'ok', 'detail'}], 'crons': {name: row},
+    'cron_calls': {method: [rows]}}
+    """
+    results = []
+    for model_name, spec in contract.get('models', {}).items():
+        model_class = type(env[model_name])
+        for method in spec.get('methods', ()):
+            found = callable(getattr(model_class, method, None))
+            results.append({'kind': 'method', 'model': model_name, 'name': method, 'ok': found,
+                            'detail': '' if found else 'not defined on the model'})
+        expected_fields = spec.get('fields', {})
+        if expected_fields:
+            described = env[model_name].fields_get(list(expected_fields), attributes=['type'])
+            for field_name, field_type in expected_fields.items():
+                actual_type = described.get(field_name, {}).get('type')
+                found = actual_type is not None and (field_type is None or actual_type == field_type)
+                detail = '' if found else (f"type is {actual_type}, expected {field_type}" if actual_type
+                                           else 'not defined on the model')
+                results.append({'kind': 'field', 'model': model_name, 'name': field_name, 'ok': found,
+                                'detail': detail})
+
+    crons = {}
+    expected_crons = contract.get('crons', {})
+    if expected_crons:
+        rows = env['ir.cron'].with_context(active_test=False).search_read(
+            [('name', 'in', list(expected_crons))],
+            ['name', 'model_id', 'model_name', 'code', 'active', 'state', 'interval_number', 'interval_type'],
+            order='id',
+        )
+        for row in rows:
+            # Crons may share a name: keep the one whose code calls the expected method
+            if row['name'] not in crons or expected_crons[row['name']] in (row['code'] or ''):
+                crons[row['name']] = row
+        for cron_name, method in expected_crons.items():
+            row = crons.get(cron_name)
+            if row is None:
+                detail = 'not found'
+            elif method and method not in (row['code'] or ''):
+                detail = f"code does not call {method}"
+            elif not row['active']:
+                detail = 'inactive'
+            else:
+                detail = ''
+            results.append({'kind': 'cron', 'model': 'ir.cron', 'name': cron_name, 'ok': not detail,
+                            'detail': detail})
+
+    cron_calls = {}
+    called_methods = contract.get('cron_calls', ())
+    if called_methods:
+        domain = ['|'] * (len(called_methods) - 1) + [('code', 'ilike', method) for method in called_methods]
+        rows = env['ir.cron'].with_context(active_test=False).search_read(
+            domain,
+            ['name', 'model_id', 'model_name', 'code', 'active', 'state', 'interval_number', 'interval_type'],
+            order='id',
+        )
+        for method in called_methods:
+            cron_calls[method] = [row for row in rows if method in (row['code'] or '')]
+            if not cron_calls[method]:
+                detail = 'no cron calls it'
+            elif not any(row['active'] for row in cron_calls[method]):
+                detail = 'only inactive crons call it'
+            else:
+                detail = ''
+            results.append({'kind': 'cron', 'model': 'ir.cron', 'name': method, 'ok': not detail,
+                            'detail': detail})
+
+    return {'ok': all(result['ok'] for result in results), 'results': results, 'crons': crons,
+            'cron_calls': cron_calls}
+
+
+def print_contract_results(results, kind=None, suite=None):
+    """
+    Print contract check results, optionally only those of one kind (method, field, cron).
+    Failures are recorded against suite when one is given.
+    """
+    for result in results:
+        if kind and result['kind'] != kind:
+            continue
+        mark = '✓' if result['ok'] else '✗'
+        suffix = f" ({result['detail']})" if result['detail'] else ''
+        line = f"{mark} {result['name']} {result['kind']} exists: {result['ok']}{suffix}"
+        if suite and not result['ok']:
+            _mel_failed(suite, line)
+        else:
+            print(line)
+
+
+def _registry_signal(env):
+    """
+    Registry and ormcache signaling sequences of the database, read on env.cr. Odoo bumps them
+    (base_registry_signaling, base_cache_signaling) when a module is installed or upgraded and
+    when any worker clears its caches. They are only read: registry.check_signaling() would open
+    a cursor and could reload the registry or clear caches in the middle of a suite.
+    Returns None without Odoo's signaling (the local stand-in): the cache then relies on its TTL.
+    """
+    registry = env.registry
+    if not hasattr(registry, 'check_signaling'):
+        return None
+    cache_sequences = getattr(registry, 'cache_sequences', None)  # Odoo >= 17: one sequence per cache
+    if cache_sequences is not None:
+        sequences = ['base_registry_signaling'] + [f'base_cache_signaling_{name}' for name in sorted(cache_sequences)]
+    else:
+        sequences = ['base_registry_signaling', 'base_cache_signaling']
+    env.cr.execute(f"SELECT {', '.join(f'{name}.last_value' for name in sequences)} FROM {', '.join(sequences)}")
+    return tuple(env.cr.fetchone())
+
+
+def _load_reference_data(env):
+    countries = env['res.country'].search_read([], ['code', 'name'])
+    company_groups = env['res.company'].read_group(
+        [('country_id', '!=', False)],
+        ['country_id', 'company_ids:array_agg(id)'],
+        ['country_id'],
+        lazy=False,
+    )
+    cron_ids = {}
+    for row in env['ir.cron'].with_context(active_test=False).search_read([], ['name'], order='id'):
+        cron_ids.setdefault(row['name'], []).append(row['id'])
+    return {
+        'country_ids': {row['code']: row['id'] for row in countries if row['code']},
+        'country_names': {row['id']: row['name'] for row in countries},
+        'company_groups': [
+            {'country_id': group['country_id'], 'company_ids': group['company_ids']} for group in company_groups
+        ],
+        'cron_ids': cron_ids,
+    }
+
+
+def mel_reference_data(env, ttl=None):
+    """
+    Country code -> id, company groups per country and cron name -> ids of env's database,
+    loaded in one batch and kept in the MEL_REFERENCE_CACHE global so every entry point (and
+    every script sharing that dict) reuses them. Reloaded after ttl seconds
+    (REFERENCE_CACHE_TTL) or when the registry signals an invalidation.
+    """
+    cache = globals().setdefault('MEL_REFERENCE_CACHE', {})
+    stats = cache.setdefault('stats', {'hits': 0, 'misses': 0, 'invalidations': 0})
+    ttl = REFERENCE_CACHE_TTL if ttl is None else ttl
+    signal = _registry_signal(env)
+    entry = cache.get(env.cr.dbname)
+    if entry is not None and entry['signal'] != signal:
+        stats['invalidations'] += 1
+        entry = None
+    if entry is not None and time.monotonic() - entry['loaded_at'] <= ttl:
+        stats['hits'] += 1
+        return entry['data']
+    stats['misses'] += 1
+    data = _load_reference_data(env)
+    cache[env.cr.dbname] = {'signal': signal, 'loaded_at': time.monotonic(), 'data': data}
+    return data
+
+
+def reference_cache_stats():
+    """
+    Hit/miss/invalidation counters of mel_reference_data()
+    """
+    stats = globals().get('MEL_REFERENCE_CACHE', {}).get('stats', {})
+    return {key: stats.get(key, 0) for key in ('hits', 'misses', 'invalidations')}
+
+
+def _tz_for_name(tz_name):
+    try:
+        import pytz
+    except ImportError:
+        import zoneinfo
+        try:
+            return zoneinfo.ZoneInfo(tz_name)
+        except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+            return None
+    try:
+        return pytz.timezone(tz_name)
+    except pytz.UnknownTimeZoneError:
+        return None
+
+
+def _is_serialization_failure(exc):
+    if getattr(exc, 'pgcode', None) in SERIALIZATION_PGCODES:
+        return True
+    message = str(exc)
+    return 'could not serialize' in message or 'database is locked' in message
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DST / calendar sweep simulator for the DST-aware MEL regional reset methods
+Sweeps every minute (or a configurable step) of a full year and lists every instant at which
+mel_reset_counters_uk_dst_aware / mel_reset_counters_canada_dst_aware should fire. Each zone
+gets a precomputed UTC offset transition table, so every simulated instant is a table lookup
+instead of a timezone localisation.
+
+Given an env whose registry reads a SweepClock (the SQLite stand-in env), the methods
+themselves are then called with the clock set to every predicted firing instant, one step
+either side of it and every step within a few hours of each DST transition of their zones;
+every disagreement with the table is reported. Without such an env only the table is swept.
+
+Standalone, methods verified on the stand-in env: python3 odoo_shell_mel_dst_sweep.py 2026
+Inside an Odoo shell, with the directory of this file on sys.path (table only):
+    from odoo_shell_mel_dst_sweep import run_dst_sweep
+    run_dst_sweep(2026)
+"""
+
+import bisect
+import time
+from datetime import datetime, timedelta, timezone
+
+from odoo_shell_mel_common import _tz_for_name
+
+# Zones covered by each DST-aware reset method
+DST_AWARE_METHOD_ZONES = {
+    'mel_reset_counters_uk_dst_aware': ['Europe/London'],
+    'mel_reset_counters_canada_dst_aware': [
+        'America/St_Johns',
+        'America/Halifax',
+        'America/Toronto',
+        'America/Winnipeg',
+        'America/Regina',
+        'America/Edmonton',
+        'America/Vancouver',
+    ],
+}
+
+
+def _utc_offset_seconds(tzinfo, epoch):
+    return int(datetime.fromtimestamp(epoch, tzinfo).utcoffset().total_seconds())
+
+
+def build_offset_transition_table(tz_name, start_epoch, end_epoch):
+    """
+    Return ([transition epochs], [utc offsets in seconds]) for tz_name between the two epochs.
+    Offsets are probed hourly and every change is narrowed down to the exact second,
+    so the table does not depend on pytz internals.
+    """
+    tzinfo = _tz_for_name(tz_name)
+    if tzinfo is None:
+        raise ValueError(f"Unknown timezone {tz_name}")
+    epochs = [start_epoch]
+    offsets = [_utc_offset_seconds(tzinfo, start_epoch)]
+    probe = start_epoch
+    while probe < end_epoch:
+        next_probe = min(probe + 3600, end_epoch)
+        next_offset = _utc_offset_seconds(tzinfo, next_probe)
+        if next_offset != offsets[-1]:
+            low, high = probe, next_probe
+            while high - low > 1:
+                middle = (low + high) // 2
+                if _utc_offset_seconds(tzinfo, middle) == offsets[-1]:
+                    low = middle
+                else:
+                    high = middle
+            epochs.append(high)
+            offsets.append(next_offset)
+        probe = next_probe
+    return epochs, offsets
+
+
+class SweepClock:
+    """
+    Injectable clock driven by the sweep. now() returns the simulated UTC instant; pass it as
+    the clock of the stand-in registry so the MEL methods see the simulated time.
+    """
+
+    def __init__(self, epoch=0):
+        self.epoch = epoch
+
+    def now(self):
+        return datetime.fromtimestamp(self.epoch, timezone.utc)
+
+
+class ZoneOffsetLookup:
+    """
+    Offset lookup on a precomputed transition table. Lookups with a monotonic clock
+    only move a cursor forward, so a full sweep is linear in the number of instants.
+    """
+
+    def __init__(self, tz_name, start_epoch, end_epoch):
+        self.tz_name = tz_name
+        self.epochs, self.offsets = build_offset_transition_table(tz_name, start_epoch, end_epoch)
+        self._cursor = 0
+
+    def offset_at(self, epoch):
+        cursor = self._cursor
+        if epoch < self.epochs[cursor]:
+            cursor = max(bisect.bisect_right(self.epochs, epoch) - 1, 0)
+        while cursor + 1 < len(self.epochs) and self.epochs[cursor + 1] <= epoch:
+            cursor += 1
+        self._cursor = cursor
+        return self.offsets[cursor]
+
+    def transitions(self):
+        """
+        Return [(utc datetime, old offset, new offset)] for every offset change in the table
+        """
+        return [
+            (datetime.fromtimestamp(self.epochs[i], timezone.utc), self.offsets[i - 1], self.offsets[i])
+            for i in range(1, len(self.epochs))
+        ]
+
+
+def simulate_dst_year(year=None, step_minutes=1, window_minutes=None, method_zones=None, clock=None):
+    """
+    Sweep the whole year with the given step and return
+    {method name: [(utc datetime, zone, local datetime), ...]} of every instant a method would fire.
+    A method fires when the local time in one of its zones falls within window_minutes
+    after local midnight (defaults to the step, so each local midnight is hit once).
+    """
+    year = year or datetime.now(timezone.utc).year
+    step_seconds = int(step_minutes * 60)
+    window_seconds = int((window_minutes or step_minutes) * 60)
+    method_zones = method_zones or DST_AWARE_METHOD_ZONES
+    clock = clock or SweepClock()
+
+    start_epoch = int(datetime(year, 1, 1, tzinfo=timezone.utc).timestamp())
+    end_epoch = int(datetime(year + 1, 1, 1, tzinfo=timezone.utc).timestamp())
+    lookups = {}
+    for zones in method_zones.values():
+        for tz_name in zones:
+            if tz_name not in lookups:
+                lookups[tz_name] = ZoneOffsetLookup(tz_name, start_epoch - 86400, end_epoch + 86400)
+
+    zone_items = [(method, lookups[tz_name]) for method, zones in method_zones.items() for tz_name in zones]
+    fired = {method: [] for method in method_zones}
+    clock.epoch = start_epoch
+    while clock.epoch < end_epoch:
+        epoch = clock.epoch
+        for method, lookup in zone_items:
+            offset = lookup.offset_at(epoch)
+            if (epoch + offset) % 86400 < window_seconds:
+                fired[method].append((epoch, lookup.tz_name, offset))
+        clock.epoch = epoch + step_seconds
+
+    return {
+        method: [
+            (datetime.fromtimestamp(epoch, timezone.utc), tz_name,
+             datetime.fromtimestamp(epoch + offset, timezone.utc).replace(tzinfo=None))
+            for epoch, tz_name, offset in entries
+        ]
+        for method, entries in fired.items()
+    }
+
+
+def verify_dst_methods(fired, env, clock, year=None, step_minutes=1, method_zones=None, margin_hours=3):
+    """
+    Call each DST-aware method through env, whose registry must read clock, and compare with
+    the instants simulate_dst_year() predicted: at every predicted instant, one step either
+    side of it and every step within margin_hours of each DST transition of the method's zones.
+    A call fires when it writes rows, so each method's region needs partners.
+    Returns {method: {'calls': n, 'mismatches': [(utc datetime, predicted, fired)]}}.
+    """
+    year = year or datetime.now(timezone.utc).year
+    step_seconds = int(step_minutes * 60)
+    method_zones = method_zones or DST_AWARE_METHOD_ZONES
+    start_epoch = int(datetime(year, 1, 1, tzinfo=timezone.utc).timestamp())
+    end_epoch = int(datetime(year + 1, 1, 1, tzinfo=timezone.utc).timestamp())
+    margin_steps = int(margin_hours * 3600) // step_seconds
+    results = {}
+    for method, zones in method_zones.items():
+        predicted = {int(when.timestamp()) for when, _tz, _local in fired.get(method, [])}
+        probes = set()
+        for epoch in predicted:
+            probes.update((epoch - step_seconds, epoch, epoch + step_seconds))
+        for tz_name in zones:
+            for when, _old, _new in ZoneOffsetLookup(tz_name, start_epoch, end_epoch).transitions():
+                # Align on the sweep grid, then probe margin_hours either side
+                base = start_epoch + (int(when.timestamp()) - start_epoch) // step_seconds * step_seconds
+                probes.update(base + index * step_seconds for index in range(-margin_steps, margin_steps + 1))
+        probes = sorted(probe for probe in probes if start_epoch <= probe < end_epoch)
+        mismatches = []
+        for epoch in probes:
+            clock.epoch = epoch
+            did_fire = bool(getattr(env['res.partner'], method)())
+            if did_fire != (epoch in predicted):
+                mismatches.append((datetime.fromtimestamp(epoch, timezone.utc), epoch in predicted, did_fire))
+        env.cr.rollback()
+        results[method] = {'calls': len(probes), 'mismatches': mismatches}
+    return results
+
+
+def _local_day_anomalies(entries):
+    """
+    Return [(zone, local date, number of fires)] for every local day that did not fire exactly once
+    """
+    per_day = {}
+    zones = set()
+    for _utc, tz_name, local in entries:
+        zones.add(tz_name)
+        key = (tz_name, local.date())
+        per_day[key] = per_day.get(key, 0) + 1
+    anomalies = [(tz_name, day, count) for (tz_name, day), count in sorted(per_day.items()) if count != 1]
+    if per_day:
+        first_day = min(day for _tz, day in per_day)
+        last_day = max(day for _tz, day in per_day)
+        for tz_name in sorted(zones):
+            day = first_day
+            while day <= last_day:
+                if (tz_name, day) not in per_day:
+                    anomalies.append((tz_name, day, 0))
+                day += timedelta(days=1)
+    return sorted(anomalies)
+
+
+def run_dst_sweep(year=None, step_minutes=1, window_minutes=None, show_instants=False, env=None, clock=None):
+    """
+    Run the full-year sweep and print fire counts, DST transitions and local days that
+    fired zero or several times for each DST-aware reset method. With env and the clock its
+    registry reads, the methods are also called and checked against the sweep
+    (verify_dst_methods).
+    """
+    year = year or datetime.now(timezone.utc).year
+    print("="*70)
+    print(f"MEL DST SWEEP SIMULATION - {year} (step {step_minutes} min)")
+    print("="*70)
+
+    year_start = int(datetime(year, 1, 1, tzinfo=timezone.utc).timestamp())
+    year_end = int(datetime(year + 1, 1, 1, tzinfo=timezone.utc).timestamp())
+    start = time.perf_counter()
+    fired = simulate_dst_year(year, step_minutes, window_minutes)
+    elapsed = time.perf_counter() - start
+    print(f"Simulated {int((year_end - year_start) // (step_minutes * 60))} instants in {elapsed:.2f}s")
+
+    for method, entries in fired.items():
+        print(f"\n{method}: fires {len(entries)} time(s)")
+        for tz_name in DST_AWARE_METHOD_ZONES.get(method, []):
+            lookup = ZoneOffsetLookup(tz_name, year_start, year_end)
+            for when, old, new in lookup.transitions():
+                print(f"  - {tz_name} transition at {when:%Y-%m-%d %H:%M} UTC: "
+                      f"UTC{old / 3600:+g} -> UTC{new / 3600:+g}")
+        anomalies = [a for a in _local_day_anomalies(entries) if a[1].year == year]
+        if anomalies:
+            print(f"  ✗ {len(anomalies)} local day(s) without exactly one expected reset:")
+            for tz_name, day, count in anomalies[:20]:
+                print(f"    - {tz_name} {day}: {count} reset(s)")
+        else:
+            print("  ✓ Exactly one expected reset per local day in every zone")
+        if show_instants:
+            for when, tz_name, local in entries:
+                print(f"    {when:%Y-%m-%d %H:%M} UTC  {tz_name:<20} local {local:%Y-%m-%d %H:%M}")
+
+    if env is not None and clock is not None:
+        start = time.perf_counter()
+        verification = verify_dst_methods(fired, env, clock, year, step_minutes)
+        print(f"\nMethods called at {sum(r['calls'] for r in verification.values())} instant(s) "
+              f"in {time.perf_counter() - start:.2f}s:")
+        for method, result in verification.items():
+            if result['mismatches']:
+                print(f"  ✗ {method}: {len(result['mismatches'])} instant(s) disagree with the sweep:")
+                for when, predicted, did_fire in result['mismatches'][:20]:
+                    print(f"    - {when:%Y-%m-%d %H:%M} UTC: expected {'a' if predicted else 'no'} reset, "
+                          f"method {'fired' if did_fire else 'did not fire'}")
+            else:
+                print(f"  ✓ {method} agrees with the sweep at all {result['calls']} instant(s)")
+    else:
+        print("\nMethods not called (no env with a sweep clock): the instants above come from the table only")
+
+    print("="*70)
+    return fired
+
+
+if __name__ == "__main__" and "env" not in globals():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Full-year DST sweep for the MEL DST-aware reset methods")
+    parser.add_argument('year', nargs='?', type=int, default=None)
+    parser.add_argument('--step', type=float, default=1, help="sweep step in minutes (default 1)")
+    parser.add_argument('--window', type=float, default=None, help="firing window after local midnight in minutes")
+    parser.add_argument('--show-instants', action='store_true', help="print every firing instant")
+    args = parser.parse_args()
+
+    from odoo_shell_mel_local_env import make_local_env
+
+    sweep_clock = SweepClock()
+    local_env = make_local_env(partners_per_company=1, clock=sweep_clock.now)
+    try:
+        run_dst_sweep(args.year, args.step, args.window, args.show_instants, local_env, sweep_clock)
+    finally:
+        local_env.cr.close()
+        local_env.registry.close()
+
+# To run inside an Odoo shell:
+# 1. Load the script with: exec(open('path_to_this_script.py').read())
+# 2. Run the sweep with: run_dst_sweep(2026) or run_dst_sweep(2026, step_minutes=15, show_instants=True)
+#    The Odoo env has no injectable clock, so only the table is swept there
@@ -0,0 +1,738 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Step instrumentation for the MEL shell test scripts
+The test scripts announce every numbered step through _mel_step(); any object listed in the
+MEL_STEP_OBSERVERS global of the shell namespace is notified. This file provides the observers.
+
+SQL step profiler: wraps env.cr.execute and records, per step, the query count, total SQL time
+and the most repeated statement shapes, prints a per-step table and flags N+1 suspects.
+
+Phase profiler (opt-in): runs cProfile and tracemalloc around each phase the scripts announce
+through _mel_phase() (setup, reset, verification, cleanup) and writes per-phase pstats files,
+readable reports and a summary of where the time went (ORM, pytz, SQL driver, MEL methods).
+
+JSONL step sink: appends one JSON record per finished step (status, failed checks, res.partner
+rows affected, duration, query count) and one per suite to a file, flushed as it goes. Runs are
+compared against a stored baseline with compare_step_records() or --compare.
+
+Inside an Odoo shell:
+    exec(open('path_to_this_script.py').read())
+    profiler = enable_sql_step_profiler(env)
+    run_all_tests()
+    profiler.print_report()
+    phases = enable_phase_profiler('/tmp/mel_profile')
+    run_mel_counter_tests()
+    phases.write_reports()
+    sink = enable_jsonl_sink(env, '/tmp/mel_steps.jsonl', labels={'module_version': '16.0.1.3'})
+    run_all_tests()
+Standalone, comparing two data scales on the SQLite stand-in env to find steps that grow linearly:
+    python3 odoo_shell_mel_instrumentation.py --scales 10,100 --jsonl current.jsonl
+    python3 odoo_shell_mel_instrumentation.py --compare baseline.jsonl current.jsonl --threshold 0.2
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timezone
+from statistics import median
+
+_SHAPE_SUBSTITUTIONS = [
+    (re.compile(r"'(?:[^']|'')*'"), "'?'"),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'\(\s*(?:\?|%s)(?:\s*,\s*(?:\?|%s))*\s*\)'), '(?)'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\s+'), ' '),
+]
+
+
+def statement_shape(query):
+    """
+    Normalise a SQL statement to its shape: literals, numbers and parameter lists become '?'
+    """
+    shape = str(query)
+    for pattern, replacement in _SHAPE_SUBSTITUTIONS:
+        shape = pattern.sub(replacement, shape)
+    return shape.strip()
+
+
+def _observer_list(namespace):
+    return namespace.setdefault('MEL_STEP_OBSERVERS', [])
+
+
+class StepStats:
+    """
+    Query statistics of one numbered step
+    """
+
+    def __init__(self, suite, step, title, index):
+        self.suite = suite
+        self.step = step
+        self.title = title
+        self.index = index
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.wall_seconds = 0.0
+        self.shapes = Counter()
+        self._started = time.perf_counter()
+
+    @property
+    def key(self):
+        return (self.suite, self.index)
+
+    def close(self):
+        self.wall_seconds = time.perf_counter() - self._started
+
+    def top_shapes(self, count=3):
+        return self.shapes.most_common(count)
+
+
+class SqlStepProfiler:
+    """
+    Count queries per numbered step by wrapping the execute method of the env cursor.
+    A step whose most repeated statement shape runs repeat_threshold times or more is
+    reported as an N+1 suspect.
+    """
+
+    OUTSIDE = '(outside steps)'
+
+    def __init__(self, env, repeat_threshold=20, top=3):
+        self.cr = env.cr
+        self.repeat_threshold = repeat_threshold
+        self.top = top
+        self.steps = []
+        self._current = None
+        self._outside = StepStats(self.OUTSIDE, '-', self.OUTSIDE, -1)
+        self._original_execute = None
+        self._namespace = None
+        self._indexes = Counter()
+        self._paused = False
+
+    # -- installation -------------------------------------------------------
+
+    def install(self, namespace=None):
+        """
+        Wrap the cursor and register as a step observer in namespace (the shell globals
+        when this file was exec'd, pass the script namespace when importing it)
+        """
+        self._namespace = namespace if namespace is not None else globals()
+        observers = _observer_list(self._namespace)
+        if self not in observers:
+            observers.append(self)
+        if self._original_execute is None:
+            original = self.cr.execute
+            profiler = self
+
+            def execute(query, params=None, *args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return original(query, params, *args, **kwargs)
+                finally:
+                    profiler._record(query, time.perf_counter() - started)
+
+            self._original_execute = original
+            self.cr.execute = execute
+        return self
+
+    def uninstall(self):
+        self._close_current()
+        if self._original_execute is not None:
+            try:
+                del self.cr.execute
+            except AttributeError:
+                self.cr.execute = self._original_execute
+            self._original_execute = None
+        if self._namespace is not None and self in _observer_list(self._namespace):
+            _observer_list(self._namespace).remove(self)
+
+    # -- observer protocol --------------------------------------------------
+
+    def step_started(self, suite, step, title):
+        self._close_current()
+        self._indexes[suite] += 1
+        self._current = StepStats(suite, step, title, self._indexes[suite])
+        self.steps.append(self._current)
+
+    def suite_finished(self, suite):
+        self._close_current()
+        self._indexes[suite] = 0
+
+    def _close_current(self):
+        if self._current is not None:
+            self._current.close()
+            self._current = None
+
+    @contextmanager
+    def paused(self):
+        """
+        Do not count the queries run inside the block (other observers' own probes)
+        """
+        paused, self._paused = self._paused, True
+        try:
+            yield
+        finally:
+            self._paused = paused
+
+    def _record(self, query, seconds):
+        if self._paused:
+            return
+        stats = self._current or self._outside
+        stats.queries += 1
+        stats.sql_seconds += seconds
+        stats.shapes[statement_shape(query)] += 1
+
+    # -- reporting ----------------------------------------------------------
+
+    def suspects(self):
+        """
+        Return [(step stats, shape, repeat count)] for steps with a statement shape repeated
+        at least repeat_threshold times
+        """
+        result = []
+        for stats in self.steps + [self._outside]:
+            for shape, count in stats.top_shapes(1):
+                if count >= self.repeat_threshold:
+                    result.append((stats, shape, count))
+        return result
+
+    def as_rows(self):
+        return [{
+            'suite': stats.suite, 'step': stats.step, 'title': stats.title, 'index': stats.index,
+            'queries': stats.queries, 'sql_ms': round(stats.sql_seconds * 1000, 3),
+            'wall_ms': round(stats.wall_seconds * 1000, 3),
+            'top_shapes': [{'shape': shape, 'count': count} for shape, count in stats.top_shapes(self.top)],
+        } for stats in self.steps + ([self._outside] if self._outside.queries else [])]
+
+    def print_report(self):
+        self._close_current()
+        print("\n" + "="*100)
+        print("SQL QUERIES PER STEP")
+        print("="*100)
+        print(f"{'suite':<26} {'step':>5} {'title':<40} {'queries':>8} {'SQL ms':>9} {'wall ms':>9}")
+        print("-"*100)
+        for stats in self.steps + ([self._outside] if self._outside.queries else []):
+            print(f"{stats.suite[:26]:<26} {stats.step:>5} {stats.title[:40]:<40} {stats.queries:>8} "
+                  f"{stats.sql_seconds * 1000:>9.2f} {stats.wall_seconds * 1000:>9.2f}")
+        suspects = self.suspects()
+        if suspects:
+            print("\nN+1 SUSPECTS (statement shape repeated within a single step):")
+            for stats, shape, count in suspects:
+                print(f"✗ {stats.suite} step {stats.step}: {count}x {shape[:120]}")
+        else:
+            print(f"\n✓ No statement shape repeated {self.repeat_threshold}+ times within a step")
+        print("="*100)
+
+
+def enable_sql_step_profiler(env, namespace=None, repeat_threshold=20):
+    """
+    Install a SqlStepProfiler on env.cr and register it for the step notifications
+    """
+    return SqlStepProfiler(env, repeat_threshold=repeat_threshold).install(
+        namespace if namespace is not None else globals())
+
+
+# Buckets used to summarise where profiled time went, checked in order against "file:function"
+# Category of the MEL entry frames: time spent below them is charged to it as well
+MEL_TIME_CATEGORY = 'mel reset methods'
+
+TIME_CATEGORIES = [
+    (MEL_TIME_CATEGORY, re.compile(r'mel_reset_|_mel_is_local_midnight|/mel[^/]*\.py')),
+    ('pytz / zoneinfo', re.compile(r'pytz|zoneinfo')),
+    ('sql driver', re.compile(r'psycopg2|sqlite3|sql_db\.py|method \'execute\'|method \'fetch')),
+    ('odoo orm', re.compile(r'[/\\]odoo[/\\](models|fields|api|osv|tools)|odoo_shell_mel_local_env\.py')),
+]
+
+
+def _time_category(filename, function):
+    label = f"{filename}:{function}"
+    for category, pattern in TIME_CATEGORIES:
+        if pattern.search(label):
+            return category
+    return 'other'
+
+
+class PhaseProfiler:
+    """
+    CPU and allocation profile per (suite, phase). cProfile accumulates over every segment of
+    a phase, tracemalloc snapshots taken at both ends of a segment are diffed and summed per line.
+    """
+
+    PHASES = ('setup', 'reset', 'verification', 'cleanup')
+
+    def __init__(self, output_dir, top_allocations=25, top_functions=40):
+        self.output_dir = output_dir
+        self.top_allocations = top_allocations
+        self.top_functions = top_functions
+        self.profiles = {}
+        self.allocations = {}
+        self.wall_seconds = Counter()
+        self._current = None
+        self._started = None
+        self._snapshot = None
+        self._namespace = None
+        self._owns_tracemalloc = False
+
+    def install(self, namespace=None):
+        self._namespace = namespace if namespace is not None else globals()
+        observers = _observer_list(self._namespace)
+        if self not in observers:
+            observers.append(self)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracemalloc = True
+        return self
+
+    def uninstall(self):
+        self._stop()
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+            self._owns_tracemalloc = False
+        if self._namespace is not None and self in _observer_list(self._namespace):
+            _observer_list(self._namespace).remove(self)
+
+    # -- observer protocol --------------------------------------------------
+
+    def step_started(self, suite, step, title):
+        """
+        Steps do not change the phase
+        """
+
+    def phase_started(self, suite, phase):
+        self._stop()
+        key = (suite, phase)
+        self._current = key
+        self._snapshot = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+        self._started = time.perf_counter()
+        self.profiles.setdefault(key, cProfile.Profile()).enable()
+
+    def suite_finished(self, suite):
+        self._stop()
+
+    def _stop(self):
+        if self._current is None:
+            return
+        key = self._current
+        self.profiles[key].disable()
+        self.wall_seconds[key] += time.perf_counter() - self._started
+        if self._snapshot is not None and tracemalloc.is_tracing():
+            diff = tracemalloc.take_snapshot().compare_to(self._snapshot, 'lineno')
+            totals = self.allocations.setdefault(key, Counter())
+            for stat in diff:
+                if stat.size_diff > 0:
+                    frame = stat.traceback[0]
+                    totals[f"{frame.filename}:{frame.lineno}"] += stat.size_diff
+        self._current = None
+        self._snapshot = None
+
+    # -- reporting ----------------------------------------------------------
+
+    def time_breakdown(self, key):
+        """
+        Return {category: seconds} of profile time for a phase. The MEL entry frames count with
+        their cumulative time: the SQL, ORM and tz time spent below them is moved out of those
+        buckets into MEL_TIME_CATEGORY, so the buckets still add up to the profiled time.
+        cProfile only records direct callers, so the share of a function's time spent below a
+        MEL frame is derived from the shares of its callers, weighted by their cumtime.
+        """
+        stats = pstats.Stats(self.profiles[key]).stats
+        categories = {func: _time_category(func[0], func[2]) for func in stats}
+        mel_shares = {}
+
+        def mel_share(func, visiting):
+            if categories[func] == MEL_TIME_CATEGORY:
+                return 1.0
+            if func in mel_shares:
+                return mel_shares[func]
+            callers = {caller: edge for caller, edge in stats[func][4].items() if caller in stats}
+            total = sum(edge[3] for edge in callers.values())
+            if not total or func in visiting:
+                return 0.0
+            visiting.add(func)
+            share = sum(edge[3] * mel_share(caller, visiting) for caller, edge in callers.items()) / total
+            visiting.discard(func)
+            mel_shares[func] = share
+            return share
+
+        breakdown = Counter()
+        for func, (_cc, _nc, tottime, _ct, _callers) in stats.items():
+            share = mel_share(func, set())
+            breakdown[MEL_TIME_CATEGORY] += tottime * share
+            breakdown[categories[func]] += tottime * (1 - share)
+        return breakdown
+
+    def write_reports(self):
+        """
+        Write <suite>.<phase>.pstats, <suite>.<phase>.txt and summary.txt to output_dir.
+        Returns the list of written paths.
+        """
+        self._stop()
+        os.makedirs(self.output_dir, exist_ok=True)
+        written = []
+        summary = ["MEL PHASE PROFILE SUMMARY", "",
+                   f"{'suite':<26} {'phase':<13} {'wall s':>8} {'alloc KiB':>10}  time by category"]
+        for key in sorted(self.profiles, key=lambda k: (k[0], self.PHASES.index(k[1]) if k[1] in self.PHASES else 99)):
+            suite, phase = key
+            base = os.path.join(self.output_dir, f"{suite}.{phase}")
+            self.profiles[key].dump_stats(base + '.pstats')
+
+            stream = io.StringIO()
+            stats = pstats.Stats(self.profiles[key], stream=stream)
+            stats.sort_stats('cumulative').print_stats(self.top_functions)
+            allocations = self.allocations.get(key, Counter())
+            with open(base + '.txt', 'w', encoding='utf-8') as handle:
+                handle.write(f"{suite} / {phase}: {self.wall_seconds[key]:.3f}s wall\n\n")
+                handle.write("TOP FUNCTIONS (cumulative)\n")
+                handle.write(stream.getvalue())
+                handle.write("\nTOP ALLOCATIONS (net bytes allocated during the phase)\n")
+                for location, size in allocations.most_common(self.top_allocations):
+                    handle.write(f"{size / 1024:>12.1f} KiB  {location}\n")
+            written.extend([base + '.pstats', base + '.txt'])
+
+            breakdown = self.time_breakdown(key)
+            total = sum(breakdown.values()) or 1.0
+            categories = ', '.join(f"{name} {seconds / total:.0%}" for name, seconds in breakdown.most_common())
+            summary.append(f"{suite[:26]:<26} {phase:<13} {self.wall_seconds[key]:>8.3f} "
+                           f"{sum(allocations.values()) / 1024:>10.1f}  {categories}")
+
+        summary_path = os.path.join(self.output_dir, 'summary.txt')
+        with open(summary_path, 'w', encoding='utf-8') as handle:
+            handle.write('\n'.join(summary) + '\n')
+        written.append(summary_path)
+        print('\n'.join(summary))
+        print(f"\nPhase profiles written to {self.output_dir}")
+        return written
+
+
+def enable_phase_profiler(output_dir, namespace=None, top_allocations=25):
+    """
+    Install a PhaseProfiler and register it for the phase notifications of the test scripts
+    """
+    return PhaseProfiler(output_dir, top_allocations=top_allocations).install(
+        namespace if namespace is not None else globals())
+
+
+def profile_entry_point(entry_point, output_dir, namespace=None, *args, **kwargs):
+    """
+    Run one entry point (e.g. run_all_tests) with the phase profiler and write the reports
+    """
+    profiler = enable_phase_profiler(output_dir, namespace)
+    try:
+        return entry_point(*args, **kwargs)
+    finally:
+        profiler.uninstall()
+        profiler.write_reports()
+
+
+class JsonlStepSink:
+    """
+    Stream one JSON record per finished step to a JSONL file. Steps end when the next one
+    starts or the suite finishes; checks reported through _mel_failed() mark the current step
+    as failed. Every record carries the run id, database and the given labels (e.g. module
+    version) so runs of different module versions can be compared.
+    """
+
+    def __init__(self, env, path, labels=None):
+        self.env = env
+        self.path = path
+        self.labels = dict(labels or {})
+        self.run_id = uuid.uuid4().hex[:12]
+        self.records = 0
+        self._handle = None
+        self._namespace = None
+        self._current = None
+        self._suites = {}
+        self._indexes = Counter()
+
+    def install(self, namespace=None):
+        self._namespace = namespace if namespace is not None else globals()
+        observers = _observer_list(self._namespace)
+        if self not in observers:
+            observers.append(self)
+        if self._handle is None:
+            self._handle = open(self.path, 'a', encoding='utf-8')
+        return self
+
+    def uninstall(self):
+        self._close_step()
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+        if self._namespace is not None and self in _observer_list(self._namespace):
+            _observer_list(self._namespace).remove(self)
+
+    # -- measurements -------------------------------------------------------
+
+    def _counters(self):
+        """
+        Return (queries so far, res_partner rows changed so far) after flushing pending writes
+        """
+        # Only the scripts notify the sink, and they load _flush_env into their namespace
+        self._namespace['_flush_env'](self.env)
+        queries = getattr(self.env.cr, 'sql_log_count', 0)
+        # The statistics query itself is not part of the step, for the sink nor for a SQL profiler
+        with ExitStack() as stack:
+            for observer in _observer_list(self._namespace):
+                if isinstance(observer, SqlStepProfiler) and observer.cr is self.env.cr:
+                    stack.enter_context(observer.paused())
+            self.env.cr.execute("SELECT n_tup_ins + n_tup_upd + n_tup_del FROM pg_stat_xact_user_tables "
+                                "WHERE relname = 'res_partner'")
+            row = self.env.cr.fetchone()
+        return queries, (row[0] if row else 0), getattr(self.env.cr, 'sql_log_count', 0)
+
+    def _start(self, suite, step, title):
+        queries, rows, after = self._counters()
+        self._indexes[suite] += 1
+        self._current = {
+            'suite': suite, 'step': step, 'title': title, 'index': self._indexes[suite],
+            'failures': [], '_started': time.perf_counter(), '_queries': after, '_rows': rows,
+        }
+
+    def _close_step(self):
+        if self._current is None:
+            return
+        current, self._current = self._current, None
+        queries, rows, _after = self._counters()
+        suite = self._suites.setdefault(current['suite'], {'queries': 0, 'rows': 0, 'steps': 0, 'failed_steps': 0})
+        record = {
+            'type': 'step', 'suite': current['suite'], 'step': current['step'], 'index': current['index'],
+            'title': current['title'], 'status': 'fail' if current['failures'] else 'pass',
+            'failures': current['failures'], 'rows': rows - current['_rows'],
+            'duration_ms': round((time.perf_counter() - current['_started']) * 1000, 3),
+            'queries': queries - current['_queries'],
+        }
+        suite['queries'] += record['queries']
+        suite['rows'] += record['rows']
+        suite['steps'] += 1
+        suite['failed_steps'] += record['status'] == 'fail'
+        self._write(record)
+
+    def _write(self, record):
+        record = dict(record, run_id=self.run_id, db=getattr(self.env.cr, 'dbname', None),
+                      ts=datetime.now(timezone.utc).isoformat(timespec='seconds'), **self.labels)
+        self._handle.write(json.dumps(record, default=str) + '\n')
+        self._handle.flush()
+        self.records += 1
+
+    # -- observer protocol --------------------------------------------------
+
+    def suite_started(self, suite):
+        self._close_step()
+        self._indexes[suite] = 0
+        self._suites[suite] = {'queries': 0, 'rows': 0, 'steps': 0, 'failed_steps': 0,
+                               '_started': time.perf_counter(), 'failures': []}
+
+    def step_started(self, suite, step, title):
+        self._close_step()
+        self._start(suite, step, title)
+
+    def step_failed(self, suite, message):
+        if self._current is not None and self._current['suite'] == suite:
+            self._current['failures'].append(message.strip())
+        else:
+            self._suites.setdefault(suite, {'queries': 0, 'rows': 0, 'steps': 0, 'failed_steps': 0}) \
+                .setdefault('failures', []).append(message.strip())
+
+    def suite_finished(self, suite):
+        self._close_step()
+        totals = self._suites.pop(suite, {})
+        started = totals.get('_started')
+        failed = totals.get('failed_steps', 0) + len(totals.get('failures', []))
+        self._write({
+            'type': 'suite', 'suite': suite, 'status': 'fail' if failed else 'pass',
+            'failures': totals.get('failures', []), 'steps': totals.get('steps', 0),
+            'failed_steps': totals.get('failed_steps', 0), 'rows': totals.get('rows', 0),
+            'queries': totals.get('queries', 0),
+            'duration_ms': round((time.perf_counter() - started) * 1000, 3) if started else None,
+        })
+        self._indexes[suite] = 0
+
+
+def enable_jsonl_sink(env, path, namespace=None, labels=None):
+    """
+    Install a JsonlStepSink appending to path and register it for the step notifications
+    """
+    return JsonlStepSink(env, path, labels).install(namespace if namespace is not None else globals())
+
+
+def load_step_records(path, **filters):
+    """
+    Return the records of a JSONL step file, keeping those matching every filter (e.g. run_id=...)
+    """
+    records = []
+    with open(path, encoding='utf-8') as handle:
+        for line in handle:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if all(record.get(key) == value for key, value in filters.items()):
+                records.append(record)
+    return records
+
+
+def _summarise_steps(records):
+    grouped = {}
+    for record in records:
+        if record.get('type') == 'suite':
+            key = (record['suite'], '*', 0, 'whole suite')
+        else:
+            key = (record['suite'], record['step'], record['index'], record['title'])
+        grouped.setdefault(key, []).append(record)
+    summaries = {}
+    for key, rows in grouped.items():
+        durations = [r['duration_ms'] for r in rows if r.get('duration_ms') is not None]
+        summaries[key] = {
+            # Suite records of an interrupted run have no duration
+            'duration_ms': median(durations) if durations else None,
+            'queries': median(r['queries'] for r in rows),
+            'rows': median(r['rows'] for r in rows),
+            'failed': any(r['status'] == 'fail' for r in rows),
+            'runs': len(rows),
+        }
+    return summaries
+
+
+def compare_step_records(baseline, current, threshold=0.2, min_delta_ms=5.0):
+    """
+    Compare two lists of step records (several runs each are reduced to their median).
+    A step regresses when its duration grows by more than threshold and min_delta_ms, when it
+    runs more queries, or when it fails now and passed in the baseline.
+    Returns [(key, baseline summary, current summary, [reasons])] for every step in current.
+    """
+    base = _summarise_steps(baseline)
+    rows = []
+    for key, now in sorted(_summarise_steps(current).items(), key=lambda item: (item[0][0], item[0][2])):
+        before = base.get(key)
+        reasons = []
+        if before is None:
+            reasons.append('new step')
+        else:
+            if now['duration_ms'] is not None and before['duration_ms'] is not None:
+                delta = now['duration_ms'] - before['duration_ms']
+                if delta >= min_delta_ms and now['duration_ms'] > before['duration_ms'] * (1 + threshold):
+                    reasons.append(f"{delta:+.1f} ms")
+            if now['queries'] > before['queries']:
+                reasons.append(f"{now['queries'] - before['queries']:+g} queries")
+            if now['failed'] and not before['failed']:
+                reasons.append('now failing')
+        rows.append((key, before, now, reasons))
+    return rows
+
+
+def print_step_comparison(comparison, threshold=0.2):
+    print("\n" + "="*110)
+    print(f"STEP COMPARISON AGAINST BASELINE (regression threshold {threshold:.0%})")
+    print("="*110)
+    print(f"{'suite':<24} {'step':>4} {'title':<36} {'base ms':>9} {'now ms':>9} {'change':>8} "
+          f"{'base q':>7} {'now q':>7}")
+    print("-"*110)
+    regressions = 0
+    for (suite, step, _index, title), before, now, reasons in comparison:
+        before_ms = before['duration_ms'] if before else None
+        now_ms = now['duration_ms']
+        change = f"{(now_ms / before_ms - 1):+.0%}" if before_ms and now_ms is not None else ''
+        print(f"{suite[:24]:<24} {step:>4} {title[:36]:<36} "
+              f"{before_ms if before_ms is not None else float('nan'):>9.2f} "
+              f"{now_ms if now_ms is not None else float('nan'):>9.2f} {change:>8} "
+              f"{before['queries'] if before else '':>7} {now['queries']:>7}")
+        if reasons and reasons != ['new step']:
+            regressions += 1
+            print(f"  ✗ regression: {', '.join(reasons)}")
+    print("-"*110)
+    print(f"{'✓ No regressions' if not regressions else f'✗ {regressions} regressed step(s)'}")
+    print("="*110)
+    return regressions
+
+
+def detect_linear_steps(small, large, scale_factor, linear_ratio=0.5):
+    """
+    Compare two profilers of the same suites run on data sets scale_factor apart.
+    Steps whose query count grew by at least linear_ratio * scale_factor are returned as
+    [(suite, step, title, small queries, large queries)], i.e. steps that issue queries per record.
+    """
+    small_steps = {stats.key: stats for stats in small.steps}
+    linear = []
+    for stats in large.steps:
+        before = small_steps.get(stats.key)
+        if before is None or stats.queries <= before.queries:
+            continue
+        growth = stats.queries / max(before.queries, 1)
+        if growth >= scale_factor * linear_ratio:
+            linear.append((stats.suite, stats.step, stats.title, before.queries, stats.queries))
+    return linear
+
+
+def _profile_local_run(partners_per_company, targets, profile_dir=None, jsonl_path=None):
+    from odoo_shell_mel_local_env import load_script, make_local_env
+
+    env = make_local_env(partners_per_company=partners_per_company)
+    namespace = {'env': env, '__name__': 'odoo_shell_script'}
+    for script, _entry in targets:
+        load_script(script, namespace)
+    profiler = enable_sql_step_profiler(env, namespace)
+    phases = enable_phase_profiler(profile_dir, namespace) if profile_dir else None
+    sink = enable_jsonl_sink(env, jsonl_path, namespace, {'partners_per_company': partners_per_company}) \
+        if jsonl_path else None
+    try:
+        for _script, entry in targets:
+            namespace[entry]()
+    finally:
+        profiler.uninstall()
+        if phases is not None:
+            phases.uninstall()
+        if sink is not None:
+            sink.uninstall()
+        env.cr.close()
+        env.registry.close()
+    return profiler, phases
+
+
+if __name__ == "__main__" and "env" not in globals():
+    import argparse
+    import contextlib
+
+    parser = argparse.ArgumentParser(description="Per-step SQL profile of the MEL test scripts on the stand-in env")
+    parser.add_argument('--scales', default='10,100', help="two partners-per-company values to compare")
+    parser.add_argument('--show-output', action='store_true', help="keep the test scripts' own output")
+    parser.add_argument('--profile-dir', help="also write cProfile/tracemalloc phase reports of the larger run here")
+    parser.add_argument('--jsonl', help="append the step records of the larger run to this JSONL file")
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'),
+                        help="compare two JSONL step files instead of profiling")
+    parser.add_argument('--threshold', type=float, default=0.2, help="duration regression threshold (default 0.2)")
+    parser.add_argument('--min-delta-ms', type=float, default=5.0, help="ignore duration changes below this")
+    args = parser.parse_args()
+    if args.compare:
+        comparison = compare_step_records(load_step_records(args.compare[0]), load_step_records(args.compare[1]),
+                                          args.threshold, args.min_delta_ms)
+        raise SystemExit(1 if print_step_comparison(comparison, args.threshold) else 0)
+    small_scale, large_scale = [int(value) for value in args.scales.split(',')]
+    suites = [
+        ('odoo-reset-email-counter-split.py', 'run_all_tests'),
+        ('odoo_shell_test_mel_counters.py', 'run_mel_counter_tests'),
+    ]
+    runs = []
+    phase_profiler = None
+    for scale, profile_dir, jsonl_path in ((small_scale, None, None), (large_scale, args.profile_dir, args.jsonl)):
+        sink = contextlib.nullcontext() if args.show_output else contextlib.redirect_stdout(io.StringIO())
+        with sink:
+            sql_profiler, phase_profiler = _profile_local_run(scale, suites, profile_dir, jsonl_path)
+            runs.append(sql_profiler)
+    print(f"Profile at {large_scale} partners per company:")
+    runs[1].print_report()
+    linear_steps = detect_linear_steps(runs[0], runs[1], large_scale / small_scale)
+    if linear_steps:
+        print(f"\nSTEPS WHOSE QUERY COUNT GROWS LINEARLY WITH RECORDS ({small_scale} -> {large_scale} per company):")
+        for suite, step, title, before, after in linear_steps:
+            print(f"✗ {suite} step {step} ({title}): {before} -> {after} queries")
+    else:
+        print(f"\n✓ No step's query count grows linearly between {small_scale} and {large_scale} partners per company")
+    if phase_profiler is not None:
+        print()
+        phase_profiler.write_reports()
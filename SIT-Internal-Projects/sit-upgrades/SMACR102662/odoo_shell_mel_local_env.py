@@ -0,0 +1,1162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQLite-backed stand-in for the Odoo shell `env` used by the MEL test scripts
+Models res.partner, res.company, res.country, ir.model and ir.cron with the fields the scripts touch,
+translates the domains they use into indexed SQLite queries and provides pluggable implementations
+of the mel_reset_* methods, so run_all_tests() and run_mel_counter_tests() run unchanged on a laptop.
+
+Usage:
+    python3 odoo_shell_mel_local_env.py                       # run both suites on sample data
+    python3 odoo_shell_mel_local_env.py odoo_shell_test_mel_counters.py run_quick_test
+Or from Python:
+    env = make_local_env()
+    run_script('odoo-reset-email-counter-split.py', 'run_all_tests', env)
+"""
+
+import os
+import re
+import random
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from odoo_shell_mel_common import _tz_for_name
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Odoo's IN clause chunk size (cr.IN_MAX) and prefetch size (PREFETCH_MAX)
+IN_MAX = 1000
+PREFETCH_MAX = 1000
+INSERT_BATCH = 500
+
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+MEL_CRON_NAME = 'MEL: Reset Daily Marketing Email Counters'
+
+
+# ---------------------------------------------------------------------------
+# Cursor
+# ---------------------------------------------------------------------------
+
+class LocalCursor:
+    """
+    Minimal psycopg2-flavoured cursor over a sqlite3 connection.
+    Accepts %s placeholders (tuples expand to IN lists) and counts statements in sql_log_count
+    like odoo.sql_db.Cursor does.
+    """
+
+    IN_MAX = IN_MAX
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.dbname = registry.dbname
+        self._cnx = sqlite3.connect(registry.db_path, timeout=60, isolation_level=None,
+                                    check_same_thread=False)
+        self._cnx.execute('PRAGMA synchronous=NORMAL')
+        self._cnx.execute('PRAGMA case_sensitive_like=ON')
+        # Stand-in for PostgreSQL's per-transaction statistics view. total_changes() counts every
+        # row the connection changed, which is what before/after deltas around one UPDATE need.
+        self._cnx.execute("CREATE TEMP VIEW IF NOT EXISTS pg_stat_xact_user_tables AS "
+                          "SELECT name AS relname, 0 AS n_tup_ins, total_changes() AS n_tup_upd, 0 AS n_tup_del "
+                          "FROM main.sqlite_master WHERE type = 'table'")
+        # PostgreSQL's random() in [0, 1) and setseed(), so ORDER BY random() samples are repeatable
+        self._random = random.Random()
+        self._cnx.create_function('random', 0, self._random.random)
+        self._cnx.create_function('setseed', 1, self._random.seed)
+        self._obj = self._cnx.cursor()
+        self.sql_log_count = 0
+        self.cache = {}
+        self.closed = False
+        self._savepoint_seq = 0
+
+    def _convert(self, query, params):
+        if params is None:
+            return query, ()
+        if isinstance(params, dict):
+            # %(name)s placeholders, as psycopg2 takes them: rewritten to positional ones
+            names = re.findall(r'%\((\w+)\)s', query)
+            missing = [name for name in names if name not in params]
+            if missing:
+                raise KeyError(f"query parameter(s) {', '.join(missing)} not given")
+            query = re.sub(r'%\((\w+)\)s', '%s', query)
+            params = [params[name] for name in names]
+        parts = query.split('%s')
+        if len(parts) - 1 != len(params):
+            raise ValueError(f"query expects {len(parts) - 1} parameters, got {len(params)}")
+        sql = [parts[0].replace('%%', '%')]
+        values = []
+        for param, part in zip(params, parts[1:]):
+            if isinstance(param, (tuple, list)):
+                sql.append('(' + ','.join('?' * len(param)) + ')' if param else '(NULL)')
+                values.extend(param)
+            else:
+                sql.append('?')
+                values.append(param)
+            sql.append(part.replace('%%', '%'))
+        return ''.join(sql), values
+
+    def execute(self, query, params=None, log_exceptions=True):
+        sql, values = self._convert(query, params)
+        if not self._cnx.in_transaction and not sql.lstrip().upper().startswith(('BEGIN', 'PRAGMA')):
+            self._cnx.execute('BEGIN')
+        self.sql_log_count += 1
+        self._obj.execute(sql, values)
+        return None
+
+    def split_for_in_conditions(self, ids, size=None):
+        ids = list(ids)
+        size = size or self.IN_MAX
+        for index in range(0, len(ids), size):
+            yield tuple(ids[index:index + size])
+
+    def fetchone(self):
+        return self._obj.fetchone()
+
+    def fetchall(self):
+        return self._obj.fetchall()
+
+    def fetchmany(self, size):
+        return self._obj.fetchmany(size)
+
+    def dictfetchall(self):
+        names = [column[0] for column in self._obj.description or ()]
+        return [dict(zip(names, row)) for row in self._obj.fetchall()]
+
+    def dictfetchone(self):
+        row = self._obj.fetchone()
+        if row is None:
+            return None
+        return dict(zip([column[0] for column in self._obj.description], row))
+
+    @property
+    def rowcount(self):
+        return self._obj.rowcount
+
+    @property
+    def description(self):
+        return self._obj.description
+
+    def commit(self):
+        if self._cnx.in_transaction:
+            self._cnx.commit()
+
+    def rollback(self):
+        if self._cnx.in_transaction:
+            self._cnx.rollback()
+        self.cache.clear()
+
+    def close(self):
+        if not self.closed:
+            self.rollback()
+            self._cnx.close()
+            self.closed = True
+
+    @contextmanager
+    def savepoint(self, flush=True):
+        self._savepoint_seq += 1
+        name = f'sp_{self._savepoint_seq}'
+        self.execute(f'SAVEPOINT "{name}"')
+        try:
+            yield
+        except Exception:
+            self.execute(f'ROLLBACK TO SAVEPOINT "{name}"')
+            self.execute(f'RELEASE SAVEPOINT "{name}"')
+            self.cache.clear()
+            raise
+        else:
+            self.execute(f'RELEASE SAVEPOINT "{name}"')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        self.close()
+
+
+# ---------------------------------------------------------------------------
+# Fields and domains
+# ---------------------------------------------------------------------------
+
+class Field:
+    """
+    Stored field description: type is one of char, text, selection, integer, boolean,
+    datetime or many2one (with comodel)
+    """
+
+    SQL_TYPES = {
+        'char': 'TEXT', 'text': 'TEXT', 'selection': 'TEXT', 'integer': 'INTEGER',
+        'boolean': 'INTEGER', 'datetime': 'TEXT', 'many2one': 'INTEGER',
+    }
+
+    def __init__(self, type, string=None, comodel=None, default=None, required=False, index=False):
+        self.type = type
+        self.string = string
+        self.comodel = comodel
+        self.default = default
+        self.required = required
+        self.index = index
+
+    def to_db(self, value):
+        if self.type == 'boolean':
+            return 1 if value else 0
+        if value is False or value is None:
+            return None
+        if self.type == 'datetime':
+            return value.strftime(DATETIME_FORMAT) if isinstance(value, datetime) else str(value)
+        if self.type == 'many2one':
+            return value.id if isinstance(value, BaseModel) else int(value)
+        if self.type == 'integer':
+            return int(value)
+        return value
+
+    def from_db(self, env, value):
+        if self.type == 'boolean':
+            return bool(value)
+        if self.type == 'integer':
+            return value or 0
+        if self.type == 'datetime':
+            return datetime.strptime(value, DATETIME_FORMAT) if value else False
+        if self.type == 'many2one':
+            return env[self.comodel].browse(value) if value else env[self.comodel]
+        return value if value is not None else False
+
+
+TRUE_LEAF = (1, '=', 1)
+
+
+def normalize_domain(domain):
+    """
+    Add the implicit '&' operators of a domain, like odoo.osv.expression.normalize_domain
+    """
+    if not domain:
+        return [TRUE_LEAF]
+    result = []
+    expected = 1
+    for token in domain:
+        if expected == 0:
+            result[0:0] = ['&']
+            expected = 1
+        if isinstance(token, (list, tuple)):
+            expected -= 1
+            token = tuple(token)
+        else:
+            expected += 1 if token in ('&', '|') else 0
+        result.append(token)
+    return result
+
+
+class DomainCompiler:
+    """
+    Translate Odoo domains into SQLite WHERE clauses. Dotted many2one paths become sub-selects.
+    """
+
+    def __init__(self, env):
+        self.env = env
+
+    def compile(self, model_cls, domain):
+        stack = []
+        for token in reversed(normalize_domain(domain)):
+            if token == '!':
+                sql, params = stack.pop()
+                stack.append((f'(NOT {sql})', params))
+            elif token in ('&', '|'):
+                left, right = stack.pop(), stack.pop()
+                joiner = ' AND ' if token == '&' else ' OR '
+                stack.append((f'({left[0]}{joiner}{right[0]})', left[1] + right[1]))
+            else:
+                stack.append(self._leaf(model_cls, token))
+        return stack[0]
+
+    def _leaf(self, model_cls, leaf):
+        if leaf == TRUE_LEAF:
+            return '1=1', []
+        if leaf == (0, '=', 1):
+            return '0=1', []
+        path, operator, value = leaf
+        operator = operator.lower()
+        if '.' in path:
+            head, rest = path.split('.', 1)
+            field = model_cls._fields[head]
+            if field.type != 'many2one':
+                raise ValueError(f"Cannot follow non-relational field {head} in {path}")
+            comodel_cls = self.env.registry.models[field.comodel]
+            sub_sql, sub_params = self._leaf(comodel_cls, (rest, operator, value))
+            return f'"{head}" IN (SELECT id FROM "{comodel_cls._table}" WHERE {sub_sql})', sub_params
+
+        field = Field('integer') if path == 'id' else model_cls._fields.get(path)
+        if field is None:
+            raise ValueError(f"Invalid field {model_cls._name}.{path} in leaf {leaf}")
+        column = f'"{path}"'
+
+        if operator in ('=', '!='):
+            negate = operator == '!='
+            if isinstance(value, BaseModel):
+                value = value.id
+            if field.type == 'boolean':
+                truth = bool(value) != negate
+                return (f'{column} = 1', []) if truth else (f'({column} = 0 OR {column} IS NULL)', [])
+            if value is False or value is None:
+                return (f'{column} IS NOT NULL', []) if negate else (f'{column} IS NULL', [])
+            if negate:
+                return f'({column} != %s OR {column} IS NULL)', [field.to_db(value)]
+            return f'{column} = %s', [field.to_db(value)]
+
+        if operator in ('in', 'not in'):
+            if isinstance(value, BaseModel):
+                value = value.ids
+            values = list(value) if isinstance(value, (list, tuple, set, frozenset)) else [value]
+            has_null = any(v is False or v is None for v in values)
+            values = [field.to_db(v) for v in values if v is not False and v is not None]
+            params = [tuple(values)] if values else []
+            if operator == 'in':
+                clauses = [f'{column} IN %s'] if values else []
+                if has_null:
+                    clauses.append(f'{column} IS NULL')
+                return (f'({" OR ".join(clauses)})' if clauses else '0=1'), params
+            clauses = [f'{column} NOT IN %s'] if values else ['1=1']
+            if has_null:
+                clauses.append(f'{column} IS NOT NULL')
+                return f'({" AND ".join(clauses)})', params
+            return f'({clauses[0]} OR {column} IS NULL)', params
+
+        if operator in ('like', 'ilike', 'not like', 'not ilike', '=like', '=ilike'):
+            pattern = value if operator.startswith('=') else f'%{value}%'
+            target = f'lower({column})' if 'ilike' in operator else column
+            if 'ilike' in operator:
+                pattern = pattern.lower()
+            # Backslash escapes % and _ in the pattern, as it does by default in PostgreSQL
+            if operator.startswith('not'):
+                return f"({target} NOT LIKE %s ESCAPE '\\' OR {column} IS NULL)", [pattern]
+            return f"{target} LIKE %s ESCAPE '\\'", [pattern]
+
+        if operator in ('<', '>', '<=', '>='):
+            return f'{column} {operator} %s', [field.to_db(value)]
+
+        raise ValueError(f"Unsupported operator {operator!r} in leaf {leaf}")
+
+
+# ---------------------------------------------------------------------------
+# Recordsets
+# ---------------------------------------------------------------------------
+
+_READ_GROUP_SPEC = re.compile(r'^(\w+)(?::(\w+)(?:\((\w+)\))?)?$')
+
+
+class BaseModel:
+    """
+    Recordset of a stand-in model. Field values are read through a per-cursor cache
+    that is filled in prefetch batches, writes go straight to SQLite.
+    """
+
+    _name = None
+    _description = None
+    _table = None
+    _fields = {}
+    _order = 'id'
+    _rec_name = 'name'
+
+    def __init__(self, env, ids=(), prefetch_ids=None):
+        object.__setattr__(self, 'env', env)
+        object.__setattr__(self, '_ids', tuple(ids))
+        object.__setattr__(self, '_prefetch_ids', prefetch_ids)
+
+    # -- recordset protocol -------------------------------------------------
+
+    @property
+    def ids(self):
+        return list(self._ids)
+
+    @property
+    def id(self):
+        if not self._ids:
+            return False
+        self.ensure_one()
+        return self._ids[0]
+
+    @property
+    def _cr(self):
+        return self.env.cr
+
+    @property
+    def pool(self):
+        return self.env.registry
+
+    def browse(self, ids=()):
+        if isinstance(ids, int):
+            ids = (ids,)
+        return type(self)(self.env, ids or ())
+
+    def ensure_one(self):
+        if len(self._ids) != 1:
+            raise ValueError(f"Expected singleton: {self!r}")
+        return self
+
+    def with_context(self, *args, **kwargs):
+        context = dict(args[0] if args else self.env.context)
+        context.update(kwargs)
+        return type(self)(self.env(context=context), self._ids)
+
+    def with_env(self, env):
+        return type(self)(env, self._ids)
+
+    def sudo(self, flag=True):
+        return self
+
+    def exists(self):
+        existing = set()
+        for sub_ids in self._cr.split_for_in_conditions(self._ids):
+            self._cr.execute(f'SELECT id FROM "{self._table}" WHERE id IN %s', (sub_ids,))
+            existing.update(row[0] for row in self._cr.fetchall())
+        return self.browse([i for i in self._ids if i in existing])
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __bool__(self):
+        return bool(self._ids)
+
+    def __iter__(self):
+        prefetch = self._prefetch_ids or self._ids
+        for record_id in self._ids:
+            yield type(self)(self.env, (record_id,), prefetch)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self.browse(self._ids[key])
+        return type(self)(self.env, (self._ids[key],), self._ids)
+
+    def __contains__(self, item):
+        return item.id in self._ids if isinstance(item, BaseModel) else item in self._ids
+
+    def __or__(self, other):
+        seen = dict.fromkeys(self._ids)
+        seen.update(dict.fromkeys(other._ids))
+        return self.browse(list(seen))
+
+    def __and__(self, other):
+        other_ids = set(other._ids)
+        return self.browse([i for i in self._ids if i in other_ids])
+
+    def __sub__(self, other):
+        other_ids = set(other._ids)
+        return self.browse([i for i in self._ids if i not in other_ids])
+
+    def __eq__(self, other):
+        return isinstance(other, BaseModel) and self._name == other._name and set(self._ids) == set(other._ids)
+
+    def __hash__(self):
+        return hash((self._name, frozenset(self._ids)))
+
+    def __repr__(self):
+        return f"{self._name}{self._ids!r}"
+
+    def mapped(self, name):
+        values = [getattr(record, name) for record in self]
+        if values and isinstance(values[0], BaseModel):
+            result = self.env[values[0]._name]
+            for value in values:
+                result |= value
+            return result
+        return values
+
+    def filtered(self, func):
+        if isinstance(func, str):
+            name = func
+            func = lambda record: getattr(record, name)
+        return self.browse([record.id for record in self if func(record)])
+
+    # -- field access -------------------------------------------------------
+
+    def __getattr__(self, name):
+        fields = type(self)._fields
+        if name in fields:
+            return self._get_field(name)
+        if name == 'display_name':
+            return self._get_field(self._rec_name) if self._ids else False
+        raise AttributeError(f"'{self._name}' object has no attribute '{name}'")
+
+    def __setattr__(self, name, value):
+        if name in type(self)._fields:
+            self.write({name: value})
+        else:
+            object.__setattr__(self, name, value)
+
+    def _get_field(self, name):
+        if not self._ids:
+            return self._fields[name].from_db(self.env, None)
+        self.ensure_one()
+        record_id = self._ids[0]
+        cache = self._cr.cache
+        key = (self._name, record_id)
+        values = cache.get(key)
+        if values is None or name not in values:
+            self._prefetch(record_id)
+            values = cache.get(key)
+            if values is None:
+                raise ValueError(f"Record does not exist or has been deleted: {self._name}({record_id},)")
+        return self._fields[name].from_db(self.env, values[name])
+
+    def _prefetch(self, record_id):
+        cache = self._cr.cache
+        candidates = [record_id]
+        for other_id in self._prefetch_ids or ():
+            if len(candidates) >= PREFETCH_MAX:
+                break
+            if other_id != record_id and (self._name, other_id) not in cache:
+                candidates.append(other_id)
+        self._fetch_rows(candidates)
+
+    def _fetch_rows(self, ids):
+        names = list(self._fields)
+        columns = ', '.join(f'"{name}"' for name in names)
+        cache = self._cr.cache
+        for sub_ids in self._cr.split_for_in_conditions(ids):
+            self._cr.execute(f'SELECT id, {columns} FROM "{self._table}" WHERE id IN %s', (sub_ids,))
+            for row in self._cr.fetchall():
+                cache[(self._name, row[0])] = dict(zip(names, row[1:]))
+
+    # -- CRUD ---------------------------------------------------------------
+
+    def _where(self, domain):
+        domain = list(domain or [])
+        if 'active' in self._fields and self.env.context.get('active_test', True):
+            mentions_active = any(isinstance(leaf, (list, tuple)) and leaf[0] == 'active' for leaf in domain)
+            if not mentions_active:
+                domain = ['&', ('active', '=', True)] + normalize_domain(domain)
+        return DomainCompiler(self.env).compile(type(self), domain)
+
+    def _order_by(self, order):
+        clauses = []
+        for part in (order or self._order).split(','):
+            tokens = part.split()
+            if not tokens:
+                continue
+            name = tokens[0]
+            direction = tokens[1].upper() if len(tokens) > 1 else 'ASC'
+            if name != 'id' and name not in self._fields:
+                raise ValueError(f"Invalid order field {name} for {self._name}")
+            if direction not in ('ASC', 'DESC'):
+                raise ValueError(f"Invalid order direction {direction}")
+            clauses.append(f'"{name}" {direction}')
+        return ', '.join(clauses)
+
+    def _search(self, domain, offset=0, limit=None, order=None):
+        where, params = self._where(domain)
+        query = f'SELECT id FROM "{self._table}" WHERE {where} ORDER BY {self._order_by(order)}'
+        if limit:
+            query += f' LIMIT {int(limit)}'
+        if offset:
+            query += ('' if limit else ' LIMIT -1') + f' OFFSET {int(offset)}'
+        self._cr.execute(query, params)
+        return [row[0] for row in self._cr.fetchall()]
+
+    def search(self, domain, offset=0, limit=None, order=None, count=False):
+        if count:
+            return self.search_count(domain)
+        return self.browse(self._search(domain, offset, limit, order))
+
+    def search_count(self, domain, limit=None):
+        where, params = self._where(domain)
+        query = f'SELECT COUNT(*) FROM "{self._table}" WHERE {where}'
+        if limit:
+            query = f'SELECT COUNT(*) FROM (SELECT 1 FROM "{self._table}" WHERE {where} LIMIT {int(limit)})'
+        self._cr.execute(query, params)
+        return self._cr.fetchone()[0]
+
+    def search_read(self, domain=None, fields=None, offset=0, limit=None, order=None):
+        records = self.search(domain or [], offset=offset, limit=limit, order=order)
+        return records.read(fields) if records else []
+
+    def _display_names(self, comodel, ids):
+        ids = [i for i in set(ids) if i]
+        if not ids:
+            return {}
+        comodel_cls = self.env.registry.models[comodel]
+        names = {}
+        for sub_ids in self._cr.split_for_in_conditions(ids):
+            self._cr.execute(
+                f'SELECT id, "{comodel_cls._rec_name}" FROM "{comodel_cls._table}" WHERE id IN %s', (sub_ids,))
+            names.update(self._cr.fetchall())
+        return names
+
+    def read(self, fields=None):
+        names = [name for name in (fields or list(self._fields)) if name != 'id']
+        self._fetch_rows(self._ids)
+        cache = self._cr.cache
+        display = {}
+        for name in names:
+            field = self._fields[name]
+            if field.type == 'many2one':
+                display[name] = self._display_names(
+                    field.comodel, [cache[(self._name, i)][name] for i in self._ids if (self._name, i) in cache])
+        result = []
+        for record_id in self._ids:
+            values = cache.get((self._name, record_id))
+            if values is None:
+                continue
+            row = {'id': record_id}
+            for name in names:
+                field = self._fields[name]
+                if field.type == 'many2one':
+                    value = values[name]
+                    row[name] = (value, display[name].get(value)) if value else False
+                else:
+                    row[name] = field.from_db(self.env, values[name])
+            result.append(row)
+        return result
+
+    def create(self, vals_list):
+        single = isinstance(vals_list, dict)
+        if single:
+            vals_list = [vals_list]
+        if not vals_list:
+            return self.browse()
+        names = list(self._fields)
+        rows = []
+        for vals in vals_list:
+            unknown = set(vals) - set(names)
+            if unknown:
+                raise ValueError(f"Invalid field(s) {sorted(unknown)} on model {self._name}")
+            row = []
+            for name in names:
+                field = self._fields[name]
+                if name in vals:
+                    value = vals[name]
+                else:
+                    value = field.default() if callable(field.default) else field.default
+                if field.required and (value is None or value is False):
+                    raise ValueError(f"Missing required value for field '{name}' on {self._name}")
+                row.append(field.to_db(value))
+            rows.append(row)
+        columns = ', '.join(f'"{name}"' for name in names)
+        placeholder = '(' + ', '.join(['%s'] * len(names)) + ')'
+        new_ids = []
+        for index in range(0, len(rows), INSERT_BATCH):
+            batch = rows[index:index + INSERT_BATCH]
+            self._cr.execute(
+                f'INSERT INTO "{self._table}" ({columns}) VALUES {", ".join([placeholder] * len(batch))} RETURNING id',
+                [value for row in batch for value in row])
+            batch_ids = sorted(row[0] for row in self._cr.fetchall())
+            for record_id, row in zip(batch_ids, batch):
+                self._cr.cache[(self._name, record_id)] = dict(zip(names, row))
+            new_ids.extend(batch_ids)
+        return self.browse(new_ids)
+
+    def write(self, vals):
+        if not self._ids:
+            return True
+        unknown = set(vals) - set(self._fields)
+        if unknown:
+            raise ValueError(f"Invalid field(s) {sorted(unknown)} on model {self._name}")
+        names = list(vals)
+        db_values = [self._fields[name].to_db(vals[name]) for name in names]
+        assignments = ', '.join(f'"{name}" = %s' for name in names)
+        for sub_ids in self._cr.split_for_in_conditions(self._ids):
+            self._cr.execute(f'UPDATE "{self._table}" SET {assignments} WHERE id IN %s', db_values + [sub_ids])
+        cache = self._cr.cache
+        for record_id in self._ids:
+            values = cache.get((self._name, record_id))
+            if values is not None:
+                values.update(zip(names, db_values))
+        return True
+
+    def unlink(self):
+        for sub_ids in self._cr.split_for_in_conditions(self._ids):
+            self._cr.execute(f'DELETE FROM "{self._table}" WHERE id IN %s', (sub_ids,))
+        for record_id in self._ids:
+            self._cr.cache.pop((self._name, record_id), None)
+        return True
+
+    def read_group(self, domain, fields, groupby, offset=0, limit=None, orderby=False, lazy=True):
+        if isinstance(groupby, str):
+            groupby = [groupby]
+        groupby = list(groupby)
+        if lazy and groupby:
+            groupby = groupby[:1]
+        for name in groupby:
+            if name not in self._fields:
+                raise ValueError(f"Invalid groupby field {name} for {self._name}")
+
+        selects = [f'"{name}"' for name in groupby] + ['COUNT(*)']
+        aggregates = []
+        for spec in fields:
+            match = _READ_GROUP_SPEC.match(spec.strip())
+            if not match:
+                raise ValueError(f"Invalid read_group field specification {spec!r}")
+            alias, function, source = match.groups()
+            if function and not source:
+                source, function = alias, function
+            source = source or alias
+            if alias in groupby or (source != 'id' and source not in self._fields):
+                continue
+            function = (function or ('sum' if self._fields[source].type == 'integer' else '')).lower()
+            if not function:
+                continue
+            if function == 'array_agg':
+                selects.append(f'group_concat("{source}")')
+            elif function in ('count', 'sum', 'min', 'max', 'avg'):
+                selects.append(f'{function.upper()}("{source}")')
+            elif function == 'count_distinct':
+                selects.append(f'COUNT(DISTINCT "{source}")')
+            else:
+                raise ValueError(f"Unsupported aggregate {function!r}")
+            aggregates.append((alias, function, source))
+
+        where, params = self._where(domain)
+        query = f'SELECT {", ".join(selects)} FROM "{self._table}" WHERE {where}'
+        if groupby:
+            columns = ', '.join(f'"{name}"' for name in groupby)
+            query += f' GROUP BY {columns} ORDER BY {columns}'
+        if limit:
+            query += f' LIMIT {int(limit)}'
+        if offset:
+            query += ('' if limit else ' LIMIT -1') + f' OFFSET {int(offset)}'
+        self._cr.execute(query, params)
+        rows = self._cr.fetchall()
+
+        display = {
+            name: self._display_names(self._fields[name].comodel, [row[index] for row in rows])
+            for index, name in enumerate(groupby) if self._fields[name].type == 'many2one'
+        }
+        count_key = '__count' if not lazy or not groupby else f'{groupby[0]}_count'
+        result = []
+        for row in rows:
+            group = {}
+            group_domain = list(domain or [])
+            for index, name in enumerate(groupby):
+                field = self._fields[name]
+                value = row[index]
+                group_domain.append((name, '=', field.from_db(self.env, value) if field.type != 'many2one' else (value or False)))
+                if field.type == 'many2one':
+                    group[name] = (value, display[name].get(value)) if value else False
+                else:
+                    group[name] = field.from_db(self.env, value)
+            group[count_key] = row[len(groupby)]
+            for offset_index, (alias, function, source) in enumerate(aggregates):
+                value = row[len(groupby) + 1 + offset_index]
+                if function == 'array_agg':
+                    value = [int(v) if v.lstrip('-').isdigit() else v for v in value.split(',')] if value else []
+                group[alias] = value
+            group['__domain'] = group_domain
+            result.append(group)
+        return result
+
+    def fields_get(self, allfields=None, attributes=None):
+        result = {'id': {'type': 'integer', 'string': 'ID'}}
+        for name, field in self._fields.items():
+            result[name] = {'type': field.type, 'string': field.string or name.replace('_', ' ').title()}
+            if field.comodel:
+                result[name]['relation'] = field.comodel
+        if allfields:
+            result = {name: desc for name, desc in result.items() if name in allfields}
+        if attributes:
+            result = {name: {key: desc[key] for key in attributes if key in desc} for name, desc in result.items()}
+        return result
+
+
+class ResCountry(BaseModel):
+    _name = 'res.country'
+    _table = 'res_country'
+    _order = 'name'
+    _fields = {
+        'name': Field('char', 'Country Name', required=True),
+        'code': Field('char', 'Country Code', index=True),
+    }
+
+
+class ResCompany(BaseModel):
+    _name = 'res.company'
+    _table = 'res_company'
+    _fields = {
+        'name': Field('char', 'Company Name', required=True),
+        'country_id': Field('many2one', 'Country', comodel='res.country', index=True),
+        'active': Field('boolean', 'Active', default=True),
+    }
+
+
+class ResPartner(BaseModel):
+    _name = 'res.partner'
+    _table = 'res_partner'
+    _fields = {
+        'name': Field('char', 'Name', required=True),
+        'email': Field('char', 'Email'),
+        'tz': Field('selection', 'Timezone', index=True),
+        'active': Field('boolean', 'Active', default=True),
+        'company_id': Field('many2one', 'Company', comodel='res.company', index=True),
+        'country_id': Field('many2one', 'Country', comodel='res.country'),
+        'marketing_emails_sent_today': Field('integer', 'Marketing Emails Sent Today', default=0, index=True),
+        'marketing_last_email': Field('datetime', 'Last Marketing Email'),
+    }
+
+    def _mel_is_local_midnight(self, tolerance_minutes=0, now=None):
+        return self.env.registry.mel_methods.is_local_midnight(self, tolerance_minutes, now)
+
+    def mel_reset_daily_counters_batch(self):
+        return self.env.registry.mel_methods.reset_daily_counters_batch(self)
+
+    def mel_reset_counters_uk_for_testing(self):
+        return self.env.registry.mel_methods.reset_counters_uk_for_testing(self)
+
+    def mel_reset_counters_canada_for_testing(self):
+        return self.env.registry.mel_methods.reset_counters_canada_for_testing(self)
+
+    def mel_reset_counters_uk_dst_aware(self):
+        return self.env.registry.mel_methods.reset_counters_uk_dst_aware(self)
+
+    def mel_reset_counters_canada_dst_aware(self):
+        return self.env.registry.mel_methods.reset_counters_canada_dst_aware(self)
+
+
+class IrModel(BaseModel):
+    _name = 'ir.model'
+    _table = 'ir_model'
+    _fields = {
+        'model': Field('char', 'Model', required=True, index=True),
+        'name': Field('char', 'Model Description'),
+    }
+
+
+class IrCron(BaseModel):
+    _name = 'ir.cron'
+    _table = 'ir_cron'
+    _fields = {
+        'name': Field('char', 'Name', required=True, index=True),
+        'model_id': Field('many2one', 'Model', comodel='ir.model'),
+        # Stored related model_id.model in Odoo (inherited from ir.actions.server)
+        'model_name': Field('char', 'Model Name'),
+        'state': Field('selection', 'Action To Do', default='code'),
+        'code': Field('text', 'Python Code'),
+        'active': Field('boolean', 'Active', default=True),
+        'interval_number': Field('integer', 'Interval Number', default=1),
+        'interval_type': Field('selection', 'Interval Unit', default='months'),
+        'nextcall': Field('datetime', 'Next Execution Date'),
+        'lastcall': Field('datetime', 'Last Execution Date'),
+        'numbercall': Field('integer', 'Number of Calls', default=-1),
+    }
+
+    def method_direct_trigger(self):
+        for cron in self:
+            model = self.env[cron.model_id.model]
+            exec(compile(cron.code or '', f'ir.cron({cron.id})', 'exec'),
+                 {'env': self.env, 'model': model, 'datetime': datetime, 'timedelta': timedelta})
+            cron.write({'lastcall': self.env.registry.now().replace(tzinfo=None)})
+        return True
+
+
+MODEL_CLASSES = [ResCountry, ResCompany, ResPartner, IrModel, IrCron]
+
+
+# ---------------------------------------------------------------------------
+# Pluggable MEL implementations
+# ---------------------------------------------------------------------------
+
+class LocalMelMethods:
+    """
+    Reference implementation of the mel_reset_* methods for the stand-in environment.
+    Subclass it (or pass any object with the same methods) to make_local_env() to try
+    alternative implementations. Every reset returns the number of partners written.
+    """
+
+    uk_country_codes = ('GB', 'UK')
+    canada_country_codes = ('CA',)
+    uk_timezones = ('Europe/London',)
+    canada_timezones = ('America/St_Johns', 'America/Halifax', 'America/Toronto', 'America/Winnipeg',
+                        'America/Regina', 'America/Edmonton', 'America/Vancouver')
+    default_tz = 'UTC'
+    batch_tolerance_minutes = 5
+    write_chunk_size = IN_MAX
+    # Regional resets rewrite every partner of the region unless dirty_only restricts them
+    # to partners with a non-zero counter
+    dirty_only = False
+
+    def _local_minute(self, env, tz_name, now=None):
+        now = now or env.registry.now()
+        tzinfo = _tz_for_name(tz_name or self.default_tz) or _tz_for_name(self.default_tz)
+        local = now.astimezone(tzinfo)
+        return local.hour * 60 + local.minute
+
+    def _at_midnight(self, env, tz_name, tolerance_minutes, now=None):
+        local_minute = self._local_minute(env, tz_name, now)
+        return local_minute <= tolerance_minutes or local_minute >= 1440 - tolerance_minutes
+
+    def _reset(self, partners, domain):
+        written = 0
+        ids = partners.with_context(active_test=False)._search(domain, order='id')
+        for index in range(0, len(ids), self.write_chunk_size):
+            chunk = partners.browse(ids[index:index + self.write_chunk_size])
+            chunk.write({'marketing_emails_sent_today': 0})
+            written += len(chunk)
+        return written
+
+    def _region_domain(self, partners, country_codes):
+        company_ids = partners.env['res.company']._search([('country_id.code', 'in', list(country_codes))])
+        domain = [('company_id', 'in', company_ids)]
+        if self.dirty_only:
+            domain.append(('marketing_emails_sent_today', '>', 0))
+        return domain
+
+    def is_local_midnight(self, partners, tolerance_minutes=0, now=None):
+        decisions = {}
+        result = []
+        for partner in partners:
+            tz_name = partner.tz or False
+            if tz_name not in decisions:
+                decisions[tz_name] = self._at_midnight(partners.env, tz_name, tolerance_minutes, now)
+            if decisions[tz_name]:
+                result.append(partner.id)
+        return partners.browse(result)
+
+    def reset_daily_counters_batch(self, partners):
+        groups = partners.read_group([('marketing_emails_sent_today', '!=', 0)], ['tz'], ['tz'], lazy=False)
+        due_tzs = [group['tz'] for group in groups
+                   if self._at_midnight(partners.env, group['tz'], self.batch_tolerance_minutes)]
+        if not due_tzs:
+            return 0
+        return self._reset(partners, [('tz', 'in', due_tzs), ('marketing_emails_sent_today', '!=', 0)])
+
+    def reset_counters_uk_for_testing(self, partners):
+        return self._reset(partners, self._region_domain(partners, self.uk_country_codes))
+
+    def reset_counters_canada_for_testing(self, partners):
+        return self._reset(partners, self._region_domain(partners, self.canada_country_codes))
+
+    def reset_counters_uk_dst_aware(self, partners):
+        if not any(self._at_midnight(partners.env, tz_name, 0) for tz_name in self.uk_timezones):
+            return 0
+        return self.reset_counters_uk_for_testing(partners)
+
+    def reset_counters_canada_dst_aware(self, partners):
+        if not any(self._at_midnight(partners.env, tz_name, 0) for tz_name in self.canada_timezones):
+            return 0
+        return self.reset_counters_canada_for_testing(partners)
+
+
+# ---------------------------------------------------------------------------
+# Registry and environment
+# ---------------------------------------------------------------------------
+
+class LocalRegistry:
+    """
+    Stand-in for odoo.modules.registry.Registry: owns the SQLite database, the model classes,
+    the MEL implementation and the clock. cursor() opens an independent connection.
+    """
+
+    def __init__(self, db_path=None, mel_methods=None, clock=None, dbname=None):
+        if db_path is None:
+            handle, db_path = tempfile.mkstemp(prefix='mel_local_env_', suffix='.sqlite3')
+            os.close(handle)
+            self._owns_file = True
+        else:
+            self._owns_file = False
+        self.db_path = db_path
+        self.dbname = dbname or os.path.splitext(os.path.basename(db_path))[0]
+        self.models = {cls._name: cls for cls in MODEL_CLASSES}
+        self.mel_methods = mel_methods or LocalMelMethods()
+        self.clock = clock
+        self._create_schema()
+
+    def now(self):
+        """
+        Current UTC time as an aware datetime, taken from the injectable clock when one is set
+        """
+        now = self.clock() if self.clock else datetime.now(timezone.utc)
+        return now if now.tzinfo else now.replace(tzinfo=timezone.utc)
+
+    def _create_schema(self):
+        cnx = sqlite3.connect(self.db_path, isolation_level=None)
+        cnx.execute('PRAGMA journal_mode=WAL')
+        for cls in self.models.values():
+            columns = ', '.join(f'"{name}" {field.SQL_TYPES[field.type]}' for name, field in cls._fields.items())
+            cnx.execute(f'CREATE TABLE IF NOT EXISTS "{cls._table}" (id INTEGER PRIMARY KEY AUTOINCREMENT, {columns})')
+            for name, field in cls._fields.items():
+                if field.index:
+                    cnx.execute(f'CREATE INDEX IF NOT EXISTS "{cls._table}_{name}_index" ON "{cls._table}" ("{name}")')
+        cnx.close()
+
+    def cursor(self):
+        return LocalCursor(self)
+
+    def close(self):
+        if self._owns_file:
+            for suffix in ('', '-wal', '-shm'):
+                try:
+                    os.remove(self.db_path + suffix)
+                except OSError:
+                    pass
+
+
+class LocalEnvironment:
+    """
+    Stand-in for odoo.api.Environment: env[model], env.cr, env.context, env.registry
+    """
+
+    def __init__(self, cr, uid=1, context=None):
+        self.cr = cr
+        self.uid = uid
+        self.context = dict(context or {})
+        self.registry = cr.registry
+
+    def __call__(self, cr=None, user=None, context=None, su=None):
+        return LocalEnvironment(cr or self.cr, self.uid if user is None else user,
+                                self.context if context is None else context)
+
+    def __getitem__(self, model_name):
+        return self.registry.models[model_name](self)
+
+    def __contains__(self, model_name):
+        return model_name in self.registry.models
+
+    @property
+    def cache(self):
+        return self.cr.cache
+
+    def flush_all(self):
+        """
+        Writes are executed immediately, there is nothing to flush
+        """
+
+    def invalidate_all(self, flush=True):
+        self.cr.cache.clear()
+
+    def invalidate_cache(self, fnames=None, ids=None):
+        self.cr.cache.clear()
+
+
+# ---------------------------------------------------------------------------
+# Sample data and script runner
+# ---------------------------------------------------------------------------
+
+SAMPLE_COUNTRIES = [
+    ('GB', 'United Kingdom'), ('CA', 'Canada'), ('US', 'United States'),
+    ('FR', 'France'), ('DE', 'Germany'), ('IE', 'Ireland'),
+]
+
+SAMPLE_COMPANIES = [
+    ('SIT UK Ltd', 'GB'), ('SIT Scotland Ltd', 'GB'), ('SIT Canada Inc', 'CA'),
+    ('SIT US LLC', 'US'), ('SIT France SAS', 'FR'), ('SIT Germany GmbH', 'DE'), ('SIT Holding', None),
+]
+
+SAMPLE_TIMEZONES = {
+    'GB': ['Europe/London'],
+    'CA': ['America/Toronto', 'America/Vancouver', 'America/Halifax', 'America/Edmonton'],
+    'US': ['America/New_York', 'America/Chicago', 'America/Los_Angeles'],
+    'FR': ['Europe/Paris'],
+    'DE': ['Europe/Berlin'],
+    None: ['UTC', False],
+}
+
+# The regional crons share the batch cron's name: the scripts tell them apart by the method they call
+SAMPLE_CRONS = [
+    (MEL_CRON_NAME, 'model.mel_reset_daily_counters_batch()', 1, 'hours'),
+    (MEL_CRON_NAME, 'model.mel_reset_counters_uk_dst_aware()', 1, 'hours'),
+    (MEL_CRON_NAME, 'model.mel_reset_counters_canada_dst_aware()', 1, 'hours'),
+]
+
+
+def populate_reference_data(env):
+    """
+    Create the sample countries, companies, ir.model and MEL crons. Returns {country code: country id}
+    """
+    countries = env['res.country'].create([{'code': code, 'name': name} for code, name in SAMPLE_COUNTRIES])
+    country_ids = dict(zip([code for code, _name in SAMPLE_COUNTRIES], countries.ids))
+    env['res.company'].create([
+        {'name': name, 'country_id': country_ids.get(code, False)} for name, code in SAMPLE_COMPANIES
+    ])
+    partner_model = env['ir.model'].create({'model': 'res.partner', 'name': 'Contact'})
+    env['ir.cron'].create([
+        {'name': name, 'model_id': partner_model.id, 'model_name': partner_model.model, 'code': code, 'interval_number': number,
+         'interval_type': interval_type, 'nextcall': env.registry.now().replace(tzinfo=None)}
+        for name, code, number, interval_type in SAMPLE_CRONS
+    ])
+    return country_ids
+
+
+def populate_sample_partners(env, partners_per_company=25, nonzero_ratio=0.5, seed=0, archived_every=10):
+    """
+    Create partners_per_company partners for every sample company with a tz matching the company
+    country and a random non-zero counter for nonzero_ratio of them. Every archived_every-th
+    partner of a company is archived (0 for none), counter included, like real tenants.
+    """
+    rng = random.Random(seed)
+    company_rows = env['res.company'].search_read([], ['name', 'country_id'])
+    code_by_country = {row['id']: row['code'] for row in env['res.country'].search_read([], ['code'])}
+    vals_list = []
+    for company in company_rows:
+        code = code_by_country.get(company['country_id'][0]) if company['country_id'] else None
+        timezones = SAMPLE_TIMEZONES.get(code, SAMPLE_TIMEZONES[None])
+        for index in range(partners_per_company):
+            vals_list.append({
+                'name': f"{company['name']} Contact {index + 1}",
+                'email': f"contact{index + 1}.{company['id']}@example.com",
+                'tz': rng.choice(timezones),
+                'company_id': company['id'],
+                'marketing_emails_sent_today': rng.randint(1, 20) if rng.random() < nonzero_ratio else 0,
+                'active': not archived_every or (index + 1) % archived_every != 0,
+            })
+    return env['res.partner'].create(vals_list)
+
+
+def make_local_env(db_path=None, populate=True, partners_per_company=25, mel_methods=None, clock=None):
+    """
+    Build a stand-in env on a fresh SQLite database, optionally filled with sample data
+    """
+    registry = LocalRegistry(db_path, mel_methods=mel_methods, clock=clock)
+    env = LocalEnvironment(registry.cursor())
+    if populate:
+        populate_reference_data(env)
+        if partners_per_company:
+            populate_sample_partners(env, partners_per_company)
+        env.cr.commit()
+    return env
+
+
+def load_script(script, namespace=None):
+    """
+    Execute a shell script file into namespace (a fresh dict by default) and return the namespace
+    """
+    path = script if os.path.isabs(script) or os.path.exists(script) else os.path.join(SCRIPT_DIR, script)
+    with open(path, encoding='utf-8') as handle:
+        code = compile(handle.read(), path, 'exec')
+    namespace = {} if namespace is None else namespace
+    namespace.setdefault('__name__', 'odoo_shell_script')
+    exec(code, namespace)
+    return namespace
+
+
+def run_script(script, entry, env, *args, **kwargs):
+    """
+    Load script with `env` in its globals, exactly as odoo-bin shell would, and call entry
+    """
+    namespace = load_script(script, {'env': env, '__name__': 'odoo_shell_script'})
+    return namespace[entry](*args, **kwargs)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run MEL shell scripts against a local SQLite stand-in env")
+    parser.add_argument('script', nargs='?', help="script file (default: both MEL test scripts)")
+    parser.add_argument('entry', nargs='?', help="entry point to call in the script")
+    parser.add_argument('--partners-per-company', type=int, default=25)
+    parser.add_argument('--db', help="SQLite file to use (default: a temporary file)")
+    args = parser.parse_args()
+
+    local_env = make_local_env(args.db, partners_per_company=args.partners_per_company)
+    targets = [(args.script, args.entry or 'run_all_tests')] if args.script else [
+        ('odoo-reset-email-counter-split.py', 'run_all_tests'),
+        ('odoo_shell_test_mel_counters.py', 'run_mel_counter_tests'),
+    ]
+    try:
+        for script_name, entry_name in targets:
+            started = time.perf_counter()
+            run_script(script_name, entry_name, local_env)
+            print(f"\n[{script_name}:{entry_name}] {time.perf_counter() - started:.3f}s, "
+                  f"{local_env.cr.sql_log_count} SQL statements so far")
+    finally:
+        local_env.cr.close()
+        local_env.registry.close()
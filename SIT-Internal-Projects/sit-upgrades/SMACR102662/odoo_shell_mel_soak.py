@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Send-traffic soak test for the MEL reset methods
+Worker threads, each with its own cursor, keep incrementing marketing_emails_sent_today and
+setting marketing_last_email on dedicated soak partners (read, write, commit, like a mailing job)
+while the main cursor runs mel_reset_counters_uk_for_testing, mel_reset_counters_canada_for_testing
+or mel_reset_daily_counters_batch a few times. Reports reset latency (quiet and under load),
+reset retries (with backoff) and resets that still failed, worker write latency and estimated
+lock wait, serialization failures, and lost or double-counted increments derived from the
+commit ledger of every worker.
+
+The soak partners are committed (workers cannot see uncommitted rows) and removed at the end.
+The regional resets zero the real partners of their region too: run it on a staging copy.
+
+Standalone on the SQLite stand-in env (clock fixed at London midnight):
+    python3 odoo_shell_mel_soak.py --workers 4 --resets 3
+Inside an Odoo shell, with the directory of this file on sys.path:
+    from odoo_shell_mel_soak import run_soak_test
+    run_soak_test(env, workers=8, per_region=500)
+"""
+
+import random
+import threading
+import time
+from array import array
+from datetime import datetime, timezone
+
+from odoo_shell_mel_common import _flush_env, _invalidate_env_cache, _is_serialization_failure
+
+SOAK_METHODS = (
+    'mel_reset_counters_uk_for_testing',
+    'mel_reset_counters_canada_for_testing',
+    'mel_reset_daily_counters_batch',
+)
+
+SOAK_PREFIX = 'MEL Soak'
+
+# Company countries and partner tz of each soak partner set. Control partners belong to no
+# region and sit in a timezone far from London and Canadian midnights.
+SOAK_REGIONS = {
+    'uk': (('GB', 'UK'), 'Europe/London'),
+    'canada': (('CA',), 'America/Toronto'),
+    'control': (None, 'Asia/Tokyo'),
+}
+
+# Region whose partners each regional method resets
+METHOD_REGION = {
+    'mel_reset_counters_uk_for_testing': 'uk',
+    'mel_reset_counters_canada_for_testing': 'canada',
+}
+
+# Minutes around local midnight treated as "reset by the batch method" / "too close to call"
+BATCH_TARGET_TOLERANCE = 5
+BATCH_CONTROL_DISTANCE = 60
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def create_soak_partners(env, per_region=200):
+    """
+    Create and commit per_region soak partners for each SOAK_REGIONS entry, counters at 0.
+    Returns {region: [partner ids]}.
+    """
+    partner_sets = {}
+    for region, (country_codes, tz_name) in SOAK_REGIONS.items():
+        if country_codes:
+            company_ids = env['res.company'].search([('country_id.code', 'in', list(country_codes))]).ids
+        else:
+            company_ids = []
+        vals_list = [{
+            'name': f"{SOAK_PREFIX} {region} {index + 1}",
+            'email': f"mel.soak.{region}.{index + 1}@example.com",
+            'tz': tz_name,
+            'company_id': company_ids[index % len(company_ids)] if company_ids else False,
+            'marketing_emails_sent_today': 0,
+        } for index in range(per_region)]
+        if country_codes and not company_ids:
+            print(f"✗ No company found for {region} ({', '.join(country_codes)}), its soak partners have no company")
+        partner_sets[region] = env['res.partner'].create(vals_list).ids
+    env.cr.commit()
+    return partner_sets
+
+
+def drop_soak_partners(env):
+    env['res.partner'].with_context(active_test=False).search([('name', '=like', f"{SOAK_PREFIX} %")]).unlink()
+    env.cr.commit()
+
+
+class IncrementWorker(threading.Thread):
+    """
+    Mailing-job stand-in: on its own cursor, repeatedly reads a partner counter, writes it + 1
+    with marketing_last_email and commits. Serialization failures are rolled back and counted.
+    Every committed increment is kept in a ledger (partner id, commit start, commit end).
+    """
+
+    def __init__(self, env, partner_ids, stop, seed=0, think_time=0.0):
+        super().__init__(daemon=True)
+        self.env = env
+        self.partner_ids = partner_ids
+        self.stop = stop
+        self.rng = random.Random(seed)
+        self.think_time = think_time
+        self.ledger_ids = array('q')
+        self.ledger_commit_start = array('d')
+        self.ledger_commit_end = array('d')
+        self.write_latencies = []
+        self.serialization_failures = 0
+        self.other_errors = 0
+        self.first_error = None
+
+    def run(self):
+        cr = self.env.registry.cursor()
+        worker_env = self.env(cr=cr)
+        try:
+            while not self.stop.is_set():
+                partner_id = self.rng.choice(self.partner_ids)
+                try:
+                    _invalidate_env_cache(worker_env)
+                    partner = worker_env['res.partner'].browse(partner_id)
+                    value = partner.marketing_emails_sent_today or 0
+                    started = time.perf_counter()
+                    partner.write({
+                        'marketing_emails_sent_today': value + 1,
+                        'marketing_last_email': datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0),
+                    })
+                    _flush_env(worker_env)
+                    written = time.perf_counter()
+                    cr.commit()
+                    committed = time.perf_counter()
+                except Exception as exc:
+                    cr.rollback()
+                    if _is_serialization_failure(exc):
+                        self.serialization_failures += 1
+                    else:
+                        self.other_errors += 1
+                        self.first_error = self.first_error or f"{type(exc).__name__}: {exc}"
+                    continue
+                self.write_latencies.append((started, written - started))
+                self.ledger_ids.append(partner_id)
+                self.ledger_commit_start.append(written)
+                self.ledger_commit_end.append(committed)
+                if self.think_time:
+                    time.sleep(self.think_time)
+        finally:
+            cr.close()
+
+
+def _run_reset(env, method_name, max_attempts=10, backoff=0.01, max_backoff=0.5, rng=None):
+    """
+    Run one reset on the main cursor and commit it. A serialization failure is rolled back and
+    retried after an exponential backoff with jitter (backoff * 2**retry seconds, at most
+    max_backoff); after max_attempts the reset is recorded as failed instead of raising.
+    Returns {'latency_ms', 'attempts', 'backoff_ms', 'failed', 'error', 'started', 'commit_start',
+    'commit_end', 'result'}; latency_ms is the successful attempt only.
+    """
+    rng = rng or random.Random()
+    backoff_seconds = 0.0
+    for attempt in range(1, max_attempts + 1):
+        _invalidate_env_cache(env)
+        started = time.perf_counter()
+        try:
+            result = getattr(env['res.partner'], method_name)()
+            _flush_env(env)
+            commit_start = time.perf_counter()
+            env.cr.commit()
+            commit_end = time.perf_counter()
+        except Exception as exc:
+            env.cr.rollback()
+            if not _is_serialization_failure(exc):
+                raise
+            if attempt == max_attempts:
+                return {'latency_ms': None, 'attempts': attempt, 'backoff_ms': backoff_seconds * 1000,
+                        'failed': True, 'error': f"{type(exc).__name__}: {exc}", 'started': started,
+                        'commit_start': None, 'commit_end': time.perf_counter(), 'result': None}
+            delay = min(max_backoff, backoff * 2 ** (attempt - 1)) * rng.uniform(0.5, 1.0)
+            backoff_seconds += delay
+            time.sleep(delay)
+            continue
+        return {'latency_ms': (commit_end - started) * 1000, 'attempts': attempt,
+                'backoff_ms': backoff_seconds * 1000, 'failed': False, 'error': None, 'started': started,
+                'commit_start': commit_start, 'commit_end': commit_end,
+                'result': result if isinstance(result, int) and not isinstance(result, bool) else None}
+
+
+def _batch_partner_sets(env, partner_ids):
+    """
+    Split soak partners into those the batch reset zeroes now and those it cannot touch
+    """
+    partners = env['res.partner'].browse(partner_ids)
+    target = set(partners._mel_is_local_midnight(tolerance_minutes=BATCH_TARGET_TOLERANCE).ids)
+    near = set(partners._mel_is_local_midnight(tolerance_minutes=BATCH_CONTROL_DISTANCE).ids)
+    control = [partner_id for partner_id in partner_ids if partner_id not in near]
+    return sorted(target), control
+
+
+def _account(workers, final_values, target_ids, control_ids, last_reset):
+    """
+    Compare final counters with the worker ledgers. A target partner must hold the increments
+    committed after the last reset committed; increments whose commit overlapped the reset
+    commit may or may not count. A control partner, or any partner when no reset committed,
+    must hold every increment.
+    Returns {'lost', 'double', 'ambiguous', 'checked'}.
+    """
+    after = {}
+    overlapping = {}
+    total = {}
+    reset_start = last_reset['commit_start'] if last_reset else None
+    reset_end = last_reset['commit_end'] if last_reset else None
+    for worker in workers:
+        for partner_id, commit_start, commit_end in zip(worker.ledger_ids, worker.ledger_commit_start,
+                                                         worker.ledger_commit_end):
+            total[partner_id] = total.get(partner_id, 0) + 1
+            if last_reset is None:
+                continue
+            if commit_start > reset_end:
+                after[partner_id] = after.get(partner_id, 0) + 1
+            elif commit_end >= reset_start:
+                overlapping[partner_id] = overlapping.get(partner_id, 0) + 1
+    lost = double = ambiguous = 0
+    for partner_id in target_ids:
+        if last_reset is None:
+            # No reset committed: the target partners must hold every increment too
+            low = high = total.get(partner_id, 0)
+        else:
+            low = after.get(partner_id, 0)
+            high = low + overlapping.get(partner_id, 0)
+        ambiguous += high - low
+        actual = final_values.get(partner_id, 0)
+        lost += max(0, low - actual)
+        double += max(0, actual - high)
+    for partner_id in control_ids:
+        expected = total.get(partner_id, 0)
+        actual = final_values.get(partner_id, 0)
+        lost += max(0, expected - actual)
+        double += max(0, actual - expected)
+    return {'lost': lost, 'double': double, 'ambiguous': ambiguous,
+            'checked': len(target_ids) + len(control_ids)}
+
+
+def soak_method(env, method_name, partner_sets, workers=4, resets=3, reset_interval=1.0, warmup=0.5,
+                think_time=0.0, seed=0):
+    """
+    Soak one reset method: measure a quiet reset, start the increment workers, run `resets`
+    resets reset_interval seconds apart, stop the workers and check the counters.
+    Returns the result row of the method.
+    """
+    all_ids = [partner_id for ids in partner_sets.values() for partner_id in ids]
+    env['res.partner'].browse(all_ids).write({'marketing_emails_sent_today': 0})
+    env.cr.commit()
+    rng = random.Random(seed)
+    quiet = _run_reset(env, method_name, rng=rng)
+
+    stop = threading.Event()
+    pool = [IncrementWorker(env, all_ids, stop, seed + index, think_time) for index in range(workers)]
+    loaded = []
+    target_ids = control_ids = None
+    try:
+        for worker in pool:
+            worker.start()
+        time.sleep(warmup)
+        for index in range(resets):
+            if index:
+                time.sleep(reset_interval)
+            if index == resets - 1 and method_name not in METHOD_REGION:
+                target_ids, control_ids = _batch_partner_sets(env, all_ids)
+            loaded.append(_run_reset(env, method_name, rng=rng))
+        time.sleep(warmup)
+    finally:
+        # The workers must be gone before anything else touches the soak partners
+        stop.set()
+        for worker in pool:
+            if worker.is_alive():
+                worker.join()
+
+    if method_name in METHOD_REGION:
+        region = METHOD_REGION[method_name]
+        target_ids = partner_sets[region]
+        control_ids = [partner_id for name, ids in partner_sets.items() if name != region for partner_id in ids]
+    env.cr.rollback()
+    _invalidate_env_cache(env)
+    final_values = {
+        row['id']: row['marketing_emails_sent_today']
+        for row in env['res.partner'].search_read([('id', 'in', all_ids)], ['marketing_emails_sent_today'])
+    }
+    succeeded = [reset for reset in loaded if not reset['failed']]
+    accounting = _account(pool, final_values, target_ids, control_ids, succeeded[-1] if succeeded else None)
+
+    windows = [(reset['started'], reset['commit_end']) for reset in loaded]
+    during, outside = [], []
+    for worker in pool:
+        for started, latency in worker.write_latencies:
+            (during if any(start <= started <= end for start, end in windows) else outside).append(latency)
+    baseline = _percentile(outside, 0.5)
+    return {
+        'method': method_name,
+        'workers': workers,
+        'increments': sum(len(worker.ledger_ids) for worker in pool),
+        'quiet_reset_ms': quiet['latency_ms'],
+        'quiet_reset_failed': quiet['failed'],
+        'reset_ms': [reset['latency_ms'] for reset in succeeded],
+        'reset_attempts': [reset['attempts'] for reset in loaded],
+        'reset_backoff_ms': sum(reset['backoff_ms'] for reset in loaded),
+        'reset_failures': sum(1 for reset in loaded if reset['failed']),
+        'reset_error': next((reset['error'] for reset in loaded if reset['failed']), quiet['error']),
+        'reset_rows': [reset['result'] for reset in loaded],
+        'write_p50_ms': _percentile(outside, 0.5) * 1000,
+        'write_p95_ms': _percentile(outside, 0.95) * 1000,
+        'write_during_reset_p95_ms': _percentile(during, 0.95) * 1000,
+        'write_max_ms': max(during + outside, default=0.0) * 1000,
+        'lock_wait_ms': sum(max(0.0, latency - baseline) for latency in during) * 1000,
+        'serialization_failures': sum(worker.serialization_failures for worker in pool),
+        'other_errors': sum(worker.other_errors for worker in pool),
+        'first_error': next((worker.first_error for worker in pool if worker.first_error), None),
+        'target_partners': len(target_ids or ()),
+        **accounting,
+    }
+
+
+def print_soak_report(rows):
+    print("\n" + "="*110)
+    print("MEL RESET SOAK TEST")
+    print("="*110)
+    print(f"{'method':<38} {'quiet ms':>9} {'loaded ms':>10} {'retries':>7} {'failed':>6} {'incr':>7} "
+          f"{'ser.fail':>8} {'wr p95':>7} {'wr@reset':>8} {'lock ms':>8}")
+    print("-"*110)
+    for row in rows:
+        loaded = max(row['reset_ms']) if row['reset_ms'] else 0.0
+        retries = sum(row['reset_attempts']) - len(row['reset_attempts'])
+        quiet = row['quiet_reset_ms'] or 0.0
+        print(f"{row['method']:<38} {quiet:>9.1f} {loaded:>10.1f} {retries:>7} {row['reset_failures']:>6} "
+              f"{row['increments']:>7} {row['serialization_failures']:>8} {row['write_p95_ms']:>7.1f} "
+              f"{row['write_during_reset_p95_ms']:>8.1f} {row['lock_wait_ms']:>8.1f}")
+    print("-"*110)
+    for row in rows:
+        if row['lost'] or row['double']:
+            print(f"✗ {row['method']}: {row['lost']} lost and {row['double']} double-counted increment(s) "
+                  f"over {row['checked']} partners")
+        else:
+            print(f"✓ {row['method']}: no lost or double-counted increments over {row['checked']} partners "
+                  f"({row['ambiguous']} increment(s) raced the reset commit)")
+        if row['reset_failures'] or row['quiet_reset_failed']:
+            print(f"  ✗ {row['reset_failures'] + row['quiet_reset_failed']} reset(s) still failed after "
+                  f"{row['reset_backoff_ms']:.0f} ms of backoff, last error: {row['reset_error']}")
+        if not row['target_partners']:
+            print(f"  ✗ no soak partner was due for reset, the method ran as a no-op")
+        if row['other_errors']:
+            print(f"  ✗ {row['other_errors']} worker error(s), first: {row['first_error']}")
+    print("="*110)
+
+
+def run_soak_test(env=None, methods=SOAK_METHODS, workers=4, per_region=200, resets=3, reset_interval=1.0,
+                  warmup=0.5, think_time=0.0, seed=0, keep_partners=False):
+    """
+    Create the soak partners, soak every method and print the report. Returns the result rows.
+    """
+    env = env or globals().get('env')
+    drop_soak_partners(env)
+    partner_sets = create_soak_partners(env, per_region)
+    rows = []
+    try:
+        for method_name in methods:
+            rows.append(soak_method(env, method_name, partner_sets, workers, resets, reset_interval, warmup,
+                                    think_time, seed))
+    finally:
+        env.cr.rollback()
+        if not keep_partners:
+            drop_soak_partners(env)
+    print_soak_report(rows)
+    return rows
+
+
+if __name__ == "__main__" and "env" not in globals():
+    import argparse
+
+    from odoo_shell_mel_benchmark import next_local_midnight_utc
+    from odoo_shell_mel_local_env import make_local_env
+
+    parser = argparse.ArgumentParser(description="Soak the MEL reset methods under concurrent send traffic")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--per-region', type=int, default=200, help="soak partners per region")
+    parser.add_argument('--resets', type=int, default=3, help="resets per method under load")
+    parser.add_argument('--interval', type=float, default=1.0, help="seconds between resets")
+    parser.add_argument('--think-time', type=float, default=0.0, help="pause between increments per worker")
+    parser.add_argument('--methods', default=','.join(SOAK_METHODS))
+    args = parser.parse_args()
+
+    midnight = next_local_midnight_utc('Europe/London')
+    local_env = make_local_env(partners_per_company=25, clock=lambda: midnight)
+    try:
+        run_soak_test(local_env, args.methods.split(','), args.workers, args.per_region, args.resets,
+                      args.interval, think_time=args.think_time)
+    finally:
+        local_env.cr.close()
+        local_env.registry.close()
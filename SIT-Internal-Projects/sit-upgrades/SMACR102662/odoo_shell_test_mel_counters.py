@@ -5,241 +5,651 @@ ODOO SHELL TESTING SCRIPT for MEL: Reset Daily Marketing Email Counters function
 This script is designed to be run inside an Odoo shell: ./odoo-bin shell -d your_database
 """
 
-def run_mel_counter_tests():
+import inspect
+import os
+import sys
+from array import array
+from datetime import datetime, timezone
+
+# Shared helpers, executed into this namespace (see odoo-reset-email-counter-split.py)
+_MEL_COMMON_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(globals().get('__file__') or sys._getframe().f_code.co_filename)),
+    'odoo_shell_mel_common.py')
+if not os.path.exists(_MEL_COMMON_PATH):
+    _MEL_COMMON_PATH = os.path.join('SIT-Internal-Projects', 'sit-upgrades', 'SMACR102662',
+                                    'odoo_shell_mel_common.py')
+with open(_MEL_COMMON_PATH, encoding='utf-8') as _mel_common_file:
+    exec(compile(_mel_common_file.read(), _MEL_COMMON_PATH, 'exec'), globals())
+
+# Widest local-midnight window (minutes) the batch reset may use; partners inside it may be reset
+BATCH_RESET_TOLERANCE_MINUTES = 5
+
+# Name prefix of the partners created by PartnerFixtureFactory
+FIXTURE_NAME_PREFIX = 'MEL Fixture'
+
+# Timezones of the default fixture pool: UK, every Canadian offset, and the usual others
+FIXTURE_POOL_TIMEZONES = [
+    'Europe/London', 'America/St_Johns', 'America/Halifax', 'America/Toronto', 'America/Winnipeg',
+    'America/Regina', 'America/Edmonton', 'America/Vancouver', 'UTC', 'US/Eastern', 'Asia/Kolkata',
+]
+
+# Methods, fields and cron jobs the MEL module must provide, checked by check_mel_contract()
+MEL_CONTRACT = {
+    'models': {
+        'res.partner': {
+            'methods': ['mel_reset_daily_counters_batch', '_mel_is_local_midnight'],
+            'fields': {
+                'marketing_emails_sent_today': 'integer',
+                'marketing_last_email': 'datetime',
+                'tz': 'selection',
+            },
+        },
+    },
+    'crons': {
+        'MEL: Reset Daily Marketing Email Counters': 'mel_reset_daily_counters_batch',
+    },
+}
+
+
+def _is_within_midnight(local_minute, tolerance_minutes):
+    return local_minute <= tolerance_minutes or local_minute >= 1440 - tolerance_minutes
+
+
+def _mel_now(env):
+    """
+    Current UTC time as seen by the registry: env.registry.now() when the registry has a clock
+    (the local stand-in does), the wall clock otherwise
+    """
+    registry_now = getattr(env.registry, 'now', None)
+    now = registry_now() if callable(registry_now) else datetime.now(timezone.utc)
+    return now if now.tzinfo else now.replace(tzinfo=timezone.utc)
+
+
+def _is_local_midnight(partners, tolerance_minutes=0, now=None):
+    """
+    Call _mel_is_local_midnight, handing it now when the method accepts one,
+    so the method and the oracle decide on the same instant
+    """
+    method = partners._mel_is_local_midnight
+    if now is not None and 'now' in inspect.signature(method).parameters:
+        return method(tolerance_minutes=tolerance_minutes, now=now)
+    return method(tolerance_minutes=tolerance_minutes)
+
+
+def expected_local_midnight_partner_ids(env, domain, tolerance_minutes=0, now=None,
+                                        default_tz=DEFAULT_PARTNER_TZ):
+    """
+    Independent oracle for _mel_is_local_midnight.
+    Partners matching domain (archived ones included) are grouped by distinct tz value in one
+    read_group query, the UTC offset is computed once per bucket and the whole bucket is decided
+    with a single comparison. Partners without a tz (or with an unknown one) use default_tz.
+    Returns (set of partner ids expected at local midnight, list of bucket summaries)
+    """
+    now_utc = now or _mel_now(env)
+    if now_utc.tzinfo is None:
+        now_utc = now_utc.replace(tzinfo=timezone.utc)
+    utc_minute = now_utc.hour * 60 + now_utc.minute
+    
+    # Archived partners included, like the chunks streamed by iter_partner_chunks()
+    groups = env['res.partner'].with_context(active_test=False).read_group(
+        domain, ['tz', 'partner_ids:array_agg(id)'], ['tz'], lazy=False)
+    
+    expected_ids = set()
+    buckets = []
+    for group in groups:
+        tz_name = group['tz'] or default_tz
+        tzinfo = _tz_for_name(tz_name) or _tz_for_name(default_tz)
+        offset_minutes = int(now_utc.astimezone(tzinfo).utcoffset().total_seconds() // 60)
+        local_minute = (utc_minute + offset_minutes) % 1440
+        at_midnight = _is_within_midnight(local_minute, tolerance_minutes)
+        partner_ids = group['partner_ids'] or []
+        if at_midnight:
+            expected_ids.update(partner_ids)
+        buckets.append({
+            'tz': group['tz'] or False,
+            'offset_minutes': offset_minutes,
+            'at_midnight': at_midnight,
+            'count': len(partner_ids),
+        })
+    return expected_ids, buckets
+
+
+def _report_midnight_cross_check(expected_ids, actual_ids):
+    """
+    Print the differences between the oracle and _mel_is_local_midnight, return True when they agree
+    """
+    missing = expected_ids - actual_ids
+    unexpected = actual_ids - expected_ids
+    if not missing and not unexpected:
+        print(f"✓ Oracle agrees with _mel_is_local_midnight ({len(actual_ids)} partner(s) at local midnight)")
+        return True
+    print(f"✗ Oracle mismatch: {len(missing)} expected but not returned, {len(unexpected)} returned but not expected")
+    if missing:
+        print(f"  - Missing ids (first 10): {sorted(missing)[:10]}")
+    if unexpected:
+        print(f"  - Unexpected ids (first 10): {sorted(unexpected)[:10]}")
+    return False
+
+
+def cross_check_local_midnight(env, domain=None, tolerance_minutes=0, chunk_size=None, now=None):
+    """
+    Cross-check _mel_is_local_midnight(tolerance_minutes=...) against the tz-bucketed oracle.
+    The helper method is called once per streamed chunk, never once per partner.
+    now defaults to env.registry.now() when the registry has a clock, the wall clock otherwise;
+    only then is a minute boundary crossed during the check reported.
+    """
+    domain = domain if domain is not None else [('active', '=', True)]
+    pinned = now is not None
+    now = now or _mel_now(env)
+    expected_ids, buckets = expected_local_midnight_partner_ids(env, domain, tolerance_minutes, now)
+    print(f"Oracle: {sum(b['count'] for b in buckets)} partner(s) in {len(buckets)} tz bucket(s), "
+          f"{len(expected_ids)} expected at local midnight (tolerance {tolerance_minutes} min)")
+    
+    actual_ids = set()
+    for chunk in iter_partner_chunks(env, domain, chunk_size):
+        actual_ids.update(_is_local_midnight(chunk, tolerance_minutes, now).ids)
+    if not pinned and _mel_now(env).replace(second=0, microsecond=0) != now.replace(second=0, microsecond=0):
+        print("  (the check crossed a minute boundary, mismatches near midnight may be spurious)")
+    return _report_midnight_cross_check(expected_ids, actual_ids)
+
+
+class PartnerFixtureFactory:
+    """
+    Build test partners from a compact spec of (tz, counter, company_id, count[, name]) rows,
+    inserted with one multi-record create per batch of batch_size.
+    Tagged pools survive between runs: ensure_pool() only creates the rows a pool is missing,
+    rewrites the counters that drifted and deletes the rows the spec no longer has, instead of
+    recreating the partners.
+    """
+
+    def __init__(self, env, batch_size=None):
+        self.env = env
+        self.batch_size = batch_size or PARTNER_CHUNK_SIZE
+
+    @staticmethod
+    def _rows(spec):
+        rows = []
+        for row in spec:
+            tz_name, counter, company_id, count = row[:4]
+            rows.append({'tz': tz_name or False, 'counter': counter, 'company_id': company_id or False,
+                         'count': count, 'name': row[4] if len(row) > 4 else None})
+        return rows
+
+    @staticmethod
+    def _partner_name(row, index, tag=None):
+        if row['name'] and row['count'] == 1 and not tag:
+            return row['name']
+        base = row['name'] or f"{row['tz'] or 'no tz'} c{row['company_id'] or 0} n{row['counter']}"
+        return f"{FIXTURE_NAME_PREFIX} [{tag}] {base} #{index}" if tag else f"{base} #{index}"
+
+    def _vals(self, row, name):
+        vals = {
+            'name': name,
+            'email': f"{name.lower().replace(' ', '.').replace('/', '.').replace('#', '')}@example.com",
+            'marketing_emails_sent_today': row['counter'],
+        }
+        if row['tz']:
+            vals['tz'] = row['tz']
+        if row['company_id']:
+            vals['company_id'] = row['company_id']
+        return vals
+
+    def _create(self, vals_list):
+        ids = []
+        for start in range(0, len(vals_list), self.batch_size):
+            ids.extend(self.env['res.partner'].create(vals_list[start:start + self.batch_size]).ids)
+        return self.env['res.partner'].browse(ids)
+
+    def create(self, spec):
+        """
+        Create the partners of spec and return them as one recordset, in spec order
+        """
+        vals_list = []
+        for row in self._rows(spec):
+            for index in range(1, row['count'] + 1):
+                vals_list.append(self._vals(row, self._partner_name(row, index)))
+        return self._create(vals_list)
+
+    def pool_domain(self, tag):
+        # The tag is matched literally: escape the LIKE wildcards it may contain
+        escaped_tag = str(tag).replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        return [('name', '=like', f"{FIXTURE_NAME_PREFIX} [{escaped_tag}] %")]
+
+    def ensure_pool(self, tag, spec, commit=False):
+        """
+        Return the partners of the pool tagged tag, in spec order, creating only the missing ones,
+        resetting the counters of existing ones to their spec values (one write per distinct
+        counter) and deleting the pool rows the spec no longer has.
+        With commit=True the pool is committed so the next run can reuse it.
+        """
+        existing = {
+            row['name']: row
+            for row in self.env['res.partner'].with_context(active_test=False).search_read(
+                self.pool_domain(tag), ['name', 'marketing_emails_sent_today'])
+        }
+        names = []
+        to_create = []
+        to_reset = {}
+        for row in self._rows(spec):
+            for index in range(1, row['count'] + 1):
+                name = self._partner_name(row, index, tag)
+                names.append(name)
+                current = existing.get(name)
+                if current is None:
+                    to_create.append(self._vals(row, name))
+                elif current['marketing_emails_sent_today'] != row['counter']:
+                    to_reset.setdefault(row['counter'], []).append(current['id'])
+        wanted = set(names)
+        stale = self.env['res.partner'].browse([row['id'] for name, row in existing.items() if name not in wanted])
+        stale.unlink()
+        for counter, ids in to_reset.items():
+            self.env['res.partner'].browse(ids).write({'marketing_emails_sent_today': counter})
+        created = self._create(to_create)
+        print(f"✓ Fixture pool '{tag}': {len(existing) - len(stale)} reused, {len(created)} created, "
+              f"{len(stale)} removed, {sum(len(ids) for ids in to_reset.values())} counters reset")
+        if commit:
+            self.env.cr.commit()
+        ids_by_name = {name: row['id'] for name, row in existing.items()}
+        ids_by_name.update(zip([vals['name'] for vals in to_create], created.ids))
+        return self.env['res.partner'].browse([ids_by_name[name] for name in names])
+
+    def drop_pool(self, tag, commit=False):
+        """
+        Delete every partner of the pool tagged tag and return how many were removed
+        """
+        pool = self.env['res.partner'].with_context(active_test=False).search(self.pool_domain(tag))
+        count = len(pool)
+        pool.unlink()
+        if commit:
+            self.env.cr.commit()
+        return count
+
+
+def mel_fixture_pool_spec(partners_per_timezone=1000, timezones=None, counter=5):
+    """
+    Spec of a fixture pool with partners_per_timezone partners per timezone, half of them with
+    a non-zero counter, plus the same number without a timezone
+    """
+    spec = []
+    for tz_name in list(timezones or FIXTURE_POOL_TIMEZONES) + [False]:
+        spec.append((tz_name, counter, False, partners_per_timezone - partners_per_timezone // 2))
+        spec.append((tz_name, 0, False, partners_per_timezone // 2))
+    return spec
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+class CounterSnapshot:
+    """
+    (id, counter, last_email) columns of a partner domain held in three typed arrays, 12 bytes
+    per partner. Rows are read with keyset-paginated search_read calls and kept in id order,
+    last_email as epoch seconds (0 when empty). diff() compares two snapshots column-wise,
+    with numpy when it is installed and a single merge pass over the arrays otherwise.
+    """
+
+    def __init__(self, ids=None, counters=None, last_emails=None):
+        self.ids = ids if ids is not None else array('I')
+        self.counters = counters if counters is not None else array('i')
+        self.last_emails = last_emails if last_emails is not None else array('I')
+
+    @classmethod
+    def capture(cls, env, domain, chunk_size=None):
+        """
+        Snapshot every partner matching domain, chunk_size rows per query
+        """
+        chunk_size = chunk_size or PARTNER_CHUNK_SIZE
+        _invalidate_env_cache(env)  # flush pending writes so the snapshot reflects the database
+        partners = env['res.partner'].with_context(active_test=False)
+        snapshot = cls()
+        last_id = 0
+        while True:
+            rows = partners.search_read(list(domain) + [('id', '>', last_id)],
+                                        ['marketing_emails_sent_today', 'marketing_last_email'],
+                                        order='id', limit=chunk_size)
+            snapshot.ids.extend(row['id'] for row in rows)
+            snapshot.counters.extend(row['marketing_emails_sent_today'] or 0 for row in rows)
+            snapshot.last_emails.extend(
+                int(row['marketing_last_email'].replace(tzinfo=timezone.utc).timestamp())
+                if row['marketing_last_email'] else 0
+                for row in rows)
+            _invalidate_env_cache(env, flush=False)
+            if len(rows) < chunk_size:
+                return snapshot
+            last_id = rows[-1]['id']
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def nbytes(self):
+        return sum(column.itemsize * len(column) for column in (self.ids, self.counters, self.last_emails))
+
+    def describe(self, limit=10):
+        nonzero = sum(1 for counter in self.counters if counter)
+        text = (f"{len(self)} partner(s), {nonzero} non-zero, total {sum(self.counters)} "
+                f"({self.nbytes} bytes)")
+        if len(self) <= limit:
+            text += f": {dict(zip(self.ids, self.counters))}"
+        return text
+
+    def diff(self, after, expected_ids=(), allowed_ids=None):
+        """
+        Compare this snapshot with a later one of the same domain.
+        expected_ids should have had their non-zero counter reset, allowed_ids (expected_ids by
+        default) are the only partners allowed to change. Returns a dict of id arrays:
+        changed, missed (expected, still non-zero), unexpected (changed but not allowed),
+        added and removed.
+        """
+        expected = sorted(expected_ids)
+        allowed = expected if allowed_ids is None else sorted(set(allowed_ids) | set(expected))
+        np = _numpy()
+        if np is not None:
+            return self._diff_numpy(np, after, expected, allowed)
+        expected, allowed = set(expected), set(allowed)
+        result = {key: array('I') for key in ('changed', 'missed', 'unexpected', 'added', 'removed')}
+        before_index = after_index = 0
+        while before_index < len(self.ids) or after_index < len(after.ids):
+            before_id = self.ids[before_index] if before_index < len(self.ids) else None
+            after_id = after.ids[after_index] if after_index < len(after.ids) else None
+            if after_id is None or (before_id is not None and before_id < after_id):
+                result['removed'].append(before_id)
+                before_index += 1
+                continue
+            if before_id is None or after_id < before_id:
+                result['added'].append(after_id)
+                after_index += 1
+                continue
+            changed = (self.counters[before_index] != after.counters[after_index]
+                       or self.last_emails[before_index] != after.last_emails[after_index])
+            if changed:
+                result['changed'].append(before_id)
+                if before_id not in allowed:
+                    result['unexpected'].append(before_id)
+            if before_id in expected and self.counters[before_index] and after.counters[after_index]:
+                result['missed'].append(before_id)
+            before_index += 1
+            after_index += 1
+        return result
+
+    def _diff_numpy(self, np, after, expected, allowed):
+        before_ids = np.frombuffer(self.ids, dtype=np.uint32)
+        after_ids = np.frombuffer(after.ids, dtype=np.uint32)
+        common, before_pos, after_pos = np.intersect1d(before_ids, after_ids, assume_unique=True,
+                                                       return_indices=True)
+        before_counters = np.frombuffer(self.counters, dtype=np.int32)[before_pos]
+        after_counters = np.frombuffer(after.counters, dtype=np.int32)[after_pos]
+        changed = ((before_counters != after_counters)
+                   | (np.frombuffer(self.last_emails, dtype=np.uint32)[before_pos]
+                      != np.frombuffer(after.last_emails, dtype=np.uint32)[after_pos]))
+        in_expected = np.isin(common, np.asarray(expected, dtype=np.uint32))
+        in_allowed = np.isin(common, np.asarray(allowed, dtype=np.uint32))
+        columns = {
+            'changed': common[changed],
+            'missed': common[in_expected & (before_counters != 0) & (after_counters != 0)],
+            'unexpected': common[changed & ~in_allowed],
+            'added': np.setdiff1d(after_ids, before_ids, assume_unique=True),
+            'removed': np.setdiff1d(before_ids, after_ids, assume_unique=True),
+        }
+        return {key: array('I', column.astype(np.uint32).tobytes()) for key, column in columns.items()}
+
+
+def run_mel_counter_tests(chunk_size=None, env=None, pool_tag=None, partners_per_timezone=100):
     """
     Run comprehensive tests for MEL daily counter reset functionality inside Odoo shell
+    Partners are streamed in chunks of chunk_size (default PARTNER_CHUNK_SIZE)
+    env defaults to the `env` of the Odoo shell the script was loaded into
+    With pool_tag, the local midnight and batch reset checks also cover the committed fixture
+    pool of that tag (partners_per_timezone partners per FIXTURE_POOL_TIMEZONES entry), which
+    later runs reuse; drop it with drop_mel_fixture_pool(pool_tag)
     """
+    env = env or globals().get('env')
     print("="*70)
     print("MEL: RESET DAILY MARKETING EMAIL COUNTERS - SHELL TEST")
     print("="*70)
-    
-    print("\n1. Testing that the required method exists...")
-    partner_model = env['res.partner']
-    method_exists = hasattr(partner_model, 'mel_reset_daily_counters_batch')
-    helper_method_exists = hasattr(partner_model, '_mel_is_local_midnight')
-    print(f"✓ mel_reset_daily_counters_batch method exists: {method_exists}")
-    print(f"✓ _mel_is_local_midnight helper method exists: {helper_method_exists}")
-    
-    print("\n2. Testing that required fields exist...")
-    # Create a test partner to verify fields exist
-    test_partner = env['res.partner'].create({
-        'name': 'MEL Test Partner',
-        'email': 'meltest@example.com',
-        'tz': 'UTC',
-        'marketing_emails_sent_today': 1,
-    })
-    
-    field_exists_1 = hasattr(test_partner, 'marketing_emails_sent_today')
-    field_exists_2 = hasattr(test_partner, 'marketing_last_email')
-    field_exists_3 = hasattr(test_partner, 'tz')
-    print(f"✓ marketing_emails_sent_today field exists: {field_exists_1}")
-    print(f"✓ marketing_last_email field exists: {field_exists_2}")
-    print(f"✓ tz field exists: {field_exists_3}")
-    
-    print("\n3. Testing cron job exists...")
-    cron_job = env['ir.cron'].search([
-        ('name', '=', 'MEL: Reset Daily Marketing Email Counters')
-    ])
-    cron_exists = bool(cron_job)
-    print(f"✓ MEL Reset Daily Marketing Email Counters cron job exists: {cron_exists}")
-    
-    if cron_exists:
-        print(f"  - Cron Job Name: {cron_job.name}")
-        print(f"  - Model: {cron_job.model_id.model}")
-        print(f"  - Interval Number: {cron_job.interval_number}")
-        print(f"  - Interval Type: {cron_job.interval_type}")
-        print(f"  - Code: {cron_job.code}")
-        print(f"  - Active: {cron_job.active}")
-        print(f"  - State: {cron_job.state}")
-    
-    print("\n4. Creating test partners for functionality tests...")
-    # Create multiple test partners with different timezones including Canada and UK
-    partner_utc = env['res.partner'].create({
-        'name': 'UTC Test Partner',
-        'email': 'utc@test.com',
-        'tz': 'UTC',
-        'marketing_emails_sent_today': 5,
-    })
-    
-    partner_est = env['res.partner'].create({
-        'name': 'EST Test Partner',
-        'email': 'est@test.com',
-        'tz': 'US/Eastern',
-        'marketing_emails_sent_today': 3,
-    })
-    
-    partner_canada = env['res.partner'].create({
-        'name': 'Canada Test Partner',
-        'email': 'canada@test.com',
-        'tz': 'Canada/Eastern',  # Canada has multiple timezones - using Eastern as an example
-        'marketing_emails_sent_today': 4,
-    })
-    
-    partner_uk = env['res.partner'].create({
-        'name': 'UK Test Partner',
-        'email': 'uk@test.com',
-        'tz': 'Europe/London',  # UK timezone
-        'marketing_emails_sent_today': 6,
-    })
-    
-    partner_no_tz = env['res.partner'].create({
-        'name': 'No TZ Test Partner',
-        'email': 'notz@test.com',
-        'marketing_emails_sent_today': 7,
-    })
-    
-    print(f"✓ Created UTC Partner: {partner_utc.name} (TZ: {partner_utc.tz or 'default'}, Count: {partner_utc.marketing_emails_sent_today})")
-    print(f"✓ Created EST Partner: {partner_est.name} (TZ: {partner_est.tz or 'default'}, Count: {partner_est.marketing_emails_sent_today})")
-    print(f"✓ Created Canada Partner: {partner_canada.name} (TZ: {partner_canada.tz or 'default'}, Count: {partner_canada.marketing_emails_sent_today})")
-    print(f"✓ Created UK Partner: {partner_uk.name} (TZ: {partner_uk.tz or 'default'}, Count: {partner_uk.marketing_emails_sent_today})")
-    print(f"✓ Created No TZ Partner: {partner_no_tz.name} (TZ: {partner_no_tz.tz or 'default'}, Count: {partner_no_tz.marketing_emails_sent_today})")
-    
-    print("\n5. Testing initial counter values...")
-    initial_values = {
-        partner_utc.id: partner_utc.marketing_emails_sent_today,
-        partner_est.id: partner_est.marketing_emails_sent_today,
-        partner_canada.id: partner_canada.marketing_emails_sent_today,
-        partner_uk.id: partner_uk.marketing_emails_sent_today,
-        partner_no_tz.id: partner_no_tz.marketing_emails_sent_today,
-    }
-    print(f"✓ Initial counter values: {initial_values}")
-    
-    print("\n6. Testing manual counter reset...")
-    partner_utc.marketing_emails_sent_today = 10
-    print(f"✓ Set UTC partner counter to 10: {partner_utc.marketing_emails_sent_today}")
-    partner_utc.write({'marketing_emails_sent_today': 0})
-    print(f"✓ Reset UTC partner counter to 0: {partner_utc.marketing_emails_sent_today}")
-    
-    print("\n7. Testing _mel_is_local_midnight method...")
+    _mel_suite_started('run_mel_counter_tests')
     try:
-        result = partner_utc._mel_is_local_midnight()
-        print(f"✓ _mel_is_local_midnight method callable - Result type: {type(result)}")
+        _mel_step('run_mel_counter_tests', '1', "Testing that the required method exists...")
+        _mel_phase('run_mel_counter_tests', 'verification')
+        partner_model = env['res.partner']
+        # One metadata pass for steps 1-3: methods, fields and the cron job
+        contract = check_contract(env, MEL_CONTRACT)
+        print_contract_results(contract['results'], 'method', 'run_mel_counter_tests')
         
-        result_tolerance_5 = partner_utc._mel_is_local_midnight(tolerance_minutes=5)
-        print(f"✓ _mel_is_local_midnight with tolerance - Result type: {type(result_tolerance_5)}")
-    except Exception as e:
-        print(f"✗ Error calling _mel_is_local_midnight: {e}")
-    
-    print("\n8. Testing batch reset method call...")
-    try:
-        partner_model.mel_reset_daily_counters_batch()
-        print("✓ mel_reset_daily_counters_batch executed successfully")
-    except Exception as e:
-        print(f"✗ Error calling mel_reset_daily_counters_batch: {e}")
-    
-    print("\n9. Testing timezone handling...")
-    print(f"✓ UTC Partner timezone: {partner_utc.tz}")
-    print(f"✓ EST Partner timezone: {partner_est.tz}")
-    print(f"✓ Canada Partner timezone: {partner_canada.tz}")
-    print(f"✓ UK Partner timezone: {partner_uk.tz}")
-    print(f"✓ No TZ Partner timezone: {partner_no_tz.tz or 'using default'}")
-    
-    print("\n10. Testing Canada and UK specific timezone functionality...")
-    # Test Canada and UK partners individually for local midnight
-    canada_at_midnight = partner_canada._mel_is_local_midnight()
-    uk_at_midnight = partner_uk._mel_is_local_midnight()
-    print(f"✓ Canada Partner at local midnight: {bool(canada_at_midnight)}")
-    print(f"✓ UK Partner at local midnight: {bool(uk_at_midnight)}")
-    
-    print("\n12. Testing field types and values...")
-    print(f"✓ UTC Partner counter type: {type(partner_utc.marketing_emails_sent_today)}")
-    print(f"✓ UTC Partner counter value: {partner_utc.marketing_emails_sent_today}")
-    print(f"✓ UTC Partner last email: {partner_utc.marketing_last_email}")
-    print(f"✓ Canada Partner counter type: {type(partner_canada.marketing_emails_sent_today)}")
-    print(f"✓ Canada Partner counter value: {partner_canada.marketing_emails_sent_today}")
-    print(f"✓ Canada Partner last email: {partner_canada.marketing_last_email}")
-    print(f"✓ UK Partner counter type: {type(partner_uk.marketing_emails_sent_today)}")
-    print(f"✓ UK Partner counter value: {partner_uk.marketing_emails_sent_today}")
-    print(f"✓ UK Partner last email: {partner_uk.marketing_last_email}")
-    
-    print("\n11. Testing all partners at local midnight...")
-    all_partners = env['res.partner'].search([('active', '=', True), ('name', 'like', 'Test Partner')])
-    all_partners = all_partners | partner_utc | partner_est | partner_canada | partner_uk | partner_no_tz
-    at_midnight = all_partners._mel_is_local_midnight()
-    print(f"✓ Partners at local midnight: {len(at_midnight)}")
-    for p in at_midnight:
-        print(f"  - {p.name}: {p.marketing_emails_sent_today} emails")
-    
-    print("\n12. Testing cron job execution...")
-    if cron_exists:
-        try:
-            cron_job.method_direct_trigger()
-            print("✓ Cron job executed successfully via method_direct_trigger")
-        except Exception as e:
-            print(f"✗ Error executing cron job: {e}")
-    
-    print("\n13. Testing counter changes before/after reset...")
-    # Set some counters to non-zero values
-    partner_utc.marketing_emails_sent_today = 5
-    partner_est.marketing_emails_sent_today = 3
-    partner_canada.marketing_emails_sent_today = 4
-    partner_uk.marketing_emails_sent_today = 6
-    partner_no_tz.marketing_emails_sent_today = 8
-    
-    before_reset = {
-        partner_utc.id: partner_utc.marketing_emails_sent_today,
-        partner_est.id: partner_est.marketing_emails_sent_today,
-        partner_canada.id: partner_canada.marketing_emails_sent_today,
-        partner_uk.id: partner_uk.marketing_emails_sent_today,
-        partner_no_tz.id: partner_no_tz.marketing_emails_sent_today,
-    }
-    print(f"✓ Counters before reset: {before_reset}")
-    
-    # Call the batch reset
-    partner_model.mel_reset_daily_counters_batch()
-    
-    after_reset = {
-        partner_utc.id: partner_utc.marketing_emails_sent_today,
-        partner_est.id: partner_est.marketing_emails_sent_today,
-        partner_canada.id: partner_canada.marketing_emails_sent_today,
-        partner_uk.id: partner_uk.marketing_emails_sent_today,
-        partner_no_tz.id: partner_no_tz.marketing_emails_sent_today,
-    }
-    print(f"✓ Counters after reset: {after_reset}")
-    
-    print("\n14. Cleanup - Removing test partners...")
-    # Clean up test partners
-    test_partner.unlink()
-    partner_utc.unlink()
-    partner_est.unlink()
-    partner_canada.unlink()
-    partner_uk.unlink()
-    partner_no_tz.unlink()
-    print("✓ Test partners removed")
-    
+        _mel_step('run_mel_counter_tests', '2', "Testing that required fields exist...")
+        print_contract_results(contract['results'], 'field', 'run_mel_counter_tests')
+        
+        _mel_step('run_mel_counter_tests', '3', "Testing cron job exists...")
+        print_contract_results(contract['results'], 'cron', 'run_mel_counter_tests')
+        cron_row = contract['crons'].get('MEL: Reset Daily Marketing Email Counters')
+        cron_exists = cron_row is not None
+        cron_job = env['ir.cron'].browse(cron_row['id']) if cron_exists else env['ir.cron']
+        
+        if cron_exists:
+            print(f"  - Cron Job Name: {cron_row['name']}")
+            print(f"  - Model: {cron_row['model_name'] or ''}")
+            print(f"  - Interval Number: {cron_row['interval_number']}")
+            print(f"  - Interval Type: {cron_row['interval_type']}")
+            print(f"  - Code: {cron_row['code']}")
+            print(f"  - Active: {cron_row['active']}")
+            print(f"  - State: {cron_row['state']}")
+        
+        _mel_step('run_mel_counter_tests', '4', "Creating test partners for functionality tests...")
+        _mel_phase('run_mel_counter_tests', 'setup')
+        factory = PartnerFixtureFactory(env)
+        pool = env['res.partner']
+        if pool_tag:
+            # The pool is committed before the test savepoint so the next run reuses it
+            pool = factory.ensure_pool(pool_tag, mel_fixture_pool_spec(partners_per_timezone), commit=True)
+        
+        with rollback_savepoint(env, 'mel_counter_tests'):
+            # Create the test partners with different timezones including Canada and UK in one batch
+            # (Canada has multiple timezones - using Eastern as an example)
+            partner_utc, partner_est, partner_canada, partner_uk, partner_no_tz = factory.create([
+                ('UTC', 5, False, 1, 'UTC Test Partner'),
+                ('US/Eastern', 3, False, 1, 'EST Test Partner'),
+                ('Canada/Eastern', 4, False, 1, 'Canada Test Partner'),
+                ('Europe/London', 6, False, 1, 'UK Test Partner'),
+                (False, 7, False, 1, 'No TZ Test Partner'),
+            ])
+        
+            print(f"✓ Created UTC Partner: {partner_utc.name} (TZ: {partner_utc.tz or 'default'}, Count: {partner_utc.marketing_emails_sent_today})")
+            print(f"✓ Created EST Partner: {partner_est.name} (TZ: {partner_est.tz or 'default'}, Count: {partner_est.marketing_emails_sent_today})")
+            print(f"✓ Created Canada Partner: {partner_canada.name} (TZ: {partner_canada.tz or 'default'}, Count: {partner_canada.marketing_emails_sent_today})")
+            print(f"✓ Created UK Partner: {partner_uk.name} (TZ: {partner_uk.tz or 'default'}, Count: {partner_uk.marketing_emails_sent_today})")
+            print(f"✓ Created No TZ Partner: {partner_no_tz.name} (TZ: {partner_no_tz.tz or 'default'}, Count: {partner_no_tz.marketing_emails_sent_today})")
+        
+            _mel_step('run_mel_counter_tests', '5', "Testing initial counter values...")
+            _mel_phase('run_mel_counter_tests', 'verification')
+            test_partners = partner_utc | partner_est | partner_canada | partner_uk | partner_no_tz
+            test_domain = [('id', 'in', test_partners.ids)]
+            initial_values = CounterSnapshot.capture(env, test_domain, chunk_size)
+            print(f"✓ Initial counter values: {initial_values.describe()}")
+        
+            _mel_step('run_mel_counter_tests', '6', "Testing manual counter reset...")
+            _mel_phase('run_mel_counter_tests', 'setup')
+            partner_utc.marketing_emails_sent_today = 10
+            print(f"✓ Set UTC partner counter to 10: {partner_utc.marketing_emails_sent_today}")
+            partner_utc.write({'marketing_emails_sent_today': 0})
+            print(f"✓ Reset UTC partner counter to 0: {partner_utc.marketing_emails_sent_today}")
+        
+            _mel_step('run_mel_counter_tests', '7', "Testing _mel_is_local_midnight method...")
+            _mel_phase('run_mel_counter_tests', 'verification')
+            try:
+                result = partner_utc._mel_is_local_midnight()
+                print(f"✓ _mel_is_local_midnight method callable - Result type: {type(result)}")
+            
+                result_tolerance_5 = partner_utc._mel_is_local_midnight(tolerance_minutes=5)
+                print(f"✓ _mel_is_local_midnight with tolerance - Result type: {type(result_tolerance_5)}")
+            except Exception as e:
+                _mel_failed('run_mel_counter_tests', f"✗ Error calling _mel_is_local_midnight: {e}")
+        
+            _mel_step('run_mel_counter_tests', '8', "Testing batch reset method call...")
+            _mel_phase('run_mel_counter_tests', 'reset')
+            try:
+                partner_model.mel_reset_daily_counters_batch()
+                print("✓ mel_reset_daily_counters_batch executed successfully")
+            except Exception as e:
+                _mel_failed('run_mel_counter_tests', f"✗ Error calling mel_reset_daily_counters_batch: {e}")
+        
+            _mel_step('run_mel_counter_tests', '9', "Testing timezone handling...")
+            _mel_phase('run_mel_counter_tests', 'verification')
+            print(f"✓ UTC Partner timezone: {partner_utc.tz}")
+            print(f"✓ EST Partner timezone: {partner_est.tz}")
+            print(f"✓ Canada Partner timezone: {partner_canada.tz}")
+            print(f"✓ UK Partner timezone: {partner_uk.tz}")
+            print(f"✓ No TZ Partner timezone: {partner_no_tz.tz or 'using default'}")
+        
+            _mel_step('run_mel_counter_tests', '10', "Testing Canada and UK specific timezone functionality...")
+            # Test Canada and UK partners individually for local midnight
+            canada_at_midnight = partner_canada._mel_is_local_midnight()
+            uk_at_midnight = partner_uk._mel_is_local_midnight()
+            print(f"✓ Canada Partner at local midnight: {bool(canada_at_midnight)}")
+            print(f"✓ UK Partner at local midnight: {bool(uk_at_midnight)}")
+        
+            _mel_step('run_mel_counter_tests', '12', "Testing field types and values...")
+            print(f"✓ UTC Partner counter type: {type(partner_utc.marketing_emails_sent_today)}")
+            print(f"✓ UTC Partner counter value: {partner_utc.marketing_emails_sent_today}")
+            print(f"✓ UTC Partner last email: {partner_utc.marketing_last_email}")
+            print(f"✓ Canada Partner counter type: {type(partner_canada.marketing_emails_sent_today)}")
+            print(f"✓ Canada Partner counter value: {partner_canada.marketing_emails_sent_today}")
+            print(f"✓ Canada Partner last email: {partner_canada.marketing_last_email}")
+            print(f"✓ UK Partner counter type: {type(partner_uk.marketing_emails_sent_today)}")
+            print(f"✓ UK Partner counter value: {partner_uk.marketing_emails_sent_today}")
+            print(f"✓ UK Partner last email: {partner_uk.marketing_last_email}")
+        
+            _mel_step('run_mel_counter_tests', '11', "Testing all partners at local midnight...")
+            all_partners_domain = ['|', ('id', 'in', test_partners.ids),
+                                   '&', ('active', '=', True), ('name', 'like', 'Test Partner')]
+            if pool_tag:
+                all_partners_domain = ['|'] + factory.pool_domain(pool_tag) + all_partners_domain
+            now = _mel_now(env)
+            expected_ids, _buckets = expected_local_midnight_partner_ids(env, all_partners_domain, now=now)
+            at_midnight_ids = set()
+            for chunk in iter_partner_chunks(env, all_partners_domain, chunk_size):
+                at_midnight = _is_local_midnight(chunk, now=now)
+                at_midnight_ids.update(at_midnight.ids)
+                for p in at_midnight - pool:
+                    print(f"  - {p.name}: {p.marketing_emails_sent_today} emails")
+            print(f"✓ Partners at local midnight: {len(at_midnight_ids)}"
+                  + (f" ({len(at_midnight_ids & set(pool.ids))} from fixture pool '{pool_tag}')" if pool_tag else ""))
+            if not _report_midnight_cross_check(expected_ids, at_midnight_ids):
+                _mel_failed('run_mel_counter_tests', "Oracle mismatch in local midnight detection", echo=False)
+        
+            _mel_step('run_mel_counter_tests', '12', "Testing cron job execution...")
+            _mel_phase('run_mel_counter_tests', 'reset')
+            if cron_exists:
+                try:
+                    cron_job.method_direct_trigger()
+                    print("✓ Cron job executed successfully via method_direct_trigger")
+                except Exception as e:
+                    _mel_failed('run_mel_counter_tests', f"✗ Error executing cron job: {e}")
+        
+            _mel_step('run_mel_counter_tests', '13', "Testing counter changes before/after reset...")
+            _mel_phase('run_mel_counter_tests', 'setup')
+            # Set some counters to non-zero values
+            partner_utc.marketing_emails_sent_today = 5
+            partner_est.marketing_emails_sent_today = 3
+            partner_canada.marketing_emails_sent_today = 4
+            partner_uk.marketing_emails_sent_today = 6
+            partner_no_tz.marketing_emails_sent_today = 8
+        
+            reset_partners = test_partners | pool
+            reset_domain = [('id', 'in', reset_partners.ids)]
+            before_reset = CounterSnapshot.capture(env, reset_domain, chunk_size)
+            print(f"✓ Counters before reset: {before_reset.describe()}")
+            # Decided by the independent oracle, not by the method under test, at one pinned instant
+            now = _mel_now(env)
+            expected_reset_ids, _buckets = expected_local_midnight_partner_ids(env, reset_domain, now=now)
+            allowed_reset_ids, _buckets = expected_local_midnight_partner_ids(
+                env, reset_domain, BATCH_RESET_TOLERANCE_MINUTES, now)
+        
+            _mel_phase('run_mel_counter_tests', 'reset')
+            # Call the batch reset
+            partner_model.mel_reset_daily_counters_batch()
+        
+            _mel_phase('run_mel_counter_tests', 'verification')
+            after_reset = CounterSnapshot.capture(env, reset_domain, chunk_size)
+            print(f"✓ Counters after reset: {after_reset.describe()}")
+            changes = before_reset.diff(after_reset, expected_reset_ids, allowed_reset_ids)
+            print(f"✓ {len(changes['changed'])} partner(s) changed, {len(expected_reset_ids)} at local midnight")
+            if changes['missed']:
+                _mel_failed('run_mel_counter_tests', f"✗ Counters not reset at local midnight: {list(changes['missed'])[:10]}")
+            if changes['unexpected']:
+                _mel_failed('run_mel_counter_tests', f"✗ Counters changed outside local midnight: {list(changes['unexpected'])[:10]}")
+        
+            _mel_step('run_mel_counter_tests', '14', "Cleanup - Rolling back the test savepoint...")
+            _mel_phase('run_mel_counter_tests', 'cleanup')
+        # Leaving the savepoint removes the test partners and undoes every counter change
+        print("✓ Test partners removed")
+    finally:
+        _mel_suite_finished('run_mel_counter_tests')
+    failed_checks = _mel_failed_checks('run_mel_counter_tests')
     print("\n" + "="*70)
-    print("SHELL TEST COMPLETED SUCCESSFULLY!")
-    print("All tests passed - MEL Reset Daily Marketing Email Counters functionality")
-    print("is working correctly in the Odoo environment.")
+    if failed_checks:
+        print(f"SHELL TEST COMPLETED WITH {len(failed_checks)} FAILED CHECK(S)!")
+        for message in failed_checks:
+            print(f"  - {message.strip()}")
+    else:
+        print("SHELL TEST COMPLETED SUCCESSFULLY!")
+        print("All tests passed - MEL Reset Daily Marketing Email Counters functionality")
+        print("is working correctly in the Odoo environment.")
     print("="*70)
     
-    return True
+    return not failed_checks
+
+
+def drop_mel_fixture_pool(pool_tag, env=None):
+    """
+    Delete the committed fixture pool of run_mel_counter_tests(pool_tag=...)
+    """
+    env = env or globals().get('env')
+    count = PartnerFixtureFactory(env).drop_pool(pool_tag, commit=True)
+    print(f"✓ Fixture pool '{pool_tag}': {count} partner(s) removed")
+    return count
 
 
-def run_quick_test():
+def run_quick_test(env=None):
     """
     Run a quick verification test
     """
+    env = env or globals().get('env')
     print("\nQUICK VERIFICATION TEST")
     print("-" * 30)
     
-    # Check if methods exist
-    partner_model = env['res.partner']
-    has_batch_method = hasattr(partner_model, 'mel_reset_daily_counters_batch')
-    has_helper_method = hasattr(partner_model, '_mel_is_local_midnight')
-    
-    print(f"Batch method exists: {has_batch_method}")
-    print(f"Helper method exists: {has_helper_method}")
-    
-    # Check cron
-    cron = env['ir.cron'].search([('name', '=', 'MEL: Reset Daily Marketing Email Counters')])
-    print(f"Cron job exists: {bool(cron)}")
+    # Check methods, fields and cron in one metadata pass
+    contract = check_contract(env, MEL_CONTRACT)
+    print_contract_results(contract['results'])
     
+    cron = contract['crons'].get('MEL: Reset Daily Marketing Email Counters')
     if cron:
-        print(f"Cron active: {cron.active}")
-        print(f"Cron code: {cron.code}")
-    
-    print("Quick test completed successfully!")
+        print(f"Cron active: {cron['active']}")
+        print(f"Cron code: {cron['code']}")
+    
+    if contract['ok']:
+        print("Quick test completed successfully!")
+    else:
+        print("Quick test found missing MEL methods, fields or cron jobs!")
+    return contract['ok']
+
+
+def check_mel_contract(env=None, contract=None):
+    """
+    Pre-flight gate: verify the MEL methods, fields and cron jobs exist without creating records.
+    Returns True when the whole contract holds.
+    """
+    env = env or globals().get('env')
+    contract = check_contract(env, contract or MEL_CONTRACT)
+    print_contract_results(contract['results'])
+    failures = [result for result in contract['results'] if not result['ok']]
+    print(f"{'✓' if not failures else '✗'} MEL contract: {len(contract['results']) - len(failures)}"
+          f"/{len(contract['results'])} checks passed")
+    return contract['ok']
 
 
 def run_manual_verification_steps():